@@ -0,0 +1,91 @@
+"""Measures how CombinedContract overhead scales with the number of contracts.
+
+Compares a CombinedContract with N member contracts against the same N
+contracts stacked as separate decorators. Stacked decorators bind and flatten
+the arguments once per contract, while CombinedContract does it once per call
+and shares the result (see common.BoundArguments). Only that shared work is
+saved: whatever a member does per tensor is still done once per member.
+
+Two kinds of members are measured:
+  'shared': Members that only bind and flatten the arguments, which isolates
+    the work that CombinedContract shares. Combined overhead should stay
+    nearly constant in N, while stacked overhead grows linearly.
+  'dtype': DTypeContract members, which also check the dtype of every tensor.
+    Both overheads grow linearly in N, by the cost of the per-tensor checks;
+    combined overhead is lower by the cost of binding and flattening.
+
+Usage:
+  python benchmarks/combined_contract_benchmark.py [--num_calls=1000]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+sys.path.insert(0,
+                os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tensorflow as tf
+import tfcontracts
+
+
+class SharedWorkContract(tfcontracts.FunctionContract):
+  """A contract that only binds and flattens all arguments."""
+  def check_planned_precondition(self, plan, arguments):
+    for name in arguments.values:
+      arguments.tensors(name)
+
+  def check_planned_postcondition(self, plan, results):
+    pass
+
+
+_MEMBER_FACTORIES = {
+    'shared': SharedWorkContract,
+    'dtype': lambda: tfcontracts.DTypeContract(value=tf.float32),
+}
+
+
+def func(x: dict, y: list) -> dict:
+  return x
+
+
+def time_per_call_us(wrapped_func, args, num_calls):
+  seconds = min(
+      timeit.repeat(lambda: wrapped_func(*args), number=num_calls, repeat=3))
+  return 1e6 * seconds / num_calls
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__)
+  parser.add_argument('--num_calls', type=int, default=1000)
+  parser.add_argument('--max_contracts', type=int, default=6)
+  flags = parser.parse_args()
+
+  args = ({f'x{i}': [tf.zeros([4]) for _ in range(8)]
+           for i in range(8)}, [tf.zeros([4]) for _ in range(32)])
+  baseline_us = time_per_call_us(func, args, flags.num_calls)
+  report = []
+  for member, factory in _MEMBER_FACTORIES.items():
+    for num_contracts in range(1, flags.max_contracts + 1):
+      combined = tfcontracts.CombinedContract(
+          [factory() for _ in range(num_contracts)])(func)
+      stacked = func
+      for _ in range(num_contracts):
+        stacked = factory()(stacked)
+      report.append({
+          'member':
+          member,
+          'num_contracts':
+          num_contracts,
+          'combined_overhead_us':
+          time_per_call_us(combined, args, flags.num_calls) - baseline_us,
+          'stacked_overhead_us':
+          time_per_call_us(stacked, args, flags.num_calls) - baseline_us,
+      })
+  print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,177 @@
+"""Measures per-call overhead of contracts relative to undecorated functions.
+
+Every case times a function decorated by a contract against the same function
+without a contract, and reports the difference. Cases vary:
+  - the contract (shape, dtype, type checking, or a combination of them),
+  - execution mode (eager, or a tf.function that wraps the decorated function),
+  - the number of function arguments,
+  - nesting depth of arguments (levels alternate between lists and dicts of
+    two items, and arguments are annotated accordingly, so that type checks
+    walk the whole structure),
+  - the number of contracts in a CombinedContract.
+
+The report is written as JSON, so that results of different revisions can be
+compared to track regressions. Runs on CPU.
+
+Usage:
+  python benchmarks/contract_overhead_benchmark.py --output=report.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import timeit
+import typing
+
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+sys.path.insert(0,
+                os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tensorflow as tf
+import tfcontracts
+
+
+def make_shape_contract(names):
+  return tfcontracts.ShapeContract(values={name: ['n'] for name in names})
+
+
+_CONTRACT_FACTORIES = {
+    'shape': make_shape_contract,
+    'dtype': lambda names: tfcontracts.DTypeContract(value=tf.float32),
+    'type_checking': lambda names: tfcontracts.TypeCheckingContract(),
+}
+
+
+def make_function(num_args, depth):
+  """Returns a function with num_args arguments, and the argument names.
+
+  Arguments are annotated with the type of make_nested_argument(depth).
+  """
+  names = [f'x{i}' for i in range(num_args)]
+  annotation = make_nested_annotation(depth)
+  namespace = {'tf': tf, 'typing': typing}
+  exec(
+      f'def func({", ".join(f"{name}: {annotation}" for name in names)}):\n'
+      f'  return x0\n', namespace)
+  return namespace['func'], names
+
+
+def make_nested_argument(depth):
+  """Returns a tensor nested in `depth` levels of two-item lists and dicts."""
+  if depth == 0:
+    return tf.zeros([4])
+  if depth % 2:
+    return [make_nested_argument(depth - 1) for _ in range(2)]
+  return {key: make_nested_argument(depth - 1) for key in 'ab'}
+
+
+def make_nested_annotation(depth):
+  """Returns the type annotation of make_nested_argument(depth)."""
+  if depth == 0:
+    return 'tf.Tensor'
+  if depth % 2:
+    return f'typing.List[{make_nested_annotation(depth - 1)}]'
+  return f'typing.Dict[str, {make_nested_annotation(depth - 1)}]'
+
+
+def make_contract(contract_names, arg_names):
+  contracts = [_CONTRACT_FACTORIES[name](arg_names) for name in contract_names]
+  if len(contracts) == 1:
+    return contracts[0]
+  return tfcontracts.CombinedContract(contracts)
+
+
+def time_per_call_us(func, args, repeat):
+  timer = timeit.Timer(lambda: func(*args))
+  number, _ = timer.autorange()
+  return 1e6 * min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_case(contract_names, mode, num_args, depth, repeat):
+  func, arg_names = make_function(num_args, depth)
+  decorated_func = make_contract(contract_names, arg_names)(func)
+  if mode == 'tf_function':
+    # Autograph can't read the source of generated functions.
+    func = tf.function(func, autograph=False)
+    decorated_func = tf.function(decorated_func, autograph=False)
+  args = [make_nested_argument(depth) for _ in range(num_args)]
+  # Warm up, which also traces tf.functions.
+  func(*args)
+  decorated_func(*args)
+  baseline_us = time_per_call_us(func, args, repeat)
+  decorated_us = time_per_call_us(decorated_func, args, repeat)
+  return {
+      'contract': '+'.join(contract_names),
+      'num_contracts': len(contract_names),
+      'mode': mode,
+      'num_args': num_args,
+      'depth': depth,
+      'num_tensors': num_args * 2**depth,
+      'baseline_us': baseline_us,
+      'decorated_us': decorated_us,
+      'overhead_us': decorated_us - baseline_us,
+  }
+
+
+def make_cases(args):
+  """Returns a list of (contract names, mode, num args, depth) tuples."""
+  cases = []
+  contract_sets = [[name] for name in _CONTRACT_FACTORIES]
+  contract_sets.append(list(_CONTRACT_FACTORIES))
+  for contract_names in contract_sets:
+    for mode in args.modes:
+      for num_args in args.num_args:
+        cases.append((contract_names, mode, num_args, 0))
+      for depth in args.depths:
+        if depth > 0:
+          cases.append((contract_names, mode, 1, depth))
+  names = list(_CONTRACT_FACTORIES)
+  for num_contracts in range(2, args.max_combined + 1):
+    contract_names = [names[i % len(names)] for i in range(num_contracts)]
+    for mode in args.modes:
+      cases.append((contract_names, mode, 2, 2))
+  return cases
+
+
+def main():
+  parser = argparse.ArgumentParser(
+      description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+  parser.add_argument('--output',
+                      help='Path of the JSON report; stdout if '
+                      'unset.')
+  parser.add_argument('--modes',
+                      nargs='+',
+                      default=['eager', 'tf_function'],
+                      choices=['eager', 'tf_function'])
+  parser.add_argument('--num_args', nargs='+', type=int, default=[1, 4, 16])
+  parser.add_argument('--depths', nargs='+', type=int, default=[0, 2, 4])
+  parser.add_argument('--max_combined', type=int, default=6)
+  parser.add_argument('--repeat', type=int, default=3)
+  args = parser.parse_args()
+
+  results = []
+  for contract_names, mode, num_args, depth in make_cases(args):
+    result = run_case(contract_names, mode, num_args, depth, args.repeat)
+    print(
+        f'{result["contract"]:>40} {mode:>12} args={num_args:<3} '
+        f'depth={depth:<2} overhead={result["overhead_us"]:10.1f}us',
+        file=sys.stderr)
+    results.append(result)
+  report = {
+      'created': datetime.datetime.now().isoformat(),
+      'python_version': platform.python_version(),
+      'tensorflow_version': tf.__version__,
+      'platform': platform.platform(),
+      'results': results,
+  }
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(report, f, indent=2)
+  else:
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -23,6 +23,69 @@ class AssertUtilitiesTest(unittest.TestCase):
     with self.assertRaises(ValueError):
       tfcontracts.assert_shapes_same([tf.zeros([1, 2]), tf.zeros([2])])
 
+  def test_assert_shapes_same_static_shapes_create_no_ops(self):
+    graph = tf.Graph()
+    with graph.as_default():
+      inputs = [tf.zeros([2, 3]) for _ in range(10)]
+      num_ops = len(graph.get_operations())
+      self.assertIsNone(tfcontracts.assert_shapes_same(inputs))
+      self.assertEqual(num_ops, len(graph.get_operations()))
+
+  def test_assert_shapes_same_dynamic_shapes_use_single_assert(self):
+    def count_asserts(num_tensors):
+      @tf.function(input_signature=[tf.TensorSpec([None, 3])] * num_tensors)
+      def check(*inputs):
+        tfcontracts.assert_shapes_same(inputs)
+
+      graph = check.get_concrete_function().graph
+      return sum(op.type == 'Assert' for op in graph.get_operations())
+
+    self.assertEqual(1, count_asserts(2))
+    self.assertEqual(1, count_asserts(50))
+
+  def test_assert_shapes_same_dynamic_shapes(self):
+    @tf.function(input_signature=[tf.TensorSpec([None, 3])] * 2 +
+                 [tf.TensorSpec([4, None])])
+    def check(x, y, z):
+      tfcontracts.assert_shapes_same([x, y, z])
+
+    check(tf.zeros([4, 3]), tf.zeros([4, 3]), tf.zeros([4, 3]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      check(tf.zeros([4, 3]), tf.zeros([5, 3]), tf.zeros([4, 3]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      check(tf.zeros([4, 3]), tf.zeros([4, 3]), tf.zeros([4, 2]))
+
+  def test_assert_shapes_same_axes(self):
+    tensors = [tf.zeros([2, 3]), tf.zeros([2]), tf.zeros([2, 5, 3])]
+    tfcontracts.assert_shapes_same(tensors, axes=[0])
+    tfcontracts.assert_shapes_same(
+        [tf.zeros([2, 3]), tf.zeros([4, 5, 3])], axes=[-1])
+    with self.assertRaises(ValueError):
+      tfcontracts.assert_shapes_same(
+          [tf.zeros([2, 3]), tf.zeros([3, 3])], axes=[0])
+    with self.assertRaises(ValueError):
+      tfcontracts.assert_shapes_same(
+          [tf.zeros([2, 3]), tf.zeros([2])], axes=[1])
+
+    @tf.function(
+        input_signature=[tf.TensorSpec([None, 3]),
+                         tf.TensorSpec([None])])
+    def check(x, y):
+      tfcontracts.assert_shapes_same([x, y], axes=[0])
+
+    check(tf.zeros([2, 3]), tf.zeros([2]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      check(tf.zeros([2, 3]), tf.zeros([3]))
+
+  def test_assert_shapes_same_unknown_rank(self):
+    @tf.function(input_signature=[tf.TensorSpec(None)] * 2)
+    def check(x, y):
+      tfcontracts.assert_shapes_same([x, y])
+
+    check(tf.zeros([2, 3]), tf.zeros([2, 3]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      check(tf.zeros([2, 3]), tf.zeros([2, 4]))
+
   def test_assert_in_interval_scalar(self):
     tfcontracts.assert_in_interval(tf.constant([0.5], tf.float32), 0.0, 1.0)
 
@@ -35,6 +98,14 @@ class AssertUtilitiesTest(unittest.TestCase):
     with self.assertRaises(tf.errors.InvalidArgumentError):
       tfcontracts.assert_in_interval(tf.constant([0.0]), low=1.0, high=2.0)
 
+  def test_assert_all_finite(self):
+    self.assertIsNone(tfcontracts.assert_all_finite([tf.constant([1, 2])]))
+    tfcontracts.assert_all_finite(
+        [tf.zeros([2]), tf.constant([1, 2]), [1.0, 2.0]])
+    with self.assertRaisesRegex(tf.errors.InvalidArgumentError, 'not finite'):
+      tfcontracts.assert_all_finite(
+          [tf.zeros([2]), tf.constant([1.0, float('nan')])])
+
 
 if __name__ == '__main__':
   unittest.main()
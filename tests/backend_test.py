@@ -0,0 +1,93 @@
+"""Unit tests for lazy TensorFlow access and array helpers."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import subprocess
+import sys
+import tfcontracts
+import unittest
+import numpy as np
+import tensorflow as tf
+
+_PACKAGE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def run_without_tensorflow(code):
+  """Runs code in a fresh interpreter, returns true if it imported TF."""
+  result = subprocess.run([
+      sys.executable, '-c',
+      f'import sys\n{code}\nprint("tensorflow" in sys.modules)'
+  ],
+                          cwd=_PACKAGE_DIR,
+                          capture_output=True,
+                          text=True,
+                          check=True)
+  return result.stdout.strip().splitlines()[-1] == 'True'
+
+
+class LazyImportTest(unittest.TestCase):
+  def test_import_does_not_import_tensorflow(self):
+    self.assertFalse(run_without_tensorflow('import tfcontracts'))
+
+  def test_numpy_contracts_do_not_import_tensorflow(self):
+    self.assertFalse(
+        run_without_tensorflow('''
+import numpy as np
+import tfcontracts
+
+@tfcontracts.ShapeContract(values={'x': ['b', 3], 'return': ['b', 3]})
+@tfcontracts.DTypeContract(x='float32', same_dtype=['x', 'y'])
+@tfcontracts.ValueContract(values={'x': 'finite'})
+def add(x, y):
+  return x + y
+
+add(np.zeros([2, 3], np.float32), [np.ones([3], np.float32)])
+'''))
+
+
+class BackendTest(unittest.TestCase):
+  def test_static_dims(self):
+    static_dims = tfcontracts.backend.static_dims
+    self.assertEqual([2, 3], static_dims(np.zeros([2, 3])))
+    self.assertEqual([2, 3], static_dims(tf.zeros([2, 3])))
+    self.assertEqual([None, 3],
+                     static_dims(tf.TensorSpec([None, 3], tf.float32)))
+    self.assertIsNone(static_dims(tf.TensorSpec(None, tf.float32)))
+
+  def test_ragged_dims(self):
+    ragged_dims = tfcontracts.backend.ragged_dims
+    self.assertEqual(set(), ragged_dims(tf.zeros([2, 3])))
+    self.assertEqual({1}, ragged_dims(tf.ragged.constant([[1], [2, 3]])))
+    self.assertEqual({2},
+                     ragged_dims(
+                         tf.RaggedTensor.from_uniform_row_length(
+                             tf.ragged.constant([[1], [2, 3]]), 1)))
+
+  def test_dynamic_shape(self):
+    dynamic_shape = tfcontracts.backend.dynamic_shape
+    self.assertEqual([2, 3], dynamic_shape(tf.zeros([2, 3])).numpy().tolist())
+    self.assertEqual([2, 3],
+                     dynamic_shape(tf.sparse.from_dense(tf.zeros(
+                         [2, 3]))).numpy().tolist())
+    self.assertEqual([2, -1, 4],
+                     dynamic_shape(
+                         tf.RaggedTensor.from_row_lengths(
+                             tf.zeros([3, 4]), [1, 2])).numpy().tolist())
+
+  def test_dtype_name(self):
+    dtype_name = tfcontracts.backend.dtype_name
+    self.assertEqual('float32', dtype_name(tf.float32))
+    self.assertEqual('float32', dtype_name(np.float32))
+    self.assertEqual('float32', dtype_name('float32'))
+    self.assertEqual('bfloat16', dtype_name('bfloat16'))
+    with self.assertRaises(TypeError):
+      dtype_name('not a dtype')
+
+
+if __name__ == '__main__':
+  unittest.main()
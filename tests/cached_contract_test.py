@@ -0,0 +1,117 @@
+"""Unit tests for cached contracts."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import typing
+import unittest
+from unittest import mock
+import tensorflow as tf
+
+
+class CachedContractTest(unittest.TestCase):
+  def test_repeated_signature_is_checked_once(self):
+    shape_contract = tfcontracts.ShapeContract(values={'x': ['b', 2]})
+    contract = tfcontracts.CachedContract(shape_contract)
+
+    @contract
+    def test_func(x):
+      return x
+
+    with mock.patch.object(shape_contract,
+                           'check_planned_precondition') as mocked_check:
+      for _ in range(3):
+        test_func(tf.zeros([3, 2]))
+      test_func(tf.zeros([4, 2]))
+    self.assertEqual(2, mocked_check.call_count)
+    # Postconditions are cached as well.
+    info = contract.cache_info()
+    self.assertEqual(2 + 2, info.hits)
+    self.assertEqual(2 + 2, info.misses)
+
+  def test_violations_are_not_cached(self):
+    @tfcontracts.CachedContract(tfcontracts.ShapeContract(values={'x': [2]}))
+    def test_func(x):
+      return x
+
+    for _ in range(2):
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        test_func(tf.zeros([3]))
+
+  def test_collected_violations_are_not_cached(self):
+    @tfcontracts.CachedContract(tfcontracts.ShapeContract(values={'x': [2]}))
+    def test_func(x):
+      return x
+
+    with tfcontracts.violations.collect() as collected:
+      test_func(tf.zeros([3]))
+    self.assertEqual(1, len(collected))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([3]))
+
+  def test_unknown_shapes_are_not_cached(self):
+    contract = tfcontracts.CachedContract(
+        tfcontracts.ShapeContract(values={'x': ['b', 2]}))
+
+    @tf.function(input_signature=[tf.TensorSpec([None, None])])
+    @contract
+    def test_func(x):
+      return x
+
+    test_func(tf.zeros([3, 2]))
+    self.assertEqual(0, contract.cache_info().currsize)
+
+  def test_cache_is_bounded(self):
+    contract = tfcontracts.CachedContract(
+        tfcontracts.DTypeContract(value=tf.float32), maxsize=2)
+
+    @contract
+    def test_func(x):
+      return x
+
+    for n in range(1, 5):
+      test_func(tf.zeros([n]))
+    self.assertEqual(2, contract.cache_info().currsize)
+    contract.cache_clear()
+    self.assertEqual(0, contract.cache_info().currsize)
+
+  def test_value_dependent_contracts_are_rejected(self):
+    class ValueDependentContract(tfcontracts.FunctionContract):
+      pass
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.CachedContract(ValueDependentContract())
+
+  def test_type_checking_contracts_are_rejected(self):
+    # Literal and Type annotations depend on values, not only on their types.
+    @tfcontracts.TypeCheckingContract()
+    def test_func(mode: typing.Literal['a', 'b'], cls: typing.Type[int]):
+      pass
+
+    test_func('a', int)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func('zzz', int)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func('a', str)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.CachedContract(tfcontracts.TypeCheckingContract())
+
+  def test_structure_signature(self):
+    signature = tfcontracts.common.structure_signature
+    self.assertEqual(signature({'x': [tf.zeros([2]), 1]}),
+                     signature({'x': [tf.ones([2]), 5]}))
+    self.assertNotEqual(signature({'x': [tf.zeros([2])]}),
+                        signature({'x': [tf.zeros([3])]}))
+    self.assertNotEqual(signature({'x': tf.zeros([2])}),
+                        signature({'x': tf.zeros([2], tf.int32)}))
+    self.assertNotEqual(signature({'x': [tf.zeros([2])]}),
+                        signature({'x': (tf.zeros([2]), )}))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,170 @@
+"""Unit tests for shared utilities."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import collections
+import dataclasses
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+Point = collections.namedtuple('Point', ['x', 'y'])
+
+
+@dataclasses.dataclass
+class DataclassFeatures:
+  ids: tf.Tensor
+  weights: list
+
+
+class CheckPlanTest(unittest.TestCase):
+  def test_make_check_plan(self):
+    def test_func(x: int, y, *args, z=1, **kwargs) -> int:
+      return x
+
+    plan = tfcontracts.common.make_check_plan(test_func)
+    self.assertEqual('test_func', plan.function_name)
+    self.assertEqual(('x', 'y'), plan.arg_names)
+    self.assertEqual(('z', ), plan.keyword_only_arg_names)
+    self.assertTrue(plan.accepts_var_kwargs)
+    self.assertEqual({'z': 1}, plan.defaults)
+    self.assertEqual({'x': int, 'return': int}, plan.annotations)
+
+  def test_bind_all_arguments(self):
+    def test_func(x, y, z=None):
+      pass
+
+    plan = tfcontracts.common.make_check_plan(test_func)
+    self.assertEqual({'x': 1, 'y': 2}, plan.bind((1, 2), {}))
+    self.assertEqual({
+        'x': 1,
+        'y': 2,
+        'z': 3
+    }, plan.bind((1, ), {
+        'y': 2,
+        'z': 3
+    }))
+
+  def test_bind_selected_arguments(self):
+    def test_func(x, y, *, z=None):
+      pass
+
+    plan = tfcontracts.common.make_check_plan(test_func).select(
+        ['y', 'z', 'return'])
+    self.assertEqual((('y', 1), ('z', -1)), plan.selected_args)
+    self.assertEqual({'y': 2}, plan.bind((1, 2), {}))
+    self.assertEqual({'y': 2, 'z': 3}, plan.bind((1, ), {'y': 2, 'z': 3}))
+
+  def test_plan_follows_wrapped_functions(self):
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def test_func(x, y):
+      return x
+
+    plan = tfcontracts.common.make_check_plan(test_func)
+    self.assertEqual(('x', 'y'), plan.arg_names)
+
+
+class BoundArgumentsTest(unittest.TestCase):
+  def test_values_and_tensors(self):
+    def test_func(x, y):
+      pass
+
+    plan = tfcontracts.common.make_check_plan(test_func)
+    tensors = [tf.zeros(1), tf.zeros(2)]
+    arguments = tfcontracts.common.BoundArguments(plan, (tensors, ),
+                                                  {'y': 'hello'})
+    self.assertEqual({'x': tensors, 'y': 'hello'}, arguments.values)
+    self.assertEqual(tensors, arguments.tensors('x'))
+    self.assertEqual([], arguments.tensors('y'))
+    self.assertEqual(tensors, list(arguments.iter_tensors('x')))
+    self.assertIsNot(arguments.tensors('x'), arguments.tensors('x'))
+    # Once shared, flattened tensors are cached.
+    arguments.share_tensors()
+    self.assertIs(arguments.tensors('x'), arguments.tensors('x'))
+    self.assertEqual(tensors, list(arguments.iter_tensors('x')))
+
+  def test_dtype_checks_stop_at_first_wrong_tensor(self):
+    tensor = tf.zeros([1], tf.int32)
+    accessed_indices = set()
+
+    class CountingSequence(collections.abc.Sequence):
+      def __getitem__(self, i):
+        if i >= len(self):
+          raise IndexError(i)
+        accessed_indices.add(i)
+        return tensor
+
+      def __len__(self):
+        return 100
+
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def test_func(x):
+      pass
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(CountingSequence())
+    self.assertEqual({0}, accessed_indices)
+
+  def test_for_return_value(self):
+    plan = tfcontracts.common.make_check_plan(lambda: None)
+    results = tfcontracts.common.BoundArguments.for_return_value(plan, 5)
+    self.assertEqual({'return': 5}, results.values)
+
+
+class IterTensorsTest(unittest.TestCase):
+  def test_nested_structures(self):
+    tensors = [tf.zeros([i]) for i in range(6)]
+    value = {
+        'list': [tensors[0], (tensors[1], 'hello')],
+        'namedtuple': Point(tensors[2], 3),
+        'dataclass': DataclassFeatures(tensors[3], [tensors[4]]),
+        'tensor': tensors[5],
+        'scalar': 0.0,
+    }
+    self.assertEqual(tensors, list(tfcontracts.common.iter_tensors(value)))
+    self.assertEqual(
+        tensors,
+        tfcontracts.common.flatten_tensor_func_args({'value': value})['value'])
+
+  def test_attrs_classes(self):
+    try:
+      import attr
+    except ImportError:
+      self.skipTest('attrs is not installed.')
+
+    @attr.s
+    class AttrsFeatures:
+      ids = attr.ib()
+      name = attr.ib()
+
+    tensor = tf.zeros([1])
+    self.assertEqual(
+        [tensor],
+        list(tfcontracts.common.iter_tensors(AttrsFeatures(tensor,
+                                                           name='abc'))))
+
+  def test_early_exit(self):
+    class InfiniteSequence(collections.abc.Sequence):
+      def __getitem__(self, i):
+        return tf.zeros([1])
+
+      def __len__(self):
+        return 10**9
+
+    iterator = tfcontracts.common.iter_tensors([[InfiniteSequence()]])
+    self.assertEqual([1], next(iterator).shape.as_list())
+
+  def test_deep_nesting(self):
+    value = tf.zeros([1])
+    for _ in range(10000):
+      value = [value]
+    self.assertEqual(1, len(list(tfcontracts.common.iter_tensors(value))))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -9,8 +9,15 @@ os.environ['CUDA_VISIBLE_DEVICES'] = ''
 
 import tfcontracts
 import unittest
+from unittest import mock
+import asyncio
+import inspect
+import threading
+import numpy as np
 import tensorflow as tf
 
+from typing import Any, Dict, List, Optional, Protocol, Sequence, Tuple, Union
+
 
 class TypeCheckingContractTest(unittest.TestCase):
   def test_without_type_annotations(self):
@@ -36,6 +43,80 @@ class TypeCheckingContractTest(unittest.TestCase):
     with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
       add_two_ints(x=0, y=0.5)
 
+  def test_generic_type_annotations(self):
+    @tfcontracts.TypeCheckingContract()
+    def test_func(x: List[tf.Tensor],
+                  y: Dict[str, Tuple[int, ...]],
+                  z: Optional[Union[int, str]] = None) -> Sequence[tf.Tensor]:
+      return x
+
+    test_func([tf.zeros(1)], {'a': (1, 2)}, z='b')
+    test_func([], {}, None)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([tf.zeros(1), 1], {})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([], {'a': (1, 'b')})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([], {1: ()})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([], {}, z=0.5)
+
+  def test_protocol_type_annotations(self):
+    class HasShape(Protocol):
+      shape: Any
+
+    @tfcontracts.TypeCheckingContract()
+    def test_func(x: HasShape):
+      return x
+
+    test_func(tf.zeros(1))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([1])
+
+  def test_annotations_are_compiled_once(self):
+    check_types = tfcontracts.type_checking_contract
+    with mock.patch.object(check_types, '_compile',
+                           wraps=check_types._compile) as mocked_compile:
+
+      @tfcontracts.TypeCheckingContract()
+      def test_func(x: List['UnknownClass'], y: List[float]):
+        return x
+
+      num_compiled = mocked_compile.call_count
+      test_func([1], [0.5])
+      test_func([2], [1.5])
+    self.assertEqual(num_compiled, mocked_compile.call_count)
+
+  def test_container_policy(self):
+    values = [1] * 1000 + ['a']
+
+    @tfcontracts.TypeCheckingContract(container_policy='first_k', k=10)
+    def sampled_func(x: List[int]):
+      return x
+
+    @tfcontracts.TypeCheckingContract()
+    def test_func(x: List[int]):
+      return x
+
+    sampled_func(values)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(values)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      sampled_func(['a'] + values)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.TypeCheckingContract(container_policy='random_k')
+
+  def test_random_container_policy(self):
+    is_int = tfcontracts.type_checking_contract.compile_type_annotation(
+        List[int],
+        tfcontracts.type_checking_contract.make_container_policy('random_k',
+                                                                 k=2))
+    with mock.patch.object(tfcontracts.type_checking_contract.random,
+                           'sample',
+                           return_value=[3, 4]):
+      self.assertTrue(is_int(['a', 'b', 'c', 1, 2]))
+      self.assertFalse(is_int([1, 2, 3, 4, 'e']))
+
 
 class DTypeContractTest(unittest.TestCase):
   def test_single_dtype_contract(self):
@@ -58,6 +139,71 @@ class DTypeContractTest(unittest.TestCase):
 
     test_func(tf.zeros(1, tf.float64), tf.zeros(1, tf.float32))
 
+  def test_per_argument_dtype_contract(self):
+    @tfcontracts.DTypeContract(x=tf.float32,
+                               y=[tf.float16, tf.bfloat16],
+                               values={'return': 'float32'})
+    def test_func(x, y, z):
+      return x
+
+    test_func(tf.zeros(1), tf.zeros(1, tf.float16), tf.zeros(1, tf.int32))
+    test_func(tf.zeros(1), [tf.zeros(1, tf.bfloat16)], z='not checked')
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros(1), tf.zeros(1), None)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros(1, tf.int32), tf.zeros(1, tf.float16), None)
+
+  def test_unnamed_arguments_are_not_flattened(self):
+    @tfcontracts.DTypeContract(x=tf.float32)
+    def test_func(x, y):
+      return x
+
+    with mock.patch.object(tfcontracts.common,
+                           'iter_tensors',
+                           wraps=tfcontracts.common.iter_tensors) as mocked:
+      test_func(tf.zeros(1), [tf.zeros(1, tf.int32)])
+    self.assertEqual(1, mocked.call_count)
+
+  def test_default_and_per_argument_dtypes(self):
+    @tfcontracts.DTypeContract(value=tf.int32, x=tf.float32)
+    def test_func(x, y):
+      return y
+
+    test_func(tf.zeros(1), tf.zeros(1, tf.int32))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros(1), tf.zeros(1))
+
+  def test_same_dtype_contract(self):
+    @tfcontracts.DTypeContract(same_dtype=['x', 'y'])
+    def test_func(x, y, z):
+      return x
+
+    test_func(tf.zeros(1, tf.int32), [tf.zeros(1, tf.int32)], tf.zeros(1))
+    test_func(tf.zeros(1), y=None, z=None)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros(1, tf.int32),
+                [tf.zeros(1, tf.int32), tf.zeros(1)], None)
+
+  def test_positional_check_inputs_and_check_outputs(self):
+    @tfcontracts.DTypeContract(tf.float32, False)
+    def test_func(x):
+      return tf.cast(x, tf.float32)
+
+    test_func(tf.zeros([2], tf.int32))
+    with self.assertRaises(TypeError):
+      tfcontracts.DTypeContract(tf.float32, True, True, ['x', 'y'])
+
+  def test_invalid_dtype_specifications(self):
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.DTypeContract(x='not a dtype')
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.DTypeContract(same_dtype=['x', 'return'])
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+
+      @tfcontracts.DTypeContract(same_dtype=[['x', 'z']])
+      def test_func(x, y):
+        return x
+
   def test_check_argument_dtypes(self):
     """Checks the underlying function in dtype contract verification."""
     check_argument_dtype_recursive = tfcontracts.dtype_contract.check_argument_dtype_recursive
@@ -82,6 +228,174 @@ class DTypeContractTest(unittest.TestCase):
     self.assertTrue(check_argument_dtype_recursive(924, tf.int32))
 
 
+class NumpyContractTest(unittest.TestCase):
+  def test_shape_and_dtype_contracts(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b']})
+    @tfcontracts.DTypeContract(x=tf.float32, y='int64')
+    def test_func(x, y):
+      return x
+
+    test_func(np.zeros([2, 3], np.float32), np.zeros([2], np.int64))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(np.zeros([2, 4], np.float32), np.zeros([2], np.int64))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(np.zeros([2, 3], np.float64), np.zeros([2], np.int64))
+
+  def test_numpy_arrays_and_tensors_are_mixed(self):
+    @tfcontracts.ShapeContract(values={'x': ['b'], 'y': ['b']})
+    @tfcontracts.DTypeContract(same_dtype=['x', 'y'])
+    def test_func(x, y):
+      return x
+
+    test_func(np.zeros([2], np.float32), tf.zeros([2]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(np.zeros([2], np.float64), tf.zeros([2]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(np.zeros([3], np.float32), tf.zeros([2]))
+
+  def test_value_contract(self):
+    @tfcontracts.ValueContract(values={'x': (0, 1)})
+    def test_func(x):
+      return x
+
+    test_func(np.array([0.0, 1.0]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'upper bound'):
+      test_func(np.array([0.0, 2.0]))
+
+
+class AsyncContractTest(unittest.TestCase):
+  def test_awaited_results_are_checked(self):
+    @tfcontracts.ShapeContract(values={'x': ['b'], 'return': ['b', 2]})
+    async def predict(x, columns=2):
+      await asyncio.sleep(0)
+      return tf.zeros([x.shape[0], columns])
+
+    self.assertTrue(inspect.iscoroutinefunction(predict))
+    self.assertEqual('predict', predict.__name__)
+    self.assertEqual(['x', 'columns'],
+                     list(inspect.signature(predict).parameters))
+    asyncio.run(predict(tf.zeros([3])))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      asyncio.run(predict(tf.zeros([3, 1])))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      asyncio.run(predict(tf.zeros([3]), columns=3))
+
+  def test_offloaded_checks_run_in_worker_threads(self):
+    check_threads = []
+
+    class RecordingContract(tfcontracts.ValueContract):
+      def check_planned_precondition(self, plan, arguments):
+        check_threads.append(threading.current_thread())
+        super().check_planned_precondition(plan, arguments)
+
+    @tfcontracts.CombinedContract([
+        tfcontracts.DTypeContract(x=tf.float32),
+        RecordingContract(values={'x': 'non_negative'},
+                          offload_async_checks=True),
+    ])
+    async def predict(x):
+      return x
+
+    asyncio.run(predict(tf.ones([2])))
+    self.assertEqual(1, len(check_threads))
+    self.assertIsNot(threading.main_thread(), check_threads[0])
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'lower bound'):
+      asyncio.run(predict(-tf.ones([2])))
+
+  def test_offloaded_checks_see_context(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': ['b']}),
+        tfcontracts.ValueContract(values={'x': 'finite'},
+                                  offload_async_checks=True),
+    ])
+    async def predict(x):
+      return x
+
+    async def main():
+      with tfcontracts.DimensionScope(b=2):
+        await predict(tf.zeros([3]))
+
+    with tfcontracts.violations.collect() as collected:
+      asyncio.run(main())
+    self.assertEqual(['b'], [v.expected[0] for v in collected])
+
+
+class CompositeTensorContractTest(unittest.TestCase):
+  def test_variables(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3]})
+    @tfcontracts.DTypeContract(x=tf.float32)
+    def test_func(x):
+      return x
+
+    test_func(tf.Variable(tf.zeros([2, 3])))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.Variable(tf.zeros([2, 4])))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([tf.Variable(tf.zeros([2, 3], tf.int32))])
+
+  def test_sparse_tensors(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b']})
+    @tfcontracts.DTypeContract(x=tf.int64)
+    @tfcontracts.ValueContract(values={'x': 'non_negative'})
+    def test_func(x, y):
+      return x
+
+    sparse = tf.sparse.from_dense(tf.constant([[0, 1, 0], [2, 0, 0]],
+                                              tf.int64))
+    test_func(sparse, tf.zeros([2]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(sparse, tf.zeros([3]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.sparse.from_dense(tf.zeros([2, 3])), tf.zeros([2]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'lower bound'):
+      test_func(tf.sparse.from_dense(tf.constant([[-1, 0, 0]], tf.int64)),
+                tf.zeros([1]))
+
+  def test_ragged_tensors(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', None], 'y': ['b']})
+    @tfcontracts.ValueContract(values={'x': (0, 1)})
+    def test_func(x, y):
+      return x
+
+    ragged = tf.ragged.constant([[0.0, 1.0], [0.5]])
+    test_func(ragged, tf.zeros([2]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(ragged, tf.zeros([3]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'upper bound'):
+      test_func(tf.ragged.constant([[2.0]]), tf.zeros([1]))
+
+  def test_ragged_dimensions_only_match_none(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 'n']})
+    def test_func(x):
+      return x
+
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'ragged'):
+      test_func(tf.ragged.constant([[0.0, 1.0], [0.5]]))
+    test_func(tf.RaggedTensor.from_uniform_row_length(tf.zeros([6]), 3))
+
+  def test_composite_tensors_in_graphs(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', None], 'y': ['b', 'n']})
+    def test_func(x, y):
+      return y
+
+    @tf.function(input_signature=[
+        tf.RaggedTensorSpec([None, None], tf.float32),
+        tf.SparseTensorSpec([None, None], tf.float32)
+    ])
+    def traced_func(x, y):
+      return test_func(x, y).dense_shape
+
+    ragged = tf.ragged.constant([[0.0, 1.0], [0.5]])
+    traced_func(ragged, tf.sparse.from_dense(tf.zeros([2, 3])))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      traced_func(ragged, tf.sparse.from_dense(tf.zeros([3, 3])))
+
+
 class ShapeContractTest(unittest.TestCase):
   def tests_single_shape_contract(self):
     """Verify that a simple shape contract works as expected."""
@@ -94,6 +408,99 @@ class ShapeContractTest(unittest.TestCase):
     with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
       add_two_tensors_and_sum(tf.zeros([5]), tf.zeros([10]))
 
+  def test_wildcard_shape_contract(self):
+    @tfcontracts.ShapeContract(values={'x': [..., 'ch'], 'y': [None, 'ch']})
+    def add_two_tensors(x, y):
+      return x + y
+
+    add_two_tensors(tf.zeros([4, 5, 3]), tf.zeros([5, 3]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      add_two_tensors(tf.zeros([4, 5, 3]), tf.zeros([5, 1]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      add_two_tensors(tf.zeros([4, 5, 3]), tf.zeros([3]))
+
+  def test_eager_shape_checks_do_not_use_assert_shapes(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3]})
+    def identity(x):
+      return x
+
+    with mock.patch.object(tf.debugging, 'assert_shapes') as mocked_assert:
+      identity(tf.zeros([2, 3]))
+    mocked_assert.assert_not_called()
+
+  def test_unknown_argument_raises_at_decoration(self):
+    """Argument names are validated once, when the function is decorated."""
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+
+      @tfcontracts.ShapeContract(values={'z': [10]})
+      def add_two_tensors(x, y):
+        return x + y
+
+  def test_omitted_default_argument(self):
+    @tfcontracts.ShapeContract(values={'x': [10], 'y': [10]})
+    def add_two_tensors(x, y=None):
+      return x if y is None else x + y
+
+    add_two_tensors(tf.zeros([10]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      add_two_tensors(tf.zeros([10]), y=tf.zeros([5]))
+
+  def test_stacked_contracts(self):
+    @tfcontracts.ShapeContract(values={'x': [10]})
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def add_one(x):
+      return x + 1
+
+    self.assertEqual('add_one', add_one.__name__)
+    add_one(tf.zeros([10]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      add_one(tf.zeros([5]))
+
+
+class TraceTimeShapeContractTest(unittest.TestCase):
+  def _count_ops(self, func, *input_signature):
+    graph = tf.function(func).get_concrete_function(*input_signature).graph
+    return len(graph.get_operations())
+
+  def test_static_shapes_add_no_ops(self):
+    def add_two_tensors(x, y):
+      return x + y
+
+    contract = tfcontracts.ShapeContract(values={
+        'x': ['b', 3],
+        'y': ['b', 3],
+        'return': ['b', 3]
+    })
+    input_signature = [tf.TensorSpec([2, 3]), tf.TensorSpec([2, 3])]
+    self.assertEqual(
+        self._count_ops(add_two_tensors, *input_signature),
+        self._count_ops(contract(add_two_tensors), *input_signature))
+
+  def test_static_violation_raises_while_tracing(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b', 3]})
+    def add_two_tensors(x, y):
+      return x + y
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tf.function(add_two_tensors).get_concrete_function(
+          tf.TensorSpec([2, 3]), tf.TensorSpec([4, 3]))
+
+  def test_unknown_dimensions_are_checked_at_runtime(self):
+    def add_two_tensors(x, y):
+      return x + y
+
+    contract = tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b', 3]})
+    input_signature = [tf.TensorSpec([2, 3]), tf.TensorSpec([None, 3])]
+    self.assertGreater(
+        self._count_ops(contract(add_two_tensors), *input_signature),
+        self._count_ops(add_two_tensors, *input_signature))
+
+    traced_func = tf.function(contract(add_two_tensors),
+                              input_signature=input_signature)
+    traced_func(tf.zeros([2, 3]), tf.zeros([2, 3]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      traced_func(tf.zeros([2, 3]), tf.zeros([1, 3]))
+
 
 class CombinedContractTest(unittest.TestCase):
   def test_combined_contract(self):
@@ -105,6 +512,44 @@ class CombinedContractTest(unittest.TestCase):
 
     self.assertEqual(3, test_func(1, 2))
 
+  def test_combined_contract_checks_postconditions(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={
+            'x': [2],
+            'return': [2]
+        }),
+        tfcontracts.DTypeContract(value=tf.float32)
+    ])
+    def test_func(x, reduce):
+      return tf.reduce_sum(x) if reduce else x
+
+    test_func(tf.zeros([2]), reduce=False)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([2]), reduce=True)
+
+  def test_combined_contract_flattens_arguments_once(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': [2]}),
+        tfcontracts.DTypeContract(value=tf.float32),
+        tfcontracts.TypeCheckingContract()
+    ])
+    def test_func(x: list, y):
+      return y
+
+    x = [tf.zeros([2]), tf.zeros([2])]
+    flatten = tfcontracts.common._flatten_func_args_recursively
+    with mock.patch.object(tfcontracts.common,
+                           '_flatten_func_args_recursively',
+                           side_effect=flatten) as mocked_flatten:
+      test_func(x, y=1)
+    # 'x' is traversed once, even though two contracts inspect it.
+    self.assertEqual(1, [
+        call.args[0] is x for call in mocked_flatten.call_args_list
+    ].count(True))
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func([tf.zeros([2]), tf.zeros([2], tf.int32)], y=1)
+
 
 if __name__ == '__main__':
   unittest.main()
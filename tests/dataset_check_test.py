@@ -0,0 +1,77 @@
+"""Unit tests for checks of tf.data pipelines."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+
+class DatasetCheckTest(unittest.TestCase):
+  def test_static_spec_is_checked_without_map(self):
+    dataset = tf.data.Dataset.from_tensors({
+        'x': tf.zeros([4, 3]),
+        'y': tf.zeros([4], tf.int32)
+    })
+    contract = tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={
+            'x': ['b', 3],
+            'y': ['b']
+        }),
+        tfcontracts.DTypeContract(x=tf.float32, y=tf.int32)
+    ])
+    # The dataset is returned as is, without a map.
+    self.assertIs(dataset, dataset.apply(contract.as_dataset_check()))
+
+  def test_static_violations_raise_at_construction(self):
+    dataset = tf.data.Dataset.from_tensors((tf.zeros([4, 3]), tf.zeros([5])))
+    contract = tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b']})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      dataset.apply(contract.as_dataset_check(arg_names=['x', 'y']))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      dataset.apply(
+          tfcontracts.DTypeContract(y=tf.int32).as_dataset_check(
+              arg_names=['x', 'y']))
+
+  def test_unknown_component_names_raise(self):
+    dataset = tf.data.Dataset.from_tensors({'x': tf.zeros([3])})
+    contract = tfcontracts.ShapeContract(values={'z': [3]})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      dataset.apply(contract.as_dataset_check())
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tf.data.Dataset.from_tensors(tf.zeros([3])).apply(
+          contract.as_dataset_check())
+
+  def test_unknown_dimensions_are_checked_per_element(self):
+    dataset = tf.data.Dataset.from_generator(
+        lambda: iter([(tf.zeros([2, 3]), tf.zeros([2])),
+                      (tf.zeros([4, 3]), tf.zeros([5]))]),
+        output_signature=(tf.TensorSpec([None, 3]), tf.TensorSpec([None])))
+    contract = tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b']})
+    checked_dataset = dataset.apply(
+        contract.as_dataset_check(arg_names=['x', 'y']))
+    self.assertIsNot(dataset, checked_dataset)
+    iterator = iter(checked_dataset)
+    x, y = next(iterator)
+    self.assertEqual([2, 3], x.shape.as_list())
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      next(iterator)
+
+  def test_single_component_elements(self):
+    dataset = tf.data.Dataset.from_tensor_slices(tf.zeros([8, 3]))
+    contract = tfcontracts.ValueContract(values={'x': 'non_negative'})
+    checked_dataset = dataset.apply(contract.as_dataset_check(arg_names=['x']))
+    self.assertEqual(8, len(list(checked_dataset)))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      list(
+          tf.data.Dataset.from_tensor_slices(-tf.ones([2])).apply(
+              contract.as_dataset_check(arg_names=['x'])))
+
+
+if __name__ == '__main__':
+  unittest.main()
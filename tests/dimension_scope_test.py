@@ -0,0 +1,152 @@
+"""Unit tests for dimension scopes."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import asyncio
+import contextvars
+import threading
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+
+@tfcontracts.ShapeContract(values={'x': ['batch', 'n']})
+def encode(x):
+  return x
+
+
+@tfcontracts.ShapeContract(values={'y': ['batch']})
+def decode(y):
+  return y
+
+
+class DimensionScopeTest(unittest.TestCase):
+  def test_bindings_are_shared_across_calls(self):
+    with tfcontracts.DimensionScope() as scope:
+      encode(tf.zeros([2, 3]))
+      self.assertEqual({'batch': 2, 'n': 3}, scope.bindings)
+      decode(tf.zeros([2]))
+      with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                  'dimension scope'):
+        decode(tf.zeros([3]))
+    # Outside of the scope, calls are independent.
+    encode(tf.zeros([2, 3]))
+    decode(tf.zeros([3]))
+
+  def test_initial_sizes(self):
+    with tfcontracts.DimensionScope(batch=4):
+      decode(tf.zeros([4]))
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        encode(tf.zeros([2, 3]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.DimensionScope(batch='4')
+
+  def test_failed_checks_do_not_bind(self):
+    with tfcontracts.DimensionScope(n=4) as scope:
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        encode(tf.zeros([2, 3]))
+      self.assertEqual({'n': 4}, scope.bindings)
+
+  def test_nested_scopes(self):
+    with tfcontracts.DimensionScope(batch=2) as outer:
+      with tfcontracts.DimensionScope() as inner:
+        encode(tf.zeros([2, 3]))
+        self.assertEqual({'batch': 2, 'n': 3}, inner.bindings)
+      self.assertEqual({'batch': 2}, outer.bindings)
+      self.assertIs(outer, tfcontracts.dimension_scope.current_scope())
+    self.assertIsNone(tfcontracts.dimension_scope.current_scope())
+
+  def test_scopes_are_thread_local(self):
+    errors = []
+
+    def run():
+      try:
+        decode(tf.zeros([3]))
+      except tfcontracts.errors.InvalidArgumentError as e:
+        errors.append(e)
+
+    with tfcontracts.DimensionScope(batch=2):
+      thread = threading.Thread(target=run)
+      thread.start()
+      thread.join()
+    self.assertEqual([], errors)
+
+  def test_scopes_are_task_local(self):
+    async def call_in_scope(batch):
+      with tfcontracts.DimensionScope() as scope:
+        decode(tf.zeros([batch]))
+        await asyncio.sleep(0)
+        decode(tf.zeros([batch]))
+        return scope.bindings
+
+    async def main():
+      return await asyncio.gather(call_in_scope(2), call_in_scope(3))
+
+    self.assertEqual([{'batch': 2}, {'batch': 3}], asyncio.run(main()))
+
+  def test_tasks_in_a_shared_scope_bind_independently(self):
+    async def handle(batch):
+      decode(tf.zeros([batch]))
+      await asyncio.sleep(0)
+      return encode(tf.zeros([batch, 3])).shape[0]
+
+    async def main():
+      with tfcontracts.DimensionScope() as scope:
+        batches = await asyncio.gather(handle(2), handle(5))
+        return batches, scope.bindings
+
+    self.assertEqual(([2, 5], {}), asyncio.run(main()))
+
+  def test_threads_in_a_shared_scope_bind_independently(self):
+    errors = []
+
+    def handle(batch):
+      try:
+        decode(tf.zeros([batch]))
+        barrier.wait(timeout=10)
+        encode(tf.zeros([batch, 3]))
+      except (tfcontracts.errors.InvalidArgumentError,
+              threading.BrokenBarrierError) as e:
+        errors.append(e)
+
+    barrier = threading.Barrier(2)
+    with tfcontracts.DimensionScope():
+      threads = [
+          threading.Thread(target=contextvars.copy_context().run,
+                           args=(handle, batch)) for batch in (2, 5)
+      ]
+      for thread in threads:
+        thread.start()
+      for thread in threads:
+        thread.join()
+    self.assertEqual([], errors)
+
+  def test_cached_contract_is_checked_in_scope(self):
+    @tfcontracts.CachedContract(
+        tfcontracts.ShapeContract(values={'y': ['batch']}))
+    def cached_decode(y):
+      return y
+
+    cached_decode(tf.zeros([3]))
+    with tfcontracts.DimensionScope(batch=2):
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        cached_decode(tf.zeros([3]))
+
+  def test_graph_mode(self):
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.float32)])
+    def decode_dynamic(y):
+      return decode(y)
+
+    with tfcontracts.DimensionScope(batch=2):
+      decode_dynamic(tf.zeros([2]))
+      with self.assertRaises(tf.errors.InvalidArgumentError):
+        decode_dynamic(tf.zeros([3]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,136 @@
+"""Unit tests for checks of functions run by tf.distribute strategies."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import threading
+import tfcontracts
+import unittest
+from unittest import mock
+import tensorflow as tf
+
+try:
+  # Replicas need two devices. This fails if TensorFlow was already
+  # initialized (e.g. by other tests), in which case tests are skipped.
+  tf.config.set_logical_device_configuration(
+      tf.config.list_physical_devices('CPU')[0],
+      [tf.config.LogicalDeviceConfiguration()] * 2)
+except RuntimeError:
+  pass
+
+
+class CountingShapeContract(tfcontracts.ShapeContract):
+  def __init__(self, *args, **kwargs) -> None:
+    super().__init__(*args, **kwargs)
+    self.num_checks = 0
+
+  def check_planned_precondition(self, plan, arguments) -> None:
+    self.num_checks += 1
+    super().check_planned_precondition(plan, arguments)
+
+
+class ReplicaDetectionTest(unittest.TestCase):
+  def test_threads_outside_of_replicas_skip_detection(self):
+    results = []
+
+    def detect_twice():
+      tfcontracts.distribution.replica_id()
+      with mock.patch.object(tf.distribute, 'has_strategy') as has_strategy:
+        results.append(tfcontracts.distribution.replica_id())
+      results.append(has_strategy.called)
+
+    thread = threading.Thread(target=detect_twice)
+    thread.start()
+    thread.join()
+    self.assertEqual([None, False], results)
+
+
+class DistributionTest(unittest.TestCase):
+  def setUp(self):
+    if len(tf.config.list_logical_devices('CPU')) < 2:
+      self.skipTest('Needs two logical CPU devices.')
+    self.strategy = tf.distribute.MirroredStrategy(['/cpu:0', '/cpu:1'])
+
+  def test_replica_id(self):
+    self.assertIsNone(tfcontracts.distribution.replica_id())
+    replica_ids = []
+    self.strategy.run(
+        lambda: replica_ids.append(tfcontracts.distribution.replica_id()))
+    self.assertEqual([0, 1], replica_ids)
+
+  def test_static_checks_are_done_once_per_step(self):
+    shape_contract = CountingShapeContract(values={'x': [2]})
+
+    @shape_contract
+    def func(x):
+      return x
+
+    @tf.function
+    def step(x):
+      return self.strategy.run(func, (x, ))
+
+    self.strategy.run(func, (tf.ones([2]), ))
+    self.assertEqual(1, shape_contract.num_checks)
+    step(tf.ones([2]))
+    self.assertEqual(2, shape_contract.num_checks)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      self.strategy.run(func, (tf.ones([3]), ))
+
+  def test_replicas_with_different_shapes_are_checked(self):
+    shape_contract = CountingShapeContract(values={'x': [2]})
+
+    @shape_contract
+    def func(x):
+      return x
+
+    values = self.strategy.experimental_distribute_values_from_function(
+        lambda context: tf.ones([2 + context.replica_id_in_sync_group]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      self.strategy.run(func, (values, ))
+    self.assertEqual(2, shape_contract.num_checks)
+
+  def test_value_checks_are_reduced_across_replicas(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': [2]}),
+        tfcontracts.ValueContract(
+            values={'x': tfcontracts.value_contract.ValueSpec(low=0)})
+    ])
+    def func(x):
+      return x
+
+    @tf.function
+    def step(x):
+      return self.strategy.run(func, (x, ))
+
+    step(tf.ones([2]))
+    graph = step.get_concrete_function(tf.ones([2])).graph
+    self.assertEqual(
+        1, len([op for op in graph.get_operations() if op.type == 'Assert']))
+    # Only the second replica gets negative values.
+    values = self.strategy.experimental_distribute_values_from_function(
+        lambda context: tf.constant(
+            [1.0, -float(context.replica_id_in_sync_group)]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      step(values)
+
+  def test_eager_value_checks_are_done_by_every_replica(self):
+    @tfcontracts.ValueContract(values={'x': 'non_negative'})
+    def func(x):
+      return x
+
+    self.strategy.run(func, (tf.ones([2]), ))
+    # Only the second replica gets negative values.
+    values = self.strategy.experimental_distribute_values_from_function(
+        lambda context: tf.constant(
+            [1.0, -float(context.replica_id_in_sync_group)]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                '"x"'):
+      self.strategy.run(func, (values, ))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,103 @@
+"""Unit tests for enforcement policies."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+from unittest import mock
+import tensorflow as tf
+
+
+def make_checked_func(contract_class=tfcontracts.ShapeContract):
+  @contract_class(values={'x': [2]})
+  def test_func(x):
+    return x
+
+  return test_func
+
+
+class EnforcementTest(unittest.TestCase):
+  def tearDown(self):
+    tfcontracts.reset_policies()
+
+  def test_off_at_decoration_returns_original_function(self):
+    def test_func(x):
+      return x
+
+    tfcontracts.set_policy('off')
+    self.assertIs(test_func,
+                  tfcontracts.ShapeContract(values={'x': [2]})(test_func))
+
+  def test_off_at_runtime(self):
+    test_func = make_checked_func()
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([3]))
+    tfcontracts.set_policy('off')
+    test_func(tf.zeros([3]))
+    tfcontracts.set_policy('full')
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([3]))
+
+  def test_sample_every_n(self):
+    contract = tfcontracts.DTypeContract(value=tf.float32)
+
+    @contract
+    def test_func(x):
+      return x
+
+    tfcontracts.set_policy('sample', every_n=3)
+    with mock.patch.object(contract,
+                           'check_planned_precondition') as mocked_check:
+      for _ in range(7):
+        test_func(tf.zeros([1]))
+    self.assertEqual(3, mocked_check.call_count)
+
+  def test_sample_rate(self):
+    test_func = make_checked_func()
+    tfcontracts.set_policy('sample', rate=0.0)
+    test_func(tf.zeros([3]))
+    tfcontracts.set_policy('sample', rate=1.0)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([3]))
+
+  def test_policy_precedence(self):
+    test_func = make_checked_func()
+    tfcontracts.set_policy('off', target=tfcontracts.ShapeContract)
+    self.assertEqual('off', tfcontracts.get_policy(test_func).mode)
+    test_func(tf.zeros([3]))
+
+    tfcontracts.set_policy('full', target=test_func)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.zeros([3]))
+    # Other functions are still governed by the class policy.
+    make_checked_func()(tf.zeros([3]))
+
+    tfcontracts.clear_policy(test_func)
+    test_func(tf.zeros([3]))
+
+  def test_invalid_policies(self):
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.set_policy('sometimes')
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.set_policy('sample')
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.set_policy('sample', every_n=0)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.set_policy('full', target=lambda x: x)
+
+  def test_policy_from_environment(self):
+    with mock.patch.dict(os.environ, {
+        'TFCONTRACTS_POLICY': 'sample',
+        'TFCONTRACTS_SAMPLE_EVERY': '10'
+    }):
+      self.assertEqual(tfcontracts.enforcement.Policy('sample', every_n=10),
+                       tfcontracts.enforcement.policy_from_environment())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,138 @@
+"""Unit tests for checks of generators returned by decorated functions."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import itertools
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+from typing import Generator, Iterator
+
+
+class CheckedGeneratorTest(unittest.TestCase):
+  def tearDown(self):
+    tfcontracts.reset_policies()
+
+  def test_elements_are_checked_as_consumed(self):
+    @tfcontracts.ShapeContract(values={'n': [], 'return': [3]})
+    def batches(n):
+      for size in (3, 3, 4):
+        yield tf.zeros([size]) + n
+
+    generator = batches(tf.constant(1.0))
+    self.assertEqual([3], next(generator).shape.as_list())
+    self.assertEqual([3], next(generator).shape.as_list())
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      next(generator)
+
+  def test_preconditions_are_checked_on_call(self):
+    @tfcontracts.ShapeContract(values={'n': []})
+    def batches(n):
+      yield n
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      batches(tf.zeros([2]))
+
+  def test_streams_are_not_buffered(self):
+    @tfcontracts.DTypeContract(values={'return': tf.float32})
+    def endless():
+      while True:
+        yield tf.zeros([2])
+
+    self.assertEqual(5, len(list(itertools.islice(endless(), 5))))
+
+  def test_generator_protocol_is_preserved(self):
+    @tfcontracts.DTypeContract(values={'return': tf.int32})
+    def accumulate() -> Generator[tf.Tensor, int, str]:
+      total = tf.constant(0)
+      while True:
+        increment = yield total
+        if increment is None:
+          return 'done'
+        total += increment
+
+    generator = accumulate()
+    self.assertEqual(0, int(next(generator)))
+    self.assertEqual(2, int(generator.send(2)))
+    with self.assertRaises(StopIteration) as cm:
+      next(generator)
+    self.assertEqual('done', cm.exception.value)
+    generator = accumulate()
+    next(generator)
+    generator.close()
+    with self.assertRaises(StopIteration):
+      next(generator)
+
+  def test_yield_every_n(self):
+    @tfcontracts.ShapeContract(values={'return': [2]})
+    def sizes():
+      for size in (2, 3, 2, 3, 2, 3):
+        yield tf.zeros([size])
+
+    tfcontracts.set_policy('full', target=sizes, yield_every_n=2)
+    self.assertEqual(6, len(list(sizes())))
+    tfcontracts.set_policy('full', target=sizes)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      list(sizes())
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.set_policy('off', yield_every_n=2)
+
+  def test_type_checking_uses_element_type(self):
+    @tfcontracts.TypeCheckingContract()
+    def numbers(values) -> Iterator[int]:
+      yield from values
+
+    self.assertEqual([1, 2], list(numbers([1, 2])))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      list(numbers([1, 'two']))
+
+  def test_combined_and_cached_contracts(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.CachedContract(
+            tfcontracts.ShapeContract(values={'return': [2]})),
+        tfcontracts.TypeCheckingContract(),
+    ])
+    def tensors(values) -> Iterator[tf.Tensor]:
+      yield from values
+
+    list(tensors([tf.zeros([2]), tf.ones([2])]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      list(tensors([tf.zeros([2]), tf.zeros([3])]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      list(tensors([tf.zeros([2]), [1.0, 2.0]]))
+
+  def test_stacked_contracts(self):
+    @tfcontracts.DTypeContract(value=tf.float32)
+    @tfcontracts.ShapeContract(values={'return': [2]})
+    def inner_checked(values):
+      yield from values
+
+    @tfcontracts.ShapeContract(values={'return': [2]})
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def outer_checked(values):
+      yield from values
+
+    for tensors in (inner_checked, outer_checked):
+      list(tensors([tf.zeros([2]), tf.ones([2])]))
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        list(tensors([tf.zeros([2]), tf.zeros([3])]))
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        list(tensors([tf.zeros([2]), tf.zeros([2], tf.int32)]))
+
+  def test_generator_expressions(self):
+    @tfcontracts.ShapeContract(values={'return': [2]})
+    def tensors(values):
+      return (value for value in values)
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      list(tensors([tf.zeros([3])]))
+
+
+if __name__ == '__main__':
+  unittest.main()
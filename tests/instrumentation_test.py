@@ -0,0 +1,170 @@
+"""Unit tests for contract instrumentation."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tempfile
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+instrumentation = tfcontracts.instrumentation
+
+
+class InstrumentationTest(unittest.TestCase):
+  def setUp(self):
+    instrumentation.reset()
+    instrumentation.enable()
+
+  def tearDown(self):
+    instrumentation.disable()
+    instrumentation.reset()
+    tfcontracts.reset_policies()
+
+  def test_records_calls_and_violations(self):
+    @tfcontracts.ShapeContract(values={'x': [2]})
+    def instrumented_func(x):
+      return x
+
+    instrumented_func(tf.zeros([2]))
+    instrumented_func(tf.zeros([2]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      instrumented_func(tf.zeros([3]))
+
+    [stats] = instrumentation.query(function_name='instrumented_func')
+    self.assertEqual('ShapeContract', stats['contract_type'])
+    self.assertEqual(2, stats['checked_calls'])
+    self.assertEqual(1, stats['violations'])
+    self.assertEqual(2, stats['precondition']['count'])
+    self.assertGreater(stats['precondition']['total_s'], 0.0)
+    self.assertLessEqual(stats['precondition']['p50_s'],
+                         stats['precondition']['max_s'])
+
+  def test_records_skipped_calls_and_cache_hits(self):
+    @tfcontracts.CachedContract(tfcontracts.DTypeContract(value=tf.float32))
+    def instrumented_func(x):
+      return x
+
+    for _ in range(3):
+      instrumented_func(tf.zeros([2]))
+    tfcontracts.set_policy('off')
+    instrumented_func(tf.zeros([2]))
+
+    [stats] = instrumentation.query(contract_type='CachedContract')
+    self.assertEqual(3, stats['checked_calls'])
+    self.assertEqual(1, stats['skipped_calls'])
+    # Preconditions and postconditions are looked up separately.
+    self.assertEqual(4, stats['cache_hits'])
+    self.assertEqual(2, stats['cache_misses'])
+
+  def test_records_collected_violations(self):
+    @tfcontracts.ShapeContract(values={'x': [2], 'return': [2]})
+    def instrumented_func(x):
+      return x
+
+    with tfcontracts.violations.collect() as collected:
+      instrumented_func(tf.zeros([3]))
+    self.assertEqual(2, len(collected))
+
+    [stats] = instrumentation.query(function_name='instrumented_func')
+    self.assertEqual(1, stats['checked_calls'])
+    self.assertEqual(2, stats['violations'])
+
+  def test_records_members_of_combined_contract(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': [2]}),
+        tfcontracts.DTypeContract(value=tf.float32)
+    ])
+    def instrumented_func(x):
+      return x
+
+    instrumented_func(tf.zeros([2]))
+    with tfcontracts.violations.collect():
+      instrumented_func(tf.zeros([3]))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      instrumented_func(tf.zeros([2], tf.int32))
+
+    stats_by_type = {
+        stats['contract_type']: stats
+        for stats in instrumentation.query(function_name='instrumented_func')
+    }
+    self.assertEqual({'CombinedContract', 'ShapeContract', 'DTypeContract'},
+                     set(stats_by_type))
+    shape_stats = stats_by_type['ShapeContract']
+    self.assertEqual('CombinedContract', shape_stats['member_of'])
+    self.assertEqual(3, shape_stats['checked_calls'])
+    self.assertEqual(1, shape_stats['violations'])
+    self.assertEqual(3, shape_stats['precondition']['count'])
+    self.assertEqual(2, shape_stats['postcondition']['count'])
+    dtype_stats = stats_by_type['DTypeContract']
+    self.assertEqual(2, dtype_stats['checked_calls'])
+    self.assertEqual(1, dtype_stats['violations'])
+    self.assertIsNone(stats_by_type['CombinedContract']['member_of'])
+    self.assertEqual(2, stats_by_type['CombinedContract']['violations'])
+
+  def test_records_checks_of_cached_contract_member(self):
+    @tfcontracts.CachedContract(tfcontracts.DTypeContract(value=tf.float32))
+    def instrumented_func(x):
+      return x
+
+    for _ in range(3):
+      instrumented_func(tf.zeros([2]))
+
+    [stats] = instrumentation.query(contract_type='DTypeContract')
+    self.assertEqual('CachedContract', stats['member_of'])
+    # Only cache misses are checked by the member.
+    self.assertEqual(1, stats['checked_calls'])
+
+  def test_disabled(self):
+    instrumentation.disable()
+
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def instrumented_func(x):
+      return x
+
+    instrumented_func(tf.zeros([2]))
+    self.assertEqual([], instrumentation.query())
+
+  def test_export(self):
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def instrumented_func(x):
+      return x
+
+    instrumented_func(tf.zeros([2]))
+    exported = []
+    instrumentation.export(exported.extend)
+    self.assertEqual(1, len(exported))
+
+  def test_write_summaries(self):
+    try:
+      import tensorboard
+    except ImportError:
+      self.skipTest('tf.summary requires tensorboard.')
+
+    @tfcontracts.DTypeContract(value=tf.float32)
+    def instrumented_func(x):
+      return x
+
+    instrumented_func(tf.zeros([2]))
+    with tempfile.TemporaryDirectory() as logdir:
+      with tf.summary.create_file_writer(logdir).as_default():
+        instrumentation.write_summaries(step=0)
+      self.assertTrue(os.listdir(logdir))
+
+  def test_latency_histogram(self):
+    histogram = instrumentation.LatencyHistogram()
+    for seconds in [1e-6, 1e-5, 1e-4, 1e-3]:
+      histogram.record(seconds)
+    self.assertEqual(4, histogram.count)
+    self.assertEqual(1e-3, histogram.max)
+    self.assertGreaterEqual(histogram.percentile(50), 1e-5)
+    self.assertLess(histogram.percentile(50), 1e-4)
+    self.assertEqual(1e-3, histogram.percentile(100))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,82 @@
+"""Unit tests for shape unification."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+shape_unification = tfcontracts.shape_unification
+
+
+def unify(tensors_and_specs, bindings=None):
+  return shape_unification.unify(
+      [(tensor, shape_unification.compile_shape_spec(spec))
+       for tensor, spec in tensors_and_specs], bindings)
+
+
+class CompileShapeSpecTest(unittest.TestCase):
+  def test_compile(self):
+    compiled = shape_unification.compile_shape_spec([..., 'b', '3', None, '.'])
+    self.assertTrue(compiled.has_ellipsis)
+    self.assertEqual(('b', 3, None, None), compiled.dims)
+    self.assertEqual((1, ), shape_unification.compile_shape_spec([]).dims)
+    self.assertTrue(
+        shape_unification.compile_shape_spec(['*', 2]).has_ellipsis)
+
+  def test_invalid_specs(self):
+    for spec in ['abc', 3, [2, ...], [1.5]]:
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+        shape_unification.compile_shape_spec(spec)
+
+
+class UnifyTest(unittest.TestCase):
+  def test_symbolic_dimensions(self):
+    bindings = {}
+    self.assertEqual([],
+                     unify([(tf.zeros([2, 3]), ['b', 'n']),
+                            (tf.zeros([2]), ['b'])], bindings))
+    self.assertEqual({'b': 2, 'n': 3}, bindings)
+    with self.assertRaises(shape_unification.ShapeMismatchError):
+      unify([(tf.zeros([2, 3]), ['b', 'n']), (tf.zeros([3]), ['b'])])
+
+  def test_initial_bindings(self):
+    with self.assertRaises(shape_unification.ShapeMismatchError):
+      unify([(tf.zeros([2]), ['b'])], {'b': 3})
+
+  def test_wildcards(self):
+    unify([(tf.zeros([2, 3]), [None, None]), (tf.zeros([4, 5, 3]), [..., 3]),
+           (tf.zeros([3]), [..., 'n'])])
+    with self.assertRaises(shape_unification.ShapeMismatchError):
+      unify([(tf.zeros([2, 3, 4]), [None, None])])
+    with self.assertRaises(shape_unification.ShapeMismatchError):
+      unify([(tf.zeros([2]), [..., 2, 2])])
+
+  def test_scalars(self):
+    # Same as tf.debugging.assert_shapes: scalars and empty specifications
+    # are treated as having a single dimension of size one.
+    unify([(tf.zeros([]), []), (tf.zeros([1]), []), (tf.zeros([]), [1])])
+
+  def test_dynamic_dimensions(self):
+    @tf.function(input_signature=[tf.TensorSpec([None, 3])])
+    def test_func(x):
+      bindings = {}
+      dynamic_tensors_and_shapes = unify([(x, ['b', 'n']),
+                                          (tf.zeros([5, 3]), ['b', 'n'])],
+                                         bindings)
+      self.assertEqual(1, len(dynamic_tensors_and_shapes))
+      self.assertEqual(
+          [5, 3],
+          dynamic_tensors_and_shapes[0][1].as_assert_shapes_spec(bindings))
+      return x
+
+    test_func(tf.zeros([5, 3]))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,240 @@
+"""Unit tests for ValueContract."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+from unittest import mock
+
+
+class ValueContractTest(unittest.TestCase):
+  def test_interval_contract(self):
+    @tfcontracts.ValueContract(values={'x': (0.0, 1.0)})
+    def identity(x):
+      return x
+
+    identity(tf.constant([0.0, 0.5, 1.0]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'lower bound'):
+      identity(tf.constant([-0.5, 0.5]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'upper bound'):
+      identity(tf.constant([0.5, 1.5]))
+
+  def test_non_negative_and_finite_contract(self):
+    @tfcontracts.ValueContract(values={
+        'x': 'non_negative',
+        'y': 'finite',
+        'return': {
+            'high': 10
+        }
+    })
+    def add(x, y):
+      return x + (y[0] if isinstance(y, list) else y)
+
+    add(tf.constant([0, 1]), tf.constant([1, 2]))
+    add(tf.constant([0.0]), [tf.constant([1.0]), 'not a tensor'])
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                '"x"'):
+      add(tf.constant([-1.0]), tf.constant([1.0]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'not finite'):
+      add(tf.constant([1.0]),
+          [tf.constant([0.0]), tf.constant([float('nan')])])
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                '"return"'):
+      add(tf.constant([5.0]), tf.constant([6.0]))
+
+  def test_single_host_sync_per_call(self):
+    @tfcontracts.ValueContract(values={'x': 'non_negative', 'y': (0, 1)})
+    def add(x, y):
+      return x + y
+
+    with mock.patch.object(tfcontracts.value_contract.tf,
+                           'reduce_all',
+                           wraps=tf.reduce_all) as mocked_reduce_all:
+      add(tf.ones([4, 4]), tf.zeros([4, 4]))
+    # One reduction per tensor, and one of the stacked results.
+    self.assertEqual(3, mocked_reduce_all.call_count)
+
+  def test_graph_mode_uses_single_assert(self):
+    @tfcontracts.ValueContract(values={'x': 'non_negative', 'y': (0, 1)})
+    def add(x, y):
+      return x + y
+
+    traced_add = tf.function(add, autograph=False)
+    graph = traced_add.get_concrete_function(tf.TensorSpec([None]),
+                                             tf.TensorSpec([None])).graph
+    num_asserts = sum(op.type == 'Assert' for op in graph.get_operations())
+    self.assertEqual(1, num_asserts)
+    traced_add(tf.ones([2]), tf.zeros([2]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      traced_add(tf.ones([2]), tf.constant([0.0, 2.0]))
+
+  def test_invalid_value_specifications(self):
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.ValueContract(values={'x': 'positive'})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.ValueContract(values={'x': (1, 0)})
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.ValueContract(values={'x': {'minimum': 0}})
+
+
+class FiniteContractTest(unittest.TestCase):
+  def test_all_floating_arguments_and_return_value_are_checked(self):
+    @tfcontracts.FiniteContract()
+    def log(x, counts):
+      return tf.math.log(x['values'][1])
+
+    log({'values': [tf.ones([2]), tf.ones([2])]}, tf.constant([1, 2]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                r"x\['values'\]\[0\]"):
+      log({'values': [tf.constant([float('inf')]), tf.ones([2])]}, 0)
+    with self.assertRaises(tfcontracts.errors.ContractViolationError) as cm:
+      log({'values': [tf.ones([2]), tf.constant([-1.0, 1.0])]}, 0)
+    self.assertEqual('return', cm.exception.violation.arg_name)
+
+  def test_listed_arguments_are_checked(self):
+    @tfcontracts.FiniteContract(['x'])
+    def add(x, y):
+      return x + y
+
+    add(tf.ones([2]), tf.constant([float('nan')] * 2))
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      add(tf.constant([float('nan')] * 2), tf.ones([2]))
+
+  def test_single_assert_with_path_in_graph_mode(self):
+    @tfcontracts.FiniteContract()
+    def add(x, y):
+      return x[0] + x[1] + y
+
+    traced_add = tf.function(add, autograph=False)
+    graph = traced_add.get_concrete_function(
+        [tf.TensorSpec([None]), tf.TensorSpec([None])],
+        tf.TensorSpec([None])).graph
+    # One assert for the arguments, and one for the return value.
+    num_asserts = sum(op.type == 'Assert' for op in graph.get_operations())
+    self.assertEqual(2, num_asserts)
+    with self.assertRaisesRegex(tf.errors.InvalidArgumentError, r'x\[1\]'):
+      traced_add([tf.ones([2]), tf.constant([1.0, float('inf')])],
+                 tf.ones([2]))
+
+  def test_every_n(self):
+    @tfcontracts.FiniteContract(every_n=2)
+    def identity(x):
+      return x
+
+    nan = tf.constant([float('nan')])
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      identity(nan)
+    identity(nan)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      identity(nan)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.FiniteContract(every_n=0)
+
+  def test_every_n_counts_steps_of_traced_functions(self):
+    @tfcontracts.FiniteContract(every_n=3)
+    def identity(x):
+      return x
+
+    traced_identity = tf.function(identity)
+
+    def num_failed_calls(x, num_calls):
+      num_failed = 0
+      for _ in range(num_calls):
+        try:
+          traced_identity(x)
+        except tf.errors.InvalidArgumentError:
+          num_failed += 1
+      return num_failed
+
+    self.assertEqual(2, num_failed_calls(tf.constant([float('nan')]), 6))
+    # A retrace continues counting.
+    self.assertEqual(1, num_failed_calls(tf.constant([1.0, float('nan')]), 3))
+
+  def test_every_n_in_combined_contract(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': [1]}),
+        tfcontracts.FiniteContract(every_n=2)
+    ])
+    def identity(x):
+      return x
+
+    nan = tf.constant([float('nan')])
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      identity(nan)
+    identity(nan)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      identity(nan)
+
+
+class DeferredValueContractTest(unittest.TestCase):
+  def setUp(self):
+    tfcontracts.deferred_checks.configure(maxsize=4)
+
+  def test_violation_is_raised_by_flush(self):
+    @tfcontracts.ValueContract(values={'x': 'non_negative'}, deferred=True)
+    def identity(x):
+      return x
+
+    identity(tf.constant([1.0]))
+    tfcontracts.deferred_checks.flush()
+    # The call itself doesn't raise, only the next flush does.
+    identity(tf.constant([-1.0]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'identity.*"x" should be >= 0'):
+      tfcontracts.deferred_checks.flush()
+    # Violations are only reported once.
+    tfcontracts.deferred_checks.flush()
+
+  def test_violation_is_raised_by_next_call(self):
+    @tfcontracts.ValueContract(values={'x': 'finite'}, deferred=True)
+    def identity(x):
+      return x
+
+    identity(tf.constant([float('inf')]))
+    tfcontracts.deferred_checks.get_default_queue()._queue.join()
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      identity(tf.constant([1.0]))
+
+  def test_violation_is_logged(self):
+    tfcontracts.deferred_checks.configure(on_violation='log')
+
+    @tfcontracts.ValueContract(values={'x': 'non_negative'}, deferred=True)
+    def identity(x):
+      return x
+
+    with self.assertLogs('tfcontracts.deferred_checks', level='ERROR') as logs:
+      identity(tf.constant([-1.0]))
+      tfcontracts.deferred_checks.flush()
+    self.assertIn('"x" should be >= 0', logs.output[0])
+
+  def test_call_does_not_wait_for_check(self):
+    @tfcontracts.ValueContract(values={'x': 'non_negative'}, deferred=True)
+    def identity(x):
+      return x
+
+    eager_tensor_class = type(tf.constant(0.0))
+    with mock.patch.object(eager_tensor_class, '__bool__',
+                           return_value=True) as mocked_bool:
+      identity(tf.constant([1.0]))
+    mocked_bool.assert_not_called()
+    tfcontracts.deferred_checks.flush()
+
+  def test_invalid_queue_arguments(self):
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.deferred_checks.DeferredCheckQueue(maxsize=0)
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.deferred_checks.DeferredCheckQueue(on_violation='ignore')
+
+
+if __name__ == '__main__':
+  unittest.main()
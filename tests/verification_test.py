@@ -0,0 +1,155 @@
+"""Unit tests for the registry and ahead-of-time verification."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import threading
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+verification = tfcontracts.verification
+
+
+def has_name_ending_with(names, suffix):
+  return any(name.endswith(suffix) for name in names)
+
+
+@tfcontracts.ShapeContract(values={'x': ['b', 'n'], 'return': ['b', 4]})
+@tfcontracts.DTypeContract(x=tf.float32)
+def dense(x):
+  return tf.matmul(x, tf.ones([3, 4]))
+
+
+@tfcontracts.ShapeContract(values={'logits': ['b', 5]})
+def head(logits):
+  return logits
+
+
+@tfcontracts.ValueContract(values={'x': 'finite'})
+def finite(x):
+  return x
+
+
+@tfcontracts.ShapeContract(values={'x': ['b']})
+def never_called(x):
+  return x
+
+
+def model(x):
+  return head(dense(x))
+
+
+class RegistryTest(unittest.TestCase):
+  def test_registered_functions(self):
+    registrations = tfcontracts.registry.registered_functions(
+        function_name='verification_test.dense')
+    self.assertEqual(['DTypeContract', 'ShapeContract'],
+                     sorted(r.contract_type for r in registrations))
+    self.assertEqual([],
+                     tfcontracts.registry.registered_functions(
+                         function_name='verification_test.dense',
+                         contract_type='ValueContract'))
+
+  def test_functions_are_unregistered_when_collected(self):
+    @tfcontracts.ShapeContract(values={'x': ['b']})
+    def temporary(x):
+      return x
+
+    self.assertEqual(
+        1, len(tfcontracts.registry.registered_functions('temporary')))
+    del temporary
+    self.assertEqual([],
+                     tfcontracts.registry.registered_functions('temporary'))
+
+
+class VerifyTest(unittest.TestCase):
+  def test_static_contracts_are_verified(self):
+    report = tfcontracts.verify(lambda x: dense(x),
+                                tf.TensorSpec([8, 3], tf.float32))
+    self.assertTrue(report.passed)
+    self.assertEqual([], report.runtime_checks)
+    self.assertEqual(4, len(report.checks))
+    self.assertTrue(
+        has_name_ending_with(report.unreached,
+                             'verification_test.never_called'))
+    self.assertFalse(
+        has_name_ending_with(report.unreached, 'verification_test.dense'))
+
+  def test_unknown_dimensions_need_runtime_checks(self):
+    report = tfcontracts.verify(model, tf.TensorSpec([None, 3], tf.float32))
+    self.assertFalse(report.passed)
+    # The return value of dense() has 4 columns, while head() expects 5.
+    self.assertEqual(1, len(report.violations))
+    self.assertTrue(
+        report.violations[0].function_name.endswith('verification_test.head'))
+    # 'b' is unknown, so it can only be checked at runtime.
+    self.assertTrue(
+        has_name_ending_with(
+            [check.function_name for check in report.runtime_checks],
+            'verification_test.dense'))
+    self.assertIsNone(report.error)
+    self.assertIn('1 violated', report.summary())
+
+  def test_all_violations_are_reported(self):
+    report = tfcontracts.verify(model, tf.TensorSpec([2, 3], tf.int32))
+    self.assertFalse(report.passed)
+    self.assertEqual('DTypeContract', report.violations[0].contract_type)
+    # Tracing stops when matmul fails on int32 inputs.
+    self.assertIsNotNone(report.error)
+
+  def test_value_contracts_need_runtime_checks(self):
+    report = tfcontracts.verify(finite, tf.TensorSpec([2], tf.float32))
+    self.assertTrue(report.passed)
+    self.assertEqual(['precondition'],
+                     [check.condition for check in report.runtime_checks])
+
+  def test_policies_do_not_apply(self):
+    tfcontracts.set_policy('sample', every_n=1000000)
+    try:
+      # The first call would be checked, so use up that one.
+      head(tf.zeros([2, 5]))
+      report = tfcontracts.verify(head, tf.TensorSpec([2, 4], tf.float32))
+    finally:
+      tfcontracts.reset_policies()
+    self.assertEqual(1, len(report.violations))
+
+  def test_other_threads_are_checked_as_usual(self):
+    @tfcontracts.ShapeContract(values={'return': [2]})
+    def tensors(values):
+      yield from values
+
+    errors = []
+
+    def consume_tensors():
+      try:
+        list(tensors([tf.zeros([3])]))
+      except tfcontracts.errors.InvalidArgumentError as e:
+        errors.append(e)
+
+    def model_with_thread(x):
+      thread = threading.Thread(target=consume_tensors)
+      thread.start()
+      thread.join()
+      return head(x)
+
+    report = tfcontracts.verify(model_with_thread,
+                                tf.TensorSpec([2, 5], tf.float32))
+    self.assertTrue(report.passed)
+    self.assertEqual(1, len(errors))
+
+  def test_traced_functions_are_retraced(self):
+    traced_dense = tf.function(dense)
+    traced_dense(tf.zeros([2, 3]))
+    report = tfcontracts.verify(traced_dense, tf.TensorSpec([2, 3]))
+    self.assertTrue(report.passed)
+    self.assertEqual(4, len(report.checks))
+    self.assertFalse(verification.is_active())
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,83 @@
+"""Unit tests for checks of XLA-compiled functions by violation flags."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+import tensorflow as tf
+
+
+@tfcontracts.CombinedContract([
+    tfcontracts.ShapeContract(values={
+        'x': ['batch', 2],
+        'y': ['batch']
+    }),
+    tfcontracts.ValueContract(values={'x': 'non_negative'})
+])
+def scale(x, y):
+  return x * tf.reduce_sum(y)
+
+
+@tfcontracts.xla_function(
+    input_signature=[tf.TensorSpec([None, 2]),
+                     tf.TensorSpec([None])])
+def compiled_scale(x, y):
+  tfcontracts.assert_in_interval(y, 0.0, 1.0)
+  return scale(x, y)
+
+
+def count_ops(graph, op_type):
+  return sum(op.type == op_type for op in graph.get_operations())
+
+
+class ViolationFlagsTest(unittest.TestCase):
+  def test_checks_are_flagged(self):
+    compiled_scale(tf.ones([3, 2]), tf.zeros([3]))
+    graph = compiled_scale.get_concrete_function().graph
+    self.assertEqual(0, count_ops(graph, 'Assert'))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                '"x" should be >= 0'):
+      compiled_scale(-tf.ones([3, 2]), tf.zeros([3]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                '"y" should have shape'):
+      compiled_scale(tf.ones([3, 2]), tf.zeros([4]))
+    with self.assertRaisesRegex(tfcontracts.errors.InvalidArgumentError,
+                                'low <= x <= high'):
+      compiled_scale(tf.ones([3, 2]), tf.fill([3], 2.0))
+
+  def test_static_checks_are_done_at_trace_time(self):
+    @tfcontracts.xla_function
+    def compiled_scale_by_ones(x):
+      return scale(x, tf.ones([3]))
+
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      compiled_scale_by_ones(tf.ones([3, 3]))
+
+  def test_flags_are_asserted_in_outer_graph(self):
+    @tf.function
+    def outer(x, y):
+      return compiled_scale(x, y)
+
+    outer(tf.ones([3, 2]), tf.zeros([3]))
+    with self.assertRaises(tf.errors.InvalidArgumentError):
+      outer(-tf.ones([3, 2]), tf.zeros([3]))
+
+  def test_contracts_assert_outside_of_flagged_functions(self):
+    self.assertFalse(tfcontracts.violation_flags.is_collecting())
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      tfcontracts.violation_flags.flag(tf.constant(True), ['check'])
+    traced_scale = tf.function(
+        scale,
+        input_signature=[tf.TensorSpec([None, 2]),
+                         tf.TensorSpec([None])])
+    graph = traced_scale.get_concrete_function().graph
+    self.assertLess(0, count_ops(graph, 'Assert'))
+
+
+if __name__ == '__main__':
+  unittest.main()
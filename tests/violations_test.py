@@ -0,0 +1,131 @@
+"""Unit tests for structured violations."""
+try:
+  from __init__ import *
+except:
+  pass
+
+import os
+os.environ['CUDA_VISIBLE_DEVICES'] = ''
+
+import tfcontracts
+import unittest
+import numpy as np
+import tensorflow as tf
+
+violations = tfcontracts.violations
+
+
+def get_violation(func, *args, **kwargs):
+  try:
+    func(*args, **kwargs)
+  except tfcontracts.errors.ContractViolationError as e:
+    return e.violation
+  raise AssertionError('Expected a violation.')
+
+
+class ViolationTest(unittest.TestCase):
+  def test_shape_violation(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 3], 'y': ['b']})
+    def test_func(x, y):
+      return y
+
+    y = {'a': [tf.zeros([2]), tf.zeros([4])]}
+    violation = get_violation(test_func, tf.zeros([2, 3]), y)
+    self.assertEqual(violations.SHAPE, violation.kind)
+    self.assertEqual('test_func', violation.function_name)
+    self.assertEqual("y['a'][1]", violation.location)
+    self.assertEqual([4], violation.actual)
+    self.assertEqual(['b'], violation.expected)
+    self.assertEqual({'b': 2}, violation.bindings)
+
+  def test_dtype_violation(self):
+    @tfcontracts.DTypeContract(x=tf.float32)
+    def test_func(x):
+      return x
+
+    violation = get_violation(test_func,
+                              (tf.zeros([2]), tf.zeros([2], tf.int32)))
+    self.assertEqual(violations.DTYPE, violation.kind)
+    self.assertEqual('x[1]', violation.location)
+    self.assertEqual('int32', violation.actual)
+
+  def test_type_violation(self):
+    @tfcontracts.TypeCheckingContract()
+    def test_func(x: int) -> int:
+      return x
+
+    violation = get_violation(test_func, list(range(1000)))
+    self.assertEqual(violations.TYPE, violation.kind)
+    self.assertEqual('list of length 1000', violation.actual)
+
+  def test_messages_do_not_format_values(self):
+    @tfcontracts.CombinedContract([
+        tfcontracts.ShapeContract(values={'x': [10]}),
+        tfcontracts.DTypeContract(x=tf.int32),
+    ])
+    def test_func(x):
+      return x
+
+    large = tf.random.uniform([1000, 1000])
+    for value in (large, [large], np.zeros([1000, 1000])):
+      with self.assertRaises(tfcontracts.errors.InvalidArgumentError) as cm:
+        test_func(value)
+      message = str(cm.exception)
+      self.assertIn('1000', message)
+      self.assertLess(len(message), 1000)
+
+  def test_long_messages_are_truncated(self):
+    violation = violations.Violation(kind=violations.TYPE,
+                                     function_name='f',
+                                     arg_name='x',
+                                     expected='a' * 10000,
+                                     actual=violations.summarize('b' * 10000))
+    self.assertLess(len(violation.render()), 1000)
+
+  def test_summarize(self):
+    self.assertEqual(
+        f'{type(tf.zeros([2, 3])).__name__}(shape=[2, 3], dtype=float32)',
+        violations.summarize(tf.zeros([2, 3])))
+    self.assertEqual('ndarray(shape=[2], dtype=int64)',
+                     violations.summarize(np.zeros([2], np.int64)))
+    self.assertEqual('dict of length 1', violations.summarize({'a': 1}))
+    self.assertEqual('3', violations.summarize(3))
+    self.assertEqual('object instance', violations.summarize(object()))
+
+
+class CollectTest(unittest.TestCase):
+  def test_violations_are_collected(self):
+    num_calls = []
+
+    @tfcontracts.ShapeContract(values={'x': [2], 'return': [3]})
+    @tfcontracts.DTypeContract(x=tf.float32)
+    @tfcontracts.ValueContract(values={'x': 'non_negative'})
+    def test_func(x):
+      num_calls.append(None)
+      return x
+
+    with violations.collect() as collected:
+      test_func(tf.constant([-1], tf.float32))
+      test_func(tf.constant([1], tf.int32))
+    self.assertEqual(2, len(num_calls))
+    self.assertEqual([
+        violations.SHAPE, violations.VALUE, violations.SHAPE, violations.SHAPE,
+        violations.DTYPE, violations.SHAPE
+    ], [violation.kind for violation in collected])
+    self.assertIn('lower bound', collected.violations[1].render())
+    # Outside of collect(), violations are raised again.
+    with self.assertRaises(tfcontracts.errors.InvalidArgumentError):
+      test_func(tf.constant([1], tf.int32))
+
+  def test_dimension_scope_is_not_updated_by_violations(self):
+    @tfcontracts.ShapeContract(values={'x': ['b', 'n'], 'y': ['n']})
+    def test_func(x, y):
+      return x
+
+    with tfcontracts.DimensionScope() as scope, violations.collect():
+      test_func(tf.zeros([2, 3]), tf.zeros([4]))
+      self.assertEqual({}, scope.bindings)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -1,9 +1,22 @@
+from . import backend
 from . import type_checking_contract
+from . import cached_contract
 from . import combined_contract
+from . import dataset_check
+from . import deferred_checks
+from . import dimension_scope
+from . import distribution
 from . import dtype_contract
 from . import shape_contract
+from . import value_contract
 from . import contract
+from . import enforcement
 from . import errors
+from . import instrumentation
+from . import registry
+from . import verification
+from . import violation_flags
+from . import violations
 from . import assert_utilities
 
 # Any externally usable contract should be derived here.
@@ -11,6 +24,9 @@ TypeCheckingContract = type_checking_contract.TypeCheckingContract
 DTypeContract = dtype_contract.DTypeContract
 ShapeContract = shape_contract.ShapeContract
 CombinedContract = combined_contract.CombinedContract
+CachedContract = cached_contract.CachedContract
+ValueContract = value_contract.ValueContract
+FiniteContract = value_contract.FiniteContract
 
 # Cannot be used directly, but users may wish to derive from this.
 FunctionContract = contract.FunctionContract
@@ -18,3 +34,19 @@ FunctionContract = contract.FunctionContract
 # Utilities.
 assert_shapes_same = assert_utilities.assert_shapes_same
 assert_in_interval = assert_utilities.assert_in_interval
+assert_all_finite = assert_utilities.assert_all_finite
+
+# Bindings of symbolic dimensions shared across calls.
+DimensionScope = dimension_scope.DimensionScope
+
+# Ahead-of-time verification.
+verify = verification.verify
+
+# Enforcement policies.
+set_policy = enforcement.set_policy
+clear_policy = enforcement.clear_policy
+get_policy = enforcement.get_policy
+reset_policies = enforcement.reset_policies
+
+# Runtime checks of XLA-compiled functions.
+xla_function = violation_flags.function
@@ -3,44 +3,170 @@
 tf.debugging.* namespace provides a number of useful convenience functions, and
 this package simply provides several basic and natural extensions.
 """
+from __future__ import annotations
 
-import tensorflow as tf
+from typing import List, Optional, Sequence, Union
 
-from typing import Any, Optional, Sequence, Union
+from .backend import tf
+from . import violation_flags
 
 Number = Union[int, float, complex]
 
 
-def assert_shapes_same(inputs: Sequence[tf.Tensor],
-                       data=None,
-                       summarize=None,
-                       message: Optional[str] = None,
-                       name: Optional[str] = None) -> tf.Operation:
+def assert_shapes_same(
+    inputs: Sequence[tf.Tensor],
+    data=None,
+    summarize=None,
+    message: Optional[str] = None,
+    name: Optional[str] = None,
+    axes: Optional[Sequence[int]] = None) -> Optional[tf.Operation]:
   """Asserts tensor shapes and dimensions are identical for all tensors.
 
-  This op checks that a collection of tensors has the same shape.
-  Internally, it simply calls tf.debugging.assert_shapes() and serves as a
-  concise replacement for explicitly listing tensors and writing out their
-  dimensions. 
+  This op checks that a collection of tensors has the same shape, or the same
+  sizes along the given axes only. It serves as a concise replacement for
+  explicitly listing tensors and writing out their dimensions.
 
   As an example, the following two perform the same check (and in fact, the
   latter is a bit more general).
-  
+
   >>> tf.debugging.assert_shapes([(x, ['batch', 'height', 'width', 'ch']),
                                   (y, ['batch', 'height', 'width', 'ch']),
                                   (z, ['batch', 'height', 'width', 'ch'])])
-  >>> assert_shapes_same([x, y, z]) 
-  
-  See tf.debugging.assert_shapes() docstring for the explanation of extra
-  arguments.
+  >>> assert_shapes_same([x, y, z])
+
+  Dimensions that are known statically are compared in Python, so if all of
+  them are known, no ops are created at all. Otherwise, shapes of all tensors
+  are stacked and compared by a single assert, regardless of the number of
+  tensors.
+
+  Args:
+    inputs: Tensors to check.
+    data: Tensors to print out if the condition is false; see
+      tf.debugging.Assert().
+    summarize: Number of entries of each tensor in `data` to print.
+    message: A string to prefix to the default message.
+    name: A name for the op.
+    axes: If set, only sizes along these axes are compared (e.g. [0] to check
+      that tensors have the same batch size), and tensors may have different
+      ranks. Negative axes count from the last dimension of each tensor.
+
+  Returns:
+    The assert op if a check had to be done at run time, None otherwise
+    (including when the check is flagged inside violation_flags.function()).
+
+  Raises:
+    ValueError if static shapes aren't the same.
   """
   if not inputs:
-    return
+    return None
   if not name:
     name = 'assert_shapes_same'
-  symbolic_shape = [f'dim_{i}' for i in range(len(inputs[0].shape))]
-  tensor_and_symbolic_shape_tuples = [(x, symbolic_shape) for x in inputs]
-  return tf.debugging.assert_shapes([(x, symbolic_shape) for x in inputs],
+  tensors = [x if tf.is_tensor(x) else tf.convert_to_tensor(x) for x in inputs]
+  ranks = [x.shape.rank for x in tensors]
+  if None in ranks and axes is None:
+    # Shapes of tensors of unknown rank can't be stacked.
+    return _assert_shapes_same_unknown_rank(tensors, data, summarize, message,
+                                            name)
+  reference_dims = _static_reference_dims(tensors, axes, message)
+  dynamic_tensors = [
+      x for x in tensors
+      if x.shape.rank is None or None in _select_dims(x.shape, axes)
+  ]
+  if not dynamic_tensors:
+    return None
+  with tf.name_scope(name):
+    if axes is None or (len(set(ranks)) == 1 and ranks[0] is not None):
+      shapes = tf.stack(tf.shape_n(dynamic_tensors))
+      if axes is not None:
+        shapes = tf.gather(shapes, [a % ranks[0] for a in axes], axis=1)
+    else:
+      shapes = tf.stack([
+          tf.gather(tf.shape(x), tf.math.floormod(axes, tf.rank(x)))
+          for x in dynamic_tensors
+      ])
+    # Dimensions that aren't known statically are compared to the first
+    # dynamic tensor.
+    is_known = [dim is not None for dim in reference_dims]
+    expected = tf.where(is_known, [dim or 0 for dim in reference_dims],
+                        shapes[0])
+    description = (
+        f'{message + " " if message else ""}Expected tensors to have the '
+        f'same {"shape" if axes is None else f"sizes along axes {axes}"}')
+    if violation_flags.is_collecting():
+      violation_flags.flag(tf.reduce_all(tf.equal(shapes, expected)),
+                           [description])
+      return None
+    if data is None:
+      data = [f'{description}, but their shapes were:', shapes]
+    return tf.debugging.Assert(tf.reduce_all(tf.equal(shapes, expected)),
+                               data,
+                               summarize=summarize)
+
+
+def _select_dims(shape: tf.TensorShape,
+                 axes: Optional[Sequence[int]]) -> List[Optional[int]]:
+  dims = shape.as_list()
+  if axes is None:
+    return dims
+  return [dims[a] for a in axes]
+
+
+def _static_reference_dims(tensors: Sequence[tf.Tensor],
+                           axes: Optional[Sequence[int]],
+                           message: Optional[str]) -> List[Optional[int]]:
+  """Returns the statically known size of every compared dimension.
+
+  Raises:
+    ValueError if ranks or statically known sizes differ.
+  """
+  prefix = f'{message} ' if message else ''
+  reference_dims = None
+  for x in tensors:
+    rank = x.shape.rank
+    if rank is None:
+      continue
+    if axes is not None and not all(-rank <= a < rank for a in axes):
+      raise ValueError(
+          f'{prefix}A tensor of shape {x.shape} doesn\'t have axes {axes}.')
+    dims = _select_dims(x.shape, axes)
+    if reference_dims is None:
+      reference_dims = dims
+      reference_shape = x.shape
+      continue
+    if len(dims) != len(reference_dims):
+      raise ValueError(f'{prefix}Expected tensors to have the same rank, but '
+                       f'their shapes were {reference_shape} and {x.shape}.')
+    for i, dim in enumerate(dims):
+      if dim is None:
+        continue
+      if reference_dims[i] is None:
+        reference_dims[i] = dim
+      elif reference_dims[i] != dim:
+        raise ValueError(
+            f'{prefix}Expected tensors to have the same '
+            f'{"shape" if axes is None else f"sizes along axes {axes}"}, but '
+            f'their shapes were {reference_shape} and {x.shape}.')
+  return reference_dims if reference_dims is not None else [None] * len(axes)
+
+
+def _assert_shapes_same_unknown_rank(tensors: Sequence[tf.Tensor], data,
+                                     summarize, message: Optional[str],
+                                     name: str) -> Optional[tf.Operation]:
+  """Falls back to tf.debugging.assert_shapes() for tensors of unknown rank."""
+  known_rank_tensors = [x for x in tensors if x.shape.rank is not None]
+  if not known_rank_tensors:
+    # The rank is unknown for every tensor, so there is nothing to build a
+    # specification from; compare the tensors to the first one instead.
+    with tf.name_scope(name):
+      reference_shape = tf.shape(tensors[0])
+      return tf.group([
+          tf.debugging.assert_equal(tf.shape(x), reference_shape, data,
+                                    summarize, message) for x in tensors[1:]
+      ])
+  symbolic_shape = [
+      f'dim_{i}' for i in range(known_rank_tensors[0].shape.rank)
+  ]
+  return tf.debugging.assert_shapes([(x, symbolic_shape) for x in tensors],
                                     data, summarize, message, name)
 
 
@@ -49,19 +175,63 @@ def assert_in_interval(x: tf.Tensor,
                        high: Union[tf.Tensor, Number],
                        message: Optional[str] = None,
                        summarize=None,
-                       name: Optional[str] = None) -> tf.Operation:
+                       name: Optional[str] = None) -> Optional[tf.Operation]:
   """Asserts that x is in closed [low, high] interval elementwise.
 
   This Op checks that `low <= x[i]` and `x[i] <= high` hold elementwise. Note
-  that the interval is closed on both sides.
+  that the interval is closed on both sides. Both bounds are checked by a
+  single assert, whose error message includes the interval. Inside
+  violation_flags.function(), the check is flagged instead, and None is
+  returned.
   """
   if not name:
     name = 'assert_in_interval'
-  # This is a bit suboptimal: the error message won't include the interval and
-  # will instead only describe a single failing side.
-  return tf.group([
-      tf.debugging.assert_greater_equal(x, low, message, summarize,
-                                        name + 'low'),
-      tf.debugging.assert_less_equal(x, high, message, summarize,
-                                     name + 'high'),
-  ])
+  with tf.name_scope(name):
+    x = tf.convert_to_tensor(x)
+    condition = tf.reduce_all(tf.logical_and(x >= low, x <= high))
+    if not message:
+      message = 'Condition low <= x <= high did not hold elementwise.'
+    if violation_flags.is_collecting():
+      violation_flags.flag(condition, [message])
+      return None
+    return tf.debugging.Assert(condition,
+                               [message, 'low:', low, 'high:', high, 'x:', x],
+                               summarize=summarize)
+
+
+def assert_all_finite(inputs: Sequence[tf.Tensor],
+                      message: Optional[str] = None,
+                      name: Optional[str] = None) -> Optional[tf.Operation]:
+  """Asserts that no floating point tensor has inf or NaN values.
+
+  Unlike calling tf.debugging.check_numerics() on every tensor, all tensors
+  are checked by a single assert (so a single host sync in eager mode), whose
+  error message lists the indices of tensors that had values that aren't
+  finite. Tensors that aren't floating point are ignored. Inside
+  violation_flags.function(), every tensor is flagged instead.
+
+  Returns:
+    The assert op, or None if no tensor is floating point or if tensors were
+    flagged.
+  """
+  if not name:
+    name = 'assert_all_finite'
+  tensors = [x if tf.is_tensor(x) else tf.convert_to_tensor(x) for x in inputs]
+  indices = [i for i, x in enumerate(tensors) if x.dtype.is_floating]
+  if not indices:
+    return None
+  with tf.name_scope(name):
+    is_finite = tf.stack(
+        [tf.reduce_all(tf.math.is_finite(tensors[i])) for i in indices])
+    if not message:
+      message = 'Expected all values to be finite.'
+    if violation_flags.is_collecting():
+      violation_flags.flag(
+          is_finite,
+          [f'{message} Tensor {i} was not finite.' for i in indices])
+      return None
+    return tf.debugging.Assert(tf.reduce_all(is_finite), [
+        message, 'Indices of tensors that were not finite:',
+        tf.boolean_mask(indices, tf.logical_not(is_finite))
+    ],
+                               summarize=len(indices))
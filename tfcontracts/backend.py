@@ -0,0 +1,165 @@
+"""Lazy access to TensorFlow, and helpers for array-like values.
+
+Importing TensorFlow takes seconds, so modules of this package refer to it
+through `backend.tf`, which imports it on first attribute access. Until
+TensorFlow is imported by someone, no value can be a tf.Tensor; checks of
+NumPy arrays and plain Python values use that to never import it.
+
+Contracts treat tf.Tensor and numpy.ndarray values alike ("arrays"): both
+have a `shape` and a `dtype` whose `name` is the same for equivalent dtypes
+(e.g. 'float32'). Static shapes of NumPy arrays are always fully known.
+tf.Variable, tf.SparseTensor and tf.RaggedTensor are arrays too; their shapes
+are checked from metadata (e.g. dense_shape and row partitions), without
+densifying them.
+"""
+import functools
+import importlib
+import sys
+
+from typing import Any, FrozenSet, List, Optional, Tuple
+
+
+class _LazyModule:
+  """A module that is imported on first attribute access."""
+  def __init__(self, name: str) -> None:
+    self._name = name
+
+  def __getattr__(self, attr: str) -> Any:
+    value = getattr(importlib.import_module(self._name), attr)
+    # Cached on the instance, so that later lookups of the same attribute
+    # don't go through __getattr__.
+    setattr(self, attr, value)
+    return value
+
+  def __repr__(self) -> str:
+    return f'<lazily imported module "{self._name}">'
+
+
+tf = _LazyModule('tensorflow')
+
+
+def is_tensorflow_loaded() -> bool:
+  """Returns true if TensorFlow has been imported."""
+  return 'tensorflow' in sys.modules
+
+
+def is_tensor_type(cls: type) -> bool:
+  """Returns true if cls is a TensorFlow array type, without importing it.
+
+  Array types are tf.Tensor, tf.Variable, tf.SparseTensor and
+  tf.RaggedTensor. All of them have static shapes and dtypes that can be
+  checked without reading their values.
+  """
+  if 'tensorflow' not in sys.modules:
+    return False
+  return issubclass(cls, _tensor_types())
+
+
+@functools.lru_cache(maxsize=None)
+def _tensor_types() -> Tuple[type, ...]:
+  return (tf.Tensor, tf.Variable, tf.SparseTensor, tf.RaggedTensor)
+
+
+def is_ragged_type(cls: type) -> bool:
+  """Returns true if cls is tf.RaggedTensor, without importing TensorFlow."""
+  return is_tensor_type(cls) and issubclass(cls, tf.RaggedTensor)
+
+
+def is_sparse_type(cls: type) -> bool:
+  """Returns true if cls is tf.SparseTensor, without importing TensorFlow."""
+  return is_tensor_type(cls) and issubclass(cls, tf.SparseTensor)
+
+
+def is_ndarray_type(cls: type) -> bool:
+  """Returns true if cls is a numpy.ndarray type, without importing NumPy."""
+  np_module = sys.modules.get('numpy')
+  return np_module is not None and issubclass(cls, np_module.ndarray)
+
+
+def static_dims(array: Any) -> Optional[List[Optional[int]]]:
+  """Returns the static shape of an array as a list, or None if rank is unknown.
+
+  Works for anything with a `shape` that is either a tuple (e.g. NumPy
+  arrays) or a tf.TensorShape.
+  """
+  shape = array.shape
+  if shape.__class__ is tuple:
+    return list(shape)
+  if shape.rank is None:
+    return None
+  return shape.as_list()
+
+
+def ragged_dims(array: Any) -> FrozenSet[int]:
+  """Returns indices of ragged dimensions of an array.
+
+  Ragged dimensions have no size, so static shapes of tf.RaggedTensor have
+  None there. Non-ragged arrays have no ragged dimensions.
+  """
+  if not is_ragged_type(type(array)):
+    return frozenset()
+  dims = set()
+  dim = 1
+  while is_ragged_type(type(array)):
+    if array.uniform_row_length is None:
+      dims.add(dim)
+    array = array.values
+    dim += 1
+  return frozenset(dims)
+
+
+def dynamic_shape(array: Any) -> Any:
+  """Returns the shape of a TensorFlow array as a 1-D int64 tensor.
+
+  Sizes are read from metadata, without reading or converting values: the
+  dense_shape of tf.SparseTensor, and row partitions and flat values of
+  tf.RaggedTensor. Ragged dimensions are reported as -1.
+  """
+  if is_sparse_type(type(array)):
+    return array.dense_shape
+  if not is_ragged_type(type(array)):
+    return tf.shape(array, out_type=tf.int64)
+  dims = [array.nrows(out_type=tf.int64)]
+  while is_ragged_type(type(array)):
+    row_length = array.uniform_row_length
+    dims.append(
+        tf.constant(-1, tf.int64) if row_length is None else tf.
+        cast(row_length, tf.int64))
+    array = array.values
+  return tf.concat(
+      [tf.stack(dims), tf.shape(array, out_type=tf.int64)[1:]], axis=0)
+
+
+def stored_values(array: Any) -> Any:
+  """Returns the values that an array stores, without copying them.
+
+  These are the `values` of tf.SparseTensor (implicit zeros aren't
+  included), the `flat_values` of tf.RaggedTensor, and the array itself
+  otherwise.
+  """
+  if is_sparse_type(type(array)):
+    return array.values
+  if is_ragged_type(type(array)):
+    return array.flat_values
+  return array
+
+
+def dtype_name(dtype: Any) -> str:
+  """Returns the name of a dtype, or anything that can be converted to one.
+
+  tf.DType names are returned as is. Other values are converted by NumPy
+  where possible (e.g. np.float32 or 'float32'), and otherwise by TensorFlow
+  (e.g. 'bfloat16'), which may import it.
+
+  Raises:
+    TypeError if the value doesn't describe a dtype.
+  """
+  if is_tensorflow_loaded():
+    return tf.as_dtype(dtype).name
+  import numpy as np
+  try:
+    return np.dtype(dtype).name
+  except TypeError:
+    if not isinstance(dtype, str):
+      raise
+  return tf.as_dtype(dtype).name
@@ -0,0 +1,203 @@
+import collections
+import threading
+
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from . import common
+from . import contract
+from . import dimension_scope
+from . import errors
+from . import instrumentation
+from . import violations
+
+
+class CacheInfo(NamedTuple):
+  """Statistics of a SignatureCache, similar to functools.lru_cache()."""
+  hits: int
+  misses: int
+  maxsize: int
+  currsize: int
+
+
+class SignatureCache:
+  """A thread-safe, bounded LRU set of call signatures that passed a check."""
+  def __init__(self, maxsize: int) -> None:
+    if maxsize <= 0:
+      raise errors.InvalidArgumentError(
+          f'Cache size should be positive, but was {maxsize}.')
+    self._maxsize = maxsize
+    self._signatures = collections.OrderedDict()
+    self._lock = threading.Lock()
+    self._hits = 0
+    self._misses = 0
+
+  def lookup(self, signature: Hashable) -> bool:
+    """Returns true if the signature is in the cache, updating statistics."""
+    with self._lock:
+      if signature in self._signatures:
+        self._signatures.move_to_end(signature)
+        self._hits += 1
+        return True
+      self._misses += 1
+      return False
+
+  def add(self, signature: Hashable) -> None:
+    """Adds a signature, evicting the least recently used one if full."""
+    with self._lock:
+      self._signatures[signature] = None
+      self._signatures.move_to_end(signature)
+      if len(self._signatures) > self._maxsize:
+        self._signatures.popitem(last=False)
+
+  def clear(self) -> None:
+    """Removes all signatures and resets statistics."""
+    with self._lock:
+      self._signatures.clear()
+      self._hits = 0
+      self._misses = 0
+
+  def info(self) -> CacheInfo:
+    with self._lock:
+      return CacheInfo(hits=self._hits,
+                       misses=self._misses,
+                       maxsize=self._maxsize,
+                       currsize=len(self._signatures))
+
+
+class CachedContract(contract.FunctionContract):
+  """A contract that skips checks of calls identical to ones that passed.
+
+  Wraps another contract, and remembers signatures of calls (see
+  common.structure_signature()) that satisfied it. Subsequent calls with the
+  same signature (e.g. in a training loop where tensor shapes don't change
+  between steps) are not checked again, which reduces the cost of the contract
+  to a hash lookup. Calls with partially unknown tensor shapes, and calls
+  inside a DimensionScope, are always checked.
+
+  Only contracts whose outcome depends on static properties of the arguments
+  can be cached (see FunctionContract.is_cacheable).
+
+  Example:
+    >>> @CachedContract(ShapeContract(values={'x': ['b', 3]}), maxsize=64)
+    >>> def my_func(x):
+    >>>   # function body
+  """
+  is_cacheable = True
+
+  def __init__(self,
+               contract: contract.FunctionContract,
+               maxsize: int = 128) -> None:
+    """
+    Args:
+      contract: The contract to enforce.
+      maxsize: Maximum number of remembered signatures.
+
+    Raises:
+      InvalidArgumentError if the contract can't be cached.
+    """
+    if not contract.is_cacheable:
+      raise errors.InvalidArgumentError(
+          f'{type(contract).__name__} depends on more than static properties '
+          f'of function arguments, so its outcome cannot be cached.')
+    self._contract = contract
+    self._cache = SignatureCache(maxsize)
+
+  @property
+  def offload_async_checks(self) -> bool:
+    return self._contract.offload_async_checks
+
+  def cache_info(self) -> CacheInfo:
+    """Returns hit/miss statistics of the cache.
+
+    Calls that can't be cached (see common.structure_signature()) are neither
+    hits nor misses.
+    """
+    return self._cache.info()
+
+  def cache_clear(self) -> None:
+    """Clears the cache and its statistics."""
+    self._cache.clear()
+
+  def make_check_plan(self, func: Callable[..., Any]) -> common.CheckPlan:
+    member_plan = self._contract.make_check_plan(func)
+    return member_plan._replace(member_plans=(member_plan, ))
+
+  def check_precondition(self, func: Callable[..., Any], *args,
+                         **kwargs) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
+
+  def check_postcondition(self, func_results: Any,
+                          func: Callable[..., Any]) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    signature = self._signature(plan, arguments)
+    if signature is not None and self._lookup(plan, signature):
+      return
+    self._check_and_cache(instrumentation.PRECONDITION,
+                          self._contract.check_planned_precondition, plan,
+                          arguments, signature)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    signature = self._signature(plan, results)
+    if signature is not None and self._lookup(plan, signature):
+      return
+    self._check_and_cache(instrumentation.POSTCONDITION,
+                          self._contract.check_planned_postcondition, plan,
+                          results, signature)
+
+  def check_planned_yield(self, plan: common.CheckPlan,
+                          element: common.BoundArguments) -> None:
+    signature = self._signature(plan, element)
+    if signature is not None:
+      # Yielded elements may be checked differently from return values.
+      signature = (signature, 'yield')
+      if self._lookup(plan, signature):
+        return
+    self._check_and_cache(instrumentation.YIELD,
+                          self._contract.check_planned_yield, plan, element,
+                          signature)
+
+  def _check_and_cache(self, condition: str, check: Callable[..., None],
+                       plan: common.CheckPlan,
+                       arguments: common.BoundArguments,
+                       signature: Optional[Hashable]) -> None:
+    """Checks the call by the wrapped contract, and caches it if it passed.
+
+    If instrumentation is enabled, the check is recorded as a check of a
+    member (see instrumentation.check_member()).
+    """
+    num_collected = violations.num_collected()
+    if instrumentation.is_enabled():
+      instrumentation.check_member(type(self), type(self._contract), condition,
+                                   check, plan.member_plans[0], arguments)
+    else:
+      check(plan.member_plans[0], arguments)
+    # Inside violations.collect(), failed checks don't raise.
+    if signature is not None and violations.num_collected() == num_collected:
+      self._cache.add(signature)
+
+  def _signature(self, plan: common.CheckPlan,
+                 arguments: common.BoundArguments) -> Optional[Hashable]:
+    """Returns a cache key for the call, or None if it can't be cached."""
+    if dimension_scope.current_scope() is not None:
+      # The outcome also depends on (and updates) bindings of the scope.
+      return None
+    signature = common.structure_signature(arguments.values)
+    if signature is None:
+      return None
+    # Plans are specific to a function, so the same contract can be safely
+    # used with several functions.
+    return (plan.func, signature)
+
+  def _lookup(self, plan: common.CheckPlan, signature: Hashable) -> bool:
+    hit = self._cache.lookup(signature)
+    if instrumentation.is_enabled():
+      instrumentation.get_stats(plan.func, type(self)).record_cache_lookup(hit)
+    return hit
@@ -1,4 +1,6 @@
+from . import common
 from . import contract
+from . import instrumentation
 
 from typing import Any, Callable, Sequence
 
@@ -6,6 +8,9 @@ from typing import Any, Callable, Sequence
 class CombinedContract(contract.FunctionContract):
   """A contract that internally represents and enforces a contract collection.
 
+  Arguments are bound, and nested arguments are flattened, once per call; the
+  result is shared between all contracts in the collection.
+
   Example:
     >>> @CombinedContract(
     >>>    [ShapeContract(), DTypeContract(), ValueContract()])
@@ -15,14 +20,88 @@ class CombinedContract(contract.FunctionContract):
   def __init__(self, contracts: Sequence[contract.FunctionContract]) -> None:
     self._contracts = contracts
 
+  @property
+  def is_cacheable(self) -> bool:
+    return all(contract.is_cacheable for contract in self._contracts)
+
+  @property
+  def offload_async_checks(self) -> bool:
+    return any(contract.offload_async_checks for contract in self._contracts)
+
+  def make_check_plan(self, func: Callable[..., Any]) -> common.CheckPlan:
+    """Returns a plan that holds the plans of all contracts in the collection.
+
+    The plan itself selects the union of arguments selected by member plans.
+    """
+    member_plans = tuple(
+        contract.make_check_plan(func) for contract in self._contracts)
+    selected_names = []
+    for member_plan in member_plans:
+      if member_plan.selected_args is None:
+        selected_names = None
+        break
+      selected_names += [
+          name for name, _ in member_plan.selected_args
+          if name not in selected_names
+      ]
+    plan = common.make_check_plan(func).select(selected_names)
+    return plan._replace(member_plans=member_plans)
+
   def check_precondition(self, func: Callable[..., Any], *args,
                          **kwargs) -> None:
     """Checks that function arguments satisfy preconditions."""
-    for contract in self._contracts:
-      contract.check_precondition(func, *args, **kwargs)
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
 
   def check_postcondition(self, func_results: Any,
                           func: Callable[..., Any]) -> None:
     """Checks that function arguments satisfy postconditions."""
-    for contract in self._contracts:
-      contract.check_precondition(func_results, func)
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    arguments.share_tensors()
+    for contract, member_plan in zip(self._contracts, plan.member_plans):
+      self._check_member(contract, instrumentation.PRECONDITION,
+                         contract.check_planned_precondition, member_plan,
+                         arguments)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    results.share_tensors()
+    for contract, member_plan in zip(self._contracts, plan.member_plans):
+      self._check_member(contract, instrumentation.POSTCONDITION,
+                         contract.check_planned_postcondition, member_plan,
+                         results)
+
+  def check_runtime_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    arguments.share_tensors()
+    for contract, member_plan in zip(self._contracts, plan.member_plans):
+      contract.check_runtime_precondition(member_plan, arguments)
+
+  def check_runtime_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    results.share_tensors()
+    for contract, member_plan in zip(self._contracts, plan.member_plans):
+      contract.check_runtime_postcondition(member_plan, results)
+
+  def check_planned_yield(self, plan: common.CheckPlan,
+                          element: common.BoundArguments) -> None:
+    element.share_tensors()
+    for contract, member_plan in zip(self._contracts, plan.member_plans):
+      self._check_member(contract, instrumentation.YIELD,
+                         contract.check_planned_yield, member_plan, element)
+
+  def _check_member(self, member: contract.FunctionContract, condition: str,
+                    check: Callable[..., None], plan: common.CheckPlan,
+                    arguments: common.BoundArguments) -> None:
+    """Runs a check of a member, recording its statistics if enabled."""
+    if instrumentation.is_enabled():
+      instrumentation.check_member(type(self), type(member), condition, check,
+                                   plan, arguments)
+    else:
+      check(plan, arguments)
@@ -1,11 +1,195 @@
+from __future__ import annotations
+
+import dataclasses
 import inspect
-import tensorflow as tf
 
-from typing import Any, Dict, List, Mapping, Sequence
+from typing import (Any, Callable, Dict, Iterable, Iterator, List, Mapping,
+                    NamedTuple, Optional, Sequence, Tuple)
 
+from .backend import tf
+from . import backend
 from . import errors
 
 
+class CheckPlan(NamedTuple):
+  """Immutable description of how a contract inspects a single function.
+
+  A plan is made once, when a contract decorates a function, so that the
+  per-call path only has to index into `args` and `kwargs` instead of
+  introspecting the function again.
+
+  Attributes:
+    func: The decorated function.
+    function_name: Name of the function, used in error messages.
+    arg_names: Names of positional arguments, in order.
+    keyword_only_arg_names: Names of keyword-only arguments.
+    accepts_var_kwargs: True if the function has a `**kwargs` argument.
+    defaults: Default values of arguments that have them.
+    annotations: Type annotations; the return annotation is keyed by 'return'.
+    selected_args: Pairs of (argument name, positional index) that the
+      contract inspects. Keyword-only arguments have index -1. None means
+      that the contract inspects all arguments.
+    member_plans: Plans of member contracts, for contracts that are composed
+      of other contracts (see CombinedContract).
+    compiled_checks: Checks that the contract compiled for the function, by
+      argument name (e.g. type predicates, see TypeCheckingContract).
+  """
+  func: Callable[..., Any]
+  function_name: str
+  arg_names: Tuple[str, ...]
+  keyword_only_arg_names: Tuple[str, ...] = ()
+  accepts_var_kwargs: bool = False
+  defaults: Mapping[str, Any] = {}
+  annotations: Mapping[str, Any] = {}
+  selected_args: Optional[Tuple[Tuple[str, int], ...]] = None
+  member_plans: Tuple['CheckPlan', ...] = ()
+  compiled_checks: Mapping[str, Any] = {}
+
+  def select(self, names: Optional[Sequence[str]]) -> 'CheckPlan':
+    """Returns a plan that only binds the given argument names.
+
+    The special 'return' name, as well as names that aren't a part of the
+    function signature, are ignored. Passing None selects all arguments.
+    """
+    if names is None:
+      return self._replace(selected_args=None)
+    positions = {name: i for i, name in enumerate(self.arg_names)}
+    positions.update({name: -1 for name in self.keyword_only_arg_names})
+    selected_args = []
+    for name in names:
+      if name in positions:
+        selected_args.append((name, positions[name]))
+      elif self.accepts_var_kwargs and name != 'return':
+        selected_args.append((name, -1))
+    return self._replace(selected_args=tuple(selected_args))
+
+  def bind(self, args: Sequence[Any], kwargs: Mapping[str,
+                                                      Any]) -> Dict[str, Any]:
+    """Returns a dict from argument name to value for the selected arguments.
+
+    Arguments that weren't passed by the caller (i.e. that take on their
+    default values) are omitted.
+    """
+    if self.selected_args is None:
+      outputs = dict(zip(self.arg_names, args))
+      if kwargs:
+        outputs.update(kwargs)
+      return outputs
+    outputs = {}
+    num_args = len(args)
+    for name, index in self.selected_args:
+      if 0 <= index < num_args:
+        outputs[name] = args[index]
+      elif name in kwargs:
+        outputs[name] = kwargs[name]
+    return outputs
+
+
+def make_check_plan(func: Callable[..., Any]) -> CheckPlan:
+  """Returns a plan that binds all arguments of func."""
+  function_name = getattr(func, '__name__', repr(func))
+  try:
+    signature = inspect.signature(func)
+  except (TypeError, ValueError):
+    # Some callables (e.g. builtins) don't expose a signature, so nothing
+    # can be bound by name.
+    return CheckPlan(func=func,
+                     function_name=function_name,
+                     arg_names=(),
+                     accepts_var_kwargs=True)
+  arg_names = []
+  keyword_only_arg_names = []
+  accepts_var_kwargs = False
+  defaults = {}
+  annotations = {}
+  for name, parameter in signature.parameters.items():
+    if parameter.kind in (parameter.POSITIONAL_ONLY,
+                          parameter.POSITIONAL_OR_KEYWORD):
+      arg_names.append(name)
+    elif parameter.kind == parameter.KEYWORD_ONLY:
+      keyword_only_arg_names.append(name)
+    elif parameter.kind == parameter.VAR_KEYWORD:
+      accepts_var_kwargs = True
+    if parameter.default is not parameter.empty:
+      defaults[name] = parameter.default
+    if parameter.annotation is not parameter.empty:
+      annotations[name] = parameter.annotation
+  if signature.return_annotation is not signature.empty:
+    annotations['return'] = signature.return_annotation
+  return CheckPlan(func=func,
+                   function_name=function_name,
+                   arg_names=tuple(arg_names),
+                   keyword_only_arg_names=tuple(keyword_only_arg_names),
+                   accepts_var_kwargs=accepts_var_kwargs,
+                   defaults=defaults,
+                   annotations=annotations)
+
+
+class BoundArguments:
+  """Arguments of a single function call, shared between contracts.
+
+  Arguments are bound by the plan on first access to `values`. Once tensors
+  are shared (see share_tensors()), the tensors of each argument are
+  flattened at most once, so several contracts that inspect the same call
+  don't repeat that work. Otherwise iter_tensors() yields them lazily, so
+  that a check can stop at the first offending tensor.
+  `values` holds at least the arguments selected by the plan; contracts
+  should ignore any names they don't care about.
+
+  Return values are represented by an instance whose only value is keyed by
+  'return' (see for_return_value()).
+  """
+  __slots__ = ('plan', 'args', 'kwargs', '_values', '_tensors_by_name')
+
+  def __init__(self, plan: CheckPlan, args: Sequence[Any],
+               kwargs: Mapping[str, Any]) -> None:
+    self.plan = plan
+    self.args = args
+    self.kwargs = kwargs
+    self._values = None
+    # Flattened tensors by argument name, or None unless tensors are shared.
+    self._tensors_by_name = None
+
+  @classmethod
+  def for_return_value(cls, plan: CheckPlan,
+                       func_results: Any) -> 'BoundArguments':
+    """Returns an instance that represents the function return value."""
+    arguments = cls(plan, (), {})
+    arguments._values = {'return': func_results}
+    return arguments
+
+  @property
+  def values(self) -> Dict[str, Any]:
+    """Returns a dict from argument name to value."""
+    if self._values is None:
+      self._values = self.plan.bind(self.args, self.kwargs)
+    return self._values
+
+  def share_tensors(self) -> None:
+    """Caches flattened tensors from now on, for several contracts."""
+    if self._tensors_by_name is None:
+      self._tensors_by_name = {}
+
+  def tensors(self, name: str) -> Sequence[tf.Tensor]:
+    """Returns the flattened tensors of the named argument."""
+    if self._tensors_by_name is None:
+      return _flatten_func_args_recursively(self.values[name])
+    tensors = self._tensors_by_name.get(name)
+    if tensors is None:
+      tensors = _flatten_func_args_recursively(self.values[name])
+      self._tensors_by_name[name] = tensors
+    return tensors
+
+  def iter_tensors(self, name: str) -> Iterator[tf.Tensor]:
+    """Yields the flattened tensors of the named argument.
+
+    Unless tensors are shared, they are flattened lazily.
+    """
+    if self._tensors_by_name is None:
+      return iter_tensors(self.values[name])
+    return iter(self.tensors(name))
+
+
 def get_function_args_as_dict(func, *args, **kwargs):
   """Retruns a dict with function arguments."""
   return bind_function_args(inspect.getfullargspec(func).args, *args, **kwargs)
@@ -55,18 +239,168 @@ def flatten_tensor_func_args(
 
 def _flatten_func_args_recursively(value: Any) -> Sequence[tf.Tensor]:
   """Returns a list of tensors, given arbitrarily nested input."""
-  if isinstance(value, tf.Tensor):
-    # Input is a tensor, so just return a single-item list pair.
-    return [value]
-  elif isinstance(value, Sequence) and not isinstance(value, str):
-    return flatten_list_of_lists(
-        [_flatten_func_args_recursively(x) for x in value])
-  elif isinstance(value, Mapping):
-    return flatten_list_of_lists(
-        [_flatten_func_args_recursively(x) for x in value.values()])
+  return list(iter_tensors(value))
+
+
+# Node kinds in nested structures, used by iter_tensors() and
+# structure_signature().
+_TENSOR = 'tensor'
+_LEAF = 'leaf'
+_CONTAINER = 'container'
+
+_ChildrenFn = Callable[[Any], Iterable[Any]]
+
+# Maps a type to its node kind and, for containers, to a function that returns
+# children of an instance. This way the isinstance() dispatch is done once per
+# type rather than once per value, so repeated structures are traversed
+# without it.
+_DISPATCH_BY_TYPE: Dict[type, Tuple[str, Optional[_ChildrenFn]]] = {}
+
+
+def _mapping_children(value: Mapping[Any, Any]) -> Iterable[Any]:
+  return value.values()
+
+
+def _sequence_children(value: Sequence[Any]) -> Iterable[Any]:
+  return value
+
+
+def _make_attribute_children(names: Sequence[str]) -> _ChildrenFn:
+  def attribute_children(value: Any) -> Iterable[Any]:
+    return [getattr(value, name) for name in names]
+
+  return attribute_children
+
+
+def _dispatch(cls: type) -> Tuple[str, Optional[_ChildrenFn]]:
+  """Returns the node kind and the children function for a type."""
+  dispatch = _DISPATCH_BY_TYPE.get(cls)
+  if dispatch is not None:
+    return dispatch
+  if backend.is_tensor_type(cls) or backend.is_ndarray_type(cls):
+    dispatch = (_TENSOR, None)
+  elif issubclass(cls, (str, bytes)):
+    dispatch = (_LEAF, None)
+  elif issubclass(cls, Mapping):
+    dispatch = (_CONTAINER, _mapping_children)
+  elif issubclass(cls, Sequence):
+    # Includes tuples and namedtuples.
+    dispatch = (_CONTAINER, _sequence_children)
+  elif dataclasses.is_dataclass(cls):
+    dispatch = (_CONTAINER,
+                _make_attribute_children(
+                    [field.name for field in dataclasses.fields(cls)]))
+  elif hasattr(cls, '__attrs_attrs__'):
+    dispatch = (_CONTAINER,
+                _make_attribute_children(
+                    [attribute.name for attribute in cls.__attrs_attrs__]))
+  else:
+    # Object is not a container or a Tensor, so skip checking.
+    dispatch = (_LEAF, None)
+  _DISPATCH_BY_TYPE[cls] = dispatch
+  return dispatch
+
+
+def iter_tensors(value: Any) -> Iterator[tf.Tensor]:
+  """Yields tensors in arbitrarily nested input, in depth-first order.
+
+  Arrays are yielded as leaves: tf.Tensor, tf.Variable, tf.SparseTensor,
+  tf.RaggedTensor and numpy.ndarray (see the backend module). Lists, tuples
+  (including namedtuples), other sequences, mappings, dataclasses and attrs
+  classes are traversed; other values are skipped. Every value is visited
+  exactly once and no intermediate lists are built, so callers can stop early
+  (e.g. on the first tensor that violates a contract).
+  """
+  kind, children = _dispatch(type(value))
+  if kind is _TENSOR:
+    yield value
+    return
+  if kind is _LEAF:
+    return
+  # An explicit stack of iterators avoids a chain of nested generators.
+  stack = [iter(children(value))]
+  while stack:
+    for child in stack[-1]:
+      kind, children = _dispatch(type(child))
+      if kind is _TENSOR:
+        yield child
+      elif kind is _CONTAINER:
+        stack.append(iter(children(child)))
+        break
+    else:
+      stack.pop()
+
+
+def find_path(value: Any, target: Any) -> Optional[Tuple[str, ...]]:
+  """Returns accessors that lead from value to target, or None.
+
+  Accessors are strings like '[0]', "['key']" or '.field', and target is
+  found by identity. This walks the whole structure, so it is meant for
+  describing violations rather than for checking calls.
+  """
+  if value is target:
+    return ()
+  kind, _ = _dispatch(type(value))
+  if kind is not _CONTAINER:
+    return None
+  for accessor, child in _keyed_children(value):
+    path = find_path(child, target)
+    if path is not None:
+      return (accessor, ) + path
+  return None
+
+
+def _keyed_children(value: Any) -> Iterable[Tuple[str, Any]]:
+  if isinstance(value, Mapping):
+    return ((f'[{key!r}]', child) for key, child in value.items())
+  if isinstance(value, Sequence):
+    return ((f'[{index}]', child) for index, child in enumerate(value))
+  if dataclasses.is_dataclass(value):
+    names = [field.name for field in dataclasses.fields(value)]
+  else:
+    names = [attribute.name for attribute in type(value).__attrs_attrs__]
+  return ((f'.{name}', getattr(value, name)) for name in names)
+
+
+class _UnknownShapeError(Exception):
+  """Raised internally when a signature can't be computed."""
+
+
+def structure_signature(func_args_by_name: Mapping[str, Any]) -> Optional[Any]:
+  """Returns a hashable signature of static properties of function arguments.
+
+  The signature captures the nested Python structure of each argument, the
+  static shape and dtype of every tensor in it, and the type of every other
+  leaf. Two calls with equal signatures are indistinguishable to contracts that
+  only inspect these properties (e.g. shape and dtype contracts).
+
+  Returns None if any tensor has a partially unknown shape: such calls may
+  still fail at runtime, so they can't be represented by a signature.
+  """
+  try:
+    return tuple((name, _structure_signature_recursively(value))
+                 for name, value in func_args_by_name.items())
+  except _UnknownShapeError:
+    return None
+
+
+def _structure_signature_recursively(value: Any) -> Any:
+  kind, children = _dispatch(type(value))
+  if kind is _TENSOR:
+    dims = backend.static_dims(value)
+    if dims is None or None in dims:
+      raise _UnknownShapeError()
+    return (type(value), tuple(dims), value.dtype)
+  elif kind is _CONTAINER:
+    if isinstance(value, Mapping):
+      return (type(value),
+              tuple((k, _structure_signature_recursively(x))
+                    for k, x in value.items()))
+    return (type(value),
+            tuple(
+                _structure_signature_recursively(x) for x in children(value)))
   else:
-    # Object is not a Mapping, Sequence, or a Tensor, so skip checking.
-    return []
+    return type(value)
 
 
 def check_contract_args_match_function_args(contract_arg_names: Sequence[str],
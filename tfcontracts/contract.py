@@ -1,5 +1,25 @@
 import abc
-from typing import Any, Callable
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Callable, Dict, Generator, Optional, Sequence
+
+from . import common
+from . import dataset_check
+from . import distribution
+from . import enforcement
+from . import errors
+from . import generators
+from . import instrumentation
+from . import registry
+from . import verification
+from . import violations
+
+# A check of bound arguments, by a check plan (e.g.
+# FunctionContract.check_planned_precondition()).
+_Check = Callable[[common.CheckPlan, common.BoundArguments], None]
+_Kwargs = Dict[str, Any]
 
 
 class FunctionContract(abc.ABC):
@@ -16,7 +36,22 @@ class FunctionContract(abc.ABC):
   >>> @MySafeContract()
   >>> def my_func(x, y):
   >>>   # function body
+
+  When the contract decorates a function, it first makes a "check plan" (see
+  make_check_plan()) that captures everything about the function signature
+  that the contract needs. The plan is reused on every call, so derived classes
+  that override check_planned_precondition() and
+  check_planned_postcondition() don't introspect the function per call.
   """
+  # True if the outcome of the contract only depends on static properties of
+  # the arguments (nested structure, static shapes, dtypes and Python types),
+  # in which case outcomes of its checks may be cached (see CachedContract).
+  is_cacheable = False
+  # If true, checks of calls of coroutine functions run in a worker thread
+  # (in the default executor of the event loop), so that expensive checks
+  # (e.g. ones that wait for a device) don't block the event loop.
+  offload_async_checks = False
+
   def __init__(self) -> None:
     pass
 
@@ -30,11 +65,303 @@ class FunctionContract(abc.ABC):
     """Checks that function arguments satisfy postconditions."""
     pass
 
+  def contract_arg_names(self) -> Optional[Sequence[str]]:
+    """Returns names of the arguments that the contract inspects.
+
+    The special 'return' name identifies the return value. Returning None
+    (the default) means that the contract inspects all arguments.
+    """
+    return None
+
+  def make_check_plan(self, func: Callable[..., Any]) -> common.CheckPlan:
+    """Returns a check plan for func.
+
+    This is called once, when the contract decorates the function. Argument
+    names used by the contract are validated against the function signature
+    here rather than on every call.
+
+    Raises:
+      InvalidArgumentError if the contract refers to arguments that aren't a
+        part of the function signature.
+    """
+    plan = common.make_check_plan(func)
+    contract_arg_names = self.contract_arg_names()
+    if contract_arg_names is None:
+      return plan
+    if not plan.accepts_var_kwargs:
+      common.check_contract_args_match_function_args(
+          contract_arg_names=list(contract_arg_names),
+          function_arg_names=list(plan.arg_names +
+                                  plan.keyword_only_arg_names),
+          function_name=plan.function_name)
+    return plan.select(contract_arg_names)
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    """Checks preconditions using a plan made by make_check_plan().
+
+    `arguments` may be shared with other contracts that check the same call
+    (see CombinedContract). The default implementation forwards to
+    check_precondition().
+    """
+    self.check_precondition(plan.func, *arguments.args, **arguments.kwargs)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    """Checks postconditions using a plan made by make_check_plan().
+
+    `results` holds the return value under the 'return' name. The default
+    implementation forwards to check_postcondition().
+    """
+    self.check_postcondition(results.values['return'], plan.func)
+
+  def check_planned_yield(self, plan: common.CheckPlan,
+                          element: common.BoundArguments) -> None:
+    """Checks an element yielded by a generator that the function returned.
+
+    `element` holds the element under the 'return' name. The default
+    implementation checks it like a return value.
+    """
+    self.check_planned_postcondition(plan, element)
+
+  def check_runtime_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    """Checks the preconditions that don't only depend on static properties.
+
+    Called instead of check_planned_precondition() for calls whose static
+    properties (see is_cacheable) were already checked, e.g. by another
+    replica (see the distribution module). The default implementation checks
+    everything, unless the contract is cacheable.
+    """
+    if not self.is_cacheable:
+      self.check_planned_precondition(plan, arguments)
+
+  def check_runtime_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    """Same as check_runtime_precondition(), for postconditions."""
+    if not self.is_cacheable:
+      self.check_planned_postcondition(plan, results)
+
+  def as_dataset_check(self,
+                       arg_names: Optional[Sequence[str]] = None
+                       ) -> Callable[[Any], Any]:
+    """Returns a transformation that checks tf.data datasets.
+
+    Preconditions are checked against the element_spec of the dataset once,
+    and elements are only checked if that isn't enough; see
+    dataset_check.make_dataset_check().
+
+    Example:
+      >>> dataset = dataset.apply(
+      >>>     ShapeContract(values={'x': ['b', 3]}).as_dataset_check())
+    """
+    return dataset_check.make_dataset_check(self, arg_names)
+
   def __call__(self, func: Callable[..., Any]) -> Callable[..., Any]:
+    """Returns func wrapped in a function that enforces the contract.
+
+    See the enforcement module for how to disable or sample enforcement.
+    The wrapped function is registered (see the registry module), and its
+    contract is always checked by verification.verify().
+
+    If the function returns a generator (e.g. it is a generator function),
+    its elements are checked as they are consumed (see check_planned_yield()
+    and the generators module) rather than the generator itself. Coroutine
+    functions are wrapped in a coroutine function, which checks the awaited
+    result (see offload_async_checks). Calls by replicas of a tf.distribute
+    strategy are checked once per step (see the distribution module).
+    """
+    function_enforcement = enforcement.FunctionEnforcement(type(self))
+    if function_enforcement.policy.mode == enforcement.OFF:
+      return func
+    plan = self.make_check_plan(func)
+    if inspect.iscoroutinefunction(func):
+      return self._wrap_coroutine_function(plan, function_enforcement)
+    replicated_calls = distribution.ReplicatedCalls()
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-      self.check_precondition(func, *args, **kwargs)
+      if verification.is_verifying():
+        return verification.verify_call(self, plan, args, kwargs)
+      replica_id = distribution.replica_id()
+      if replica_id is not None:
+        return self._call_replicated(plan, args, kwargs, replica_id,
+                                     replicated_calls, function_enforcement)
+      if not function_enforcement.should_check():
+        if instrumentation.is_enabled():
+          instrumentation.get_stats(plan.func,
+                                    type(self)).record_skipped_call()
+        return func(*args, **kwargs)
+      if instrumentation.is_enabled():
+        return self._call_instrumented(plan, args, kwargs,
+                                       function_enforcement.policy)
+      self.check_planned_precondition(
+          plan, common.BoundArguments(plan, args, kwargs))
       results = func(*args, **kwargs)
-      self.check_postcondition(results, func)
+      if generators.is_generator(results):
+        return self._checked_generator(plan, results,
+                                       function_enforcement.policy)
+      self.check_planned_postcondition(
+          plan, common.BoundArguments.for_return_value(plan, results))
+      return results
+
+    enforcement.attach_enforcement(wrapper, function_enforcement)
+    registry.register(wrapper, self, plan)
+    return wrapper
+
+  def _wrap_coroutine_function(
+      self, plan: common.CheckPlan,
+      function_enforcement: enforcement.FunctionEnforcement
+  ) -> Callable[..., Any]:
+    """Same as __call__(), for coroutine functions."""
+    func = plan.func
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+      if not function_enforcement.should_check():
+        if instrumentation.is_enabled():
+          instrumentation.get_stats(plan.func,
+                                    type(self)).record_skipped_call()
+        return await func(*args, **kwargs)
+      stats = None
+      if instrumentation.is_enabled():
+        stats = instrumentation.get_stats(plan.func, type(self))
+      num_collected = violations.num_collected()
+      try:
+        start = time.perf_counter()
+        await self._run_async_check(self.check_planned_precondition, plan,
+                                    common.BoundArguments(plan, args, kwargs))
+        precondition_seconds = time.perf_counter() - start
+        results = await func(*args, **kwargs)
+        start = time.perf_counter()
+        await self._run_async_check(
+            self.check_planned_postcondition, plan,
+            common.BoundArguments.for_return_value(plan, results))
+        postcondition_seconds = time.perf_counter() - start
+      except errors.InvalidArgumentError:
+        if stats is not None:
+          stats.record_violation()
+        raise
+      if stats is not None:
+        stats.record_checked_call(precondition_seconds, postcondition_seconds)
+        stats.record_collected_violations(num_collected)
       return results
 
+    enforcement.attach_enforcement(wrapper, function_enforcement)
+    registry.register(wrapper, self, plan)
     return wrapper
+
+  async def _run_async_check(self, check: _Check, plan: common.CheckPlan,
+                             arguments: common.BoundArguments) -> None:
+    if not self.offload_async_checks:
+      check(plan, arguments)
+      return
+    # Imported here, so that importing the library doesn't import asyncio.
+    import asyncio
+    # Same as asyncio.to_thread() (Python 3.9+): context variables are copied,
+    # so dimension scopes and violation collectors (see the dimension_scope
+    # and violations modules) apply.
+    context = contextvars.copy_context()
+    await asyncio.get_running_loop().run_in_executor(
+        None, functools.partial(context.run, check, plan, arguments))
+
+  def _call_replicated(
+      self, plan: common.CheckPlan, args: Sequence[Any], kwargs: _Kwargs,
+      replica_id: int, replicated_calls: distribution.ReplicatedCalls,
+      function_enforcement: enforcement.FunctionEnforcement) -> Any:
+    """Calls the function like the wrapper does, on a replica.
+
+    Enforcement policies are only consulted by the first replica, and static
+    properties are only checked by other replicas if they differ from those
+    that the first replica checked (see the distribution module).
+    Instrumentation doesn't record calls on replicas (only checks by members
+    of CombinedContract and CachedContract).
+    """
+    if replica_id == 0:
+      replicated_calls.should_check = function_enforcement.should_check()
+    if not replicated_calls.should_check:
+      return plan.func(*args, **kwargs)
+    self._check_replicated(self.check_planned_precondition,
+                           self.check_runtime_precondition, plan,
+                           common.BoundArguments(plan, args, kwargs),
+                           replica_id, replicated_calls, 'precondition')
+    results = plan.func(*args, **kwargs)
+    if generators.is_generator(results):
+      return self._checked_generator(plan, results,
+                                     function_enforcement.policy)
+    self._check_replicated(
+        self.check_planned_postcondition,
+        self.check_runtime_postcondition, plan,
+        common.BoundArguments.for_return_value(plan, results), replica_id,
+        replicated_calls, 'postcondition')
+    return results
+
+  def _check_replicated(self, check: _Check, check_runtime: _Check,
+                        plan: common.CheckPlan,
+                        arguments: common.BoundArguments, replica_id: int,
+                        replicated_calls: distribution.ReplicatedCalls,
+                        condition: str) -> None:
+    signature = common.structure_signature(arguments.values)
+    if replica_id == 0:
+      # Recorded before checking, since the check may pause this replica and
+      # let others run (e.g. to reduce value checks across replicas). If the
+      # first replica fails the check, the whole step fails anyway.
+      replicated_calls.signatures[condition] = signature
+      check(plan, arguments)
+    elif (signature is not None
+          and signature == replicated_calls.signatures.get(condition)):
+      check_runtime(plan, arguments)
+    else:
+      check(plan, arguments)
+
+  def _checked_generator(
+      self,
+      plan: common.CheckPlan,
+      generator: Generator[Any, Any, Any],
+      policy: enforcement.Policy,
+      stats: Optional[instrumentation.ContractStats] = None
+  ) -> generators.CheckedGenerator:
+    """Wraps a returned generator, so that its elements are checked."""
+    def check(element: Any) -> None:
+      num_collected = violations.num_collected()
+      try:
+        self.check_planned_yield(
+            plan, common.BoundArguments.for_return_value(plan, element))
+      except errors.InvalidArgumentError:
+        if stats is not None:
+          stats.record_violation()
+        raise
+      if stats is not None:
+        stats.record_collected_violations(num_collected)
+
+    yield_every_n = policy.yield_every_n or 1
+    return generators.CheckedGenerator(generator, check, yield_every_n)
+
+  def _call_instrumented(self, plan: common.CheckPlan, args: Sequence[Any],
+                         kwargs: _Kwargs, policy: enforcement.Policy) -> Any:
+    """Calls the function like the wrapper does, recording statistics.
+
+    Checks of elements yielded by a returned generator only record
+    violations, since they happen after the call.
+    """
+    stats = instrumentation.get_stats(plan.func, type(self))
+    num_collected = violations.num_collected()
+    try:
+      start = time.perf_counter()
+      self.check_planned_precondition(
+          plan, common.BoundArguments(plan, args, kwargs))
+      precondition_seconds = time.perf_counter() - start
+      results = plan.func(*args, **kwargs)
+      start = time.perf_counter()
+      if generators.is_generator(results):
+        results = self._checked_generator(plan, results, policy, stats)
+      else:
+        self.check_planned_postcondition(
+            plan, common.BoundArguments.for_return_value(plan, results))
+      postcondition_seconds = time.perf_counter() - start
+    except errors.InvalidArgumentError:
+      stats.record_violation()
+      raise
+    stats.record_checked_call(precondition_seconds, postcondition_seconds)
+    stats.record_collected_violations(num_collected)
+    return results
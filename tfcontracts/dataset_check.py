@@ -0,0 +1,132 @@
+"""Checks of tf.data pipelines against contracts.
+
+Decorating a function passed to Dataset.map() checks every element at pipeline
+throughput, even though most properties that contracts check (e.g. dtypes, and
+most dimensions) are known from Dataset.element_spec. make_dataset_check()
+instead checks element_spec once, when the pipeline is constructed, and only
+adds a map that checks elements if some checks can't be done statically (e.g.
+dimensions that are unknown in the spec, or values).
+
+Components of an element are named like arguments of a function: components
+of dict elements are named by their keys, and components of tuple elements (or
+a single component) are named by `arg_names`.
+
+Example:
+  >>> contract = ShapeContract(values={
+  >>>     'image': ['h', 'w', 3],
+  >>>     'mask': ['h', 'w']})
+  >>> dataset = dataset.apply(contract.as_dataset_check())
+"""
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence
+
+from .backend import tf
+from . import common
+from . import errors
+
+# Name of the "function" that checked elements are arguments of, used in error
+# messages.
+_ELEMENT_FUNCTION_NAME = 'dataset_element'
+
+
+def _dataset_element(**components):
+  pass
+
+
+_dataset_element.__name__ = _ELEMENT_FUNCTION_NAME
+
+
+def make_dataset_check(
+    contract: Any,
+    arg_names: Optional[Sequence[str]] = None
+) -> Callable[[tf.data.Dataset], tf.data.Dataset]:
+  """Returns a transformation that checks datasets against the contract.
+
+  Only preconditions of the contract are checked.
+
+  Args:
+    contract: A FunctionContract.
+    arg_names: Names of components of tuple elements, or the name of a
+      single-component element. Not used for dict elements.
+
+  Returns:
+    A function to pass to Dataset.apply(). It raises InvalidArgumentError if
+    the element_spec of the dataset doesn't satisfy the contract.
+  """
+  plan = contract.make_check_plan(_dataset_element)
+
+  def apply(dataset: tf.data.Dataset) -> tf.data.Dataset:
+    element_spec = dataset.element_spec
+    _check_component_names(contract, _name_components(element_spec, arg_names))
+    if not _needs_runtime_checks(contract, plan, element_spec, arg_names):
+      return dataset
+
+    def check_element(*element):
+      if len(element) == 1:
+        element = element[0]
+      contract.check_planned_precondition(
+          plan,
+          common.BoundArguments(plan, (), _name_components(element,
+                                                           arg_names)))
+      return element
+
+    return dataset.map(check_element,
+                       num_parallel_calls=tf.data.AUTOTUNE,
+                       deterministic=True)
+
+  return apply
+
+
+def _name_components(element: Any,
+                     arg_names: Optional[Sequence[str]]) -> Dict[str, Any]:
+  """Returns a dict from component name to component (or its spec)."""
+  if isinstance(element, Mapping):
+    return dict(element)
+  components = element if isinstance(element, tuple) else (element, )
+  if arg_names is None or len(arg_names) != len(components):
+    raise errors.InvalidArgumentError(
+        f'Dataset elements with {len(components)} component(s) that aren\'t '
+        f'a dict need the same number of arg_names to be checked, but '
+        f'arg_names were {arg_names}.')
+  return dict(zip(arg_names, components))
+
+
+def _check_component_names(contract: Any, components: Mapping[str,
+                                                              Any]) -> None:
+  contract_arg_names = contract.contract_arg_names()
+  if contract_arg_names is not None:
+    common.check_contract_args_match_function_args(
+        contract_arg_names=list(contract_arg_names),
+        function_arg_names=list(components),
+        function_name=_ELEMENT_FUNCTION_NAME)
+
+
+def _needs_runtime_checks(contract: Any, plan: common.CheckPlan,
+                          element_spec: Any,
+                          arg_names: Optional[Sequence[str]]) -> bool:
+  """Checks the spec, and returns true if elements still need to be checked.
+
+  The contract is applied to symbolic tensors that match element_spec. Static
+  checks raise errors right away, while checks that can't be done statically
+  add ops to the graph.
+  """
+  num_ops = []
+
+  def check_spec(*element):
+    if len(element) == 1:
+      element = element[0]
+    graph = tf.compat.v1.get_default_graph()
+    num_ops_before = len(graph.get_operations())
+    contract.check_planned_precondition(
+        plan,
+        common.BoundArguments(plan, (), _name_components(element, arg_names)))
+    num_ops.append(len(graph.get_operations()) - num_ops_before)
+
+  if isinstance(element_spec, tuple):
+    tf.function(check_spec,
+                autograph=False).get_concrete_function(*element_spec)
+  else:
+    tf.function(check_spec,
+                autograph=False).get_concrete_function(element_spec)
+  return num_ops[0] > 0
@@ -0,0 +1,177 @@
+"""Checks that are resolved in the background instead of blocking calls.
+
+Checking values of tensors in eager mode requires copying the outcome of the
+check to the host, which waits for all preceding device work to finish. A
+deferred check instead submits the (not yet computed) outcome to a bounded
+queue, and a background thread waits for it. Violations are either logged
+as soon as they are found, or raised in the caller's thread by the next
+submit() or by flush(), e.g. at the end of a training step.
+
+If the queue is full, submitting blocks until the oldest check is resolved,
+so that at most `maxsize` calls are in flight.
+
+Example:
+  >>> @ValueContract(values={'x': 'finite'}, deferred=True)
+  >>> def my_func(x):
+  >>>   # function body
+  >>>
+  >>> for batch in dataset:
+  >>>   my_func(batch)
+  >>>   tfcontracts.deferred_checks.flush()
+"""
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+
+from typing import List, NamedTuple, Optional, Tuple
+
+from .backend import tf
+from . import errors
+
+RAISE = 'raise'
+LOG = 'log'
+_ON_VIOLATION_MODES = (RAISE, LOG)
+
+_logger = logging.getLogger(__name__)
+
+
+class DeferredCheck(NamedTuple):
+  """Outcome of a check that hasn't necessarily been computed yet.
+
+  Attributes:
+    function_name: Name of the checked function, used in error messages.
+    satisfied: Boolean vector, one entry per checked predicate.
+    descriptions: Descriptions of the predicates (e.g. which argument should
+      satisfy what), used in error messages.
+  """
+  function_name: str
+  satisfied: tf.Tensor
+  descriptions: Tuple[str, ...]
+
+
+class DeferredCheckQueue:
+  """A bounded queue of deferred checks, resolved by a background thread."""
+  def __init__(self, maxsize: int = 64, on_violation: str = RAISE) -> None:
+    """
+    Args:
+      maxsize: Maximum number of unresolved checks.
+      on_violation: 'raise' to raise violations in the caller's thread (see
+        submit() and flush()), or 'log' to log them.
+
+    Raises:
+      InvalidArgumentError if the arguments are invalid.
+    """
+    if maxsize <= 0:
+      raise errors.InvalidArgumentError(
+          f'Queue size should be positive, but was {maxsize}.')
+    if on_violation not in _ON_VIOLATION_MODES:
+      raise errors.InvalidArgumentError(
+          f'on_violation should be one of {_ON_VIOLATION_MODES}, but was '
+          f'"{on_violation}".')
+    self._queue = queue.Queue(maxsize)
+    self._on_violation = on_violation
+    self._lock = threading.Lock()
+    self._violations: List[str] = []
+    self._thread: Optional[threading.Thread] = None
+
+  def submit(self, check: DeferredCheck) -> None:
+    """Queues the check, blocking while the queue is full.
+
+    Raises:
+      InvalidArgumentError if a previously submitted check failed.
+    """
+    self._raise_violations()
+    self._ensure_started()
+    self._queue.put(check)
+
+  def flush(self) -> None:
+    """Waits until all submitted checks are resolved.
+
+    Raises:
+      InvalidArgumentError if a submitted check failed.
+    """
+    self._queue.join()
+    self._raise_violations()
+
+  def _ensure_started(self) -> None:
+    if self._thread is not None:
+      return
+    with self._lock:
+      if self._thread is None:
+        thread = threading.Thread(target=self._run,
+                                  name='tfcontracts-deferred-checks',
+                                  daemon=True)
+        thread.start()
+        self._thread = thread
+
+  def _run(self) -> None:
+    while True:
+      check = self._queue.get()
+      try:
+        self._resolve(check)
+      except Exception:
+        _logger.exception('Failed to resolve a deferred check of "%s()".',
+                          check.function_name)
+      finally:
+        self._queue.task_done()
+
+  def _resolve(self, check: DeferredCheck) -> None:
+    # This waits for the device, but only blocks the background thread.
+    satisfied = check.satisfied.numpy()
+    if satisfied.all():
+      return
+    failures = [
+        description for description, ok in zip(check.descriptions, satisfied)
+        if not ok
+    ]
+    message = (f'A deferred check of "{check.function_name}()" failed: '
+               f'{"; ".join(failures)}.')
+    if self._on_violation == LOG:
+      _logger.error(message)
+      return
+    with self._lock:
+      self._violations.append(message)
+
+  def _raise_violations(self) -> None:
+    with self._lock:
+      if not self._violations:
+        return
+      violations = self._violations
+      self._violations = []
+    message = violations[0]
+    if len(violations) > 1:
+      message += f' ({len(violations) - 1} more deferred checks failed.)'
+    raise errors.InvalidArgumentError(message)
+
+
+_default_queue_lock = threading.Lock()
+_default_queue = DeferredCheckQueue()
+
+
+def get_default_queue() -> DeferredCheckQueue:
+  """Returns the queue that contracts submit deferred checks to."""
+  return _default_queue
+
+
+def configure(maxsize: int = 64, on_violation: str = RAISE) -> None:
+  """Replaces the default queue, after flushing the current one.
+
+  See DeferredCheckQueue for the arguments.
+  """
+  global _default_queue
+  new_queue = DeferredCheckQueue(maxsize, on_violation)
+  with _default_queue_lock:
+    old_queue = _default_queue
+    _default_queue = new_queue
+  old_queue.flush()
+
+
+def flush() -> None:
+  """Waits until all checks in the default queue are resolved.
+
+  Raises:
+    InvalidArgumentError if a submitted check failed.
+  """
+  get_default_queue().flush()
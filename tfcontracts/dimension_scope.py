@@ -0,0 +1,103 @@
+"""Bindings of symbolic dimensions shared by all calls in a scope.
+
+By default, symbolic dimensions of a ShapeContract (e.g. 'batch') are only
+consistent within a single call. Inside a DimensionScope, a symbol is bound to
+a size the first time any contracted call sees it statically, and every later
+call in the scope (e.g. nested sub-functions of a model) is checked against
+that binding. This catches inconsistencies between functions that per-call
+checks miss, and replaces re-deriving the size of a symbol with a dict lookup.
+
+Scopes and their bindings are stored in a context variable, so they are local
+to a thread and to an asyncio task: threads and tasks that inherit a scope
+(e.g. by contextvars.copy_context()) start with its current bindings, but
+bindings that they make are only visible to themselves. Bindings are never
+mutated, but replaced, so this needs no locks. A nested scope starts with the
+bindings of the enclosing one, and bindings made inside it don't propagate to
+the enclosing scope. Entering a scope again starts over from its initial
+sizes.
+
+Only static sizes are bound. In functions traced by tf.function, the scope is
+consulted while tracing, so a traced graph isn't checked against the bindings
+of scopes that it is later called in.
+
+Example:
+  >>> with tfcontracts.DimensionScope(batch=32):
+  >>>   logits = model(images)  # Contracts check that 'batch' is 32.
+"""
+import contextvars
+
+from typing import Dict, Mapping, NamedTuple, Optional
+
+from . import errors
+
+
+class _ScopeState(NamedTuple):
+  """An active scope, and its bindings in the current context."""
+  scope: 'DimensionScope'
+  bindings: Mapping[str, int]
+  parent: Optional['_ScopeState']
+
+
+_current_state: contextvars.ContextVar = contextvars.ContextVar(
+    'tfcontracts_dimension_scope', default=None)
+
+
+class DimensionScope:
+  """A context manager that shares bindings of symbolic dimensions."""
+  def __init__(self, **sizes: int) -> None:
+    """
+    Args:
+      **sizes: Sizes of symbolic dimensions that are known upfront.
+
+    Raises:
+      InvalidArgumentError if a size isn't a non-negative int.
+    """
+    for name, size in sizes.items():
+      if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+        raise errors.InvalidArgumentError(
+            f'Size of dimension "{name}" should be a non-negative int, but '
+            f'was "{size}".')
+    self._initial_sizes = sizes
+
+  @property
+  def bindings(self) -> Dict[str, int]:
+    """Returns a copy of the bindings of the scope in the current context.
+
+    These are its initial sizes if the scope isn't active in this context.
+    """
+    state = _current_state.get()
+    while state is not None:
+      if state.scope is self:
+        return dict(state.bindings)
+      state = state.parent
+    return dict(self._initial_sizes)
+
+  def update(self, bindings: Mapping[str, int]) -> None:
+    """Records bindings made by a check that passed.
+
+    Raises:
+      InvalidArgumentError if this isn't the innermost scope.
+    """
+    state = _current_state.get()
+    if state is None or state.scope is not self:
+      raise errors.InvalidArgumentError(
+          'Only the innermost dimension scope can be updated.')
+    _current_state.set(state._replace(bindings={**state.bindings, **bindings}))
+
+  def __enter__(self) -> 'DimensionScope':
+    parent = _current_state.get()
+    inherited = parent.bindings if parent is not None else {}
+    bindings = {**inherited, **self._initial_sizes}
+    _current_state.set(_ScopeState(self, bindings, parent))
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    # Not reset by a token, since the same scope may be entered in several
+    # contexts (and updates replace the state).
+    _current_state.set(_current_state.get().parent)
+
+
+def current_scope() -> Optional[DimensionScope]:
+  """Returns the innermost active scope, or None outside of scopes."""
+  state = _current_state.get()
+  return state.scope if state is not None else None
@@ -0,0 +1,113 @@
+"""Checks of functions that tf.distribute strategies run on several replicas.
+
+MirroredStrategy (and strategies derived from it) runs a function passed to
+Strategy.run() once per replica, in a separate thread for every replica (one
+at a time), both eagerly and while tracing tf.function. Contracts of functions
+called there would check the same static properties once per replica.
+
+Instead, the first replica checks calls fully, and remembers the static
+structure of the arguments it checked (see common.structure_signature()).
+Other replicas whose arguments have the same, fully static, structure only
+check what depends on values (see FunctionContract.check_runtime_precondition()
+and check_runtime_postcondition()). In graphs, value checks of all replicas are
+reduced with a single all-reduce and asserted once, on the first replica (see
+ValueContract). Eagerly, every replica still checks its own values, at the cost
+of one host sync per replica. Sampling decisions of enforcement policies are
+made by the first replica, so that all replicas check the same calls.
+
+Replicas are detected by the replica context of tf.distribute, whose replica
+id is looked up once per replica thread. Since the strategy starts new
+threads for replicas, a thread that first calls a contract outside of a
+replica is never a replica thread, and later calls from it skip the lookup.
+Strategies that trace a function once
+for all replicas (e.g. TPUStrategy, whose replica ids aren't known at trace
+time) don't need any of this, and check every call as usual.
+"""
+from __future__ import annotations
+
+import threading
+
+from typing import Dict, Hashable, Optional
+
+from .backend import tf
+from . import backend
+
+# Replica ids by thread, with the replica context that they were read from,
+# and whether the thread runs replicas at all.
+_replica_ids = threading.local()
+
+
+def replica_id() -> Optional[int]:
+  """Returns the id of the replica that calls this, or None.
+
+  Returns None outside of replica context of a multi-replica strategy (e.g.
+  without a strategy, or in cross-replica context), and if the replica id
+  isn't known statically.
+  """
+  is_replica_thread = getattr(_replica_ids, 'is_replica_thread', None)
+  if is_replica_thread is False:
+    return None
+  context = _replica_context()
+  if is_replica_thread is None:
+    _replica_ids.is_replica_thread = context is not None
+  if context is None:
+    return None
+  if getattr(_replica_ids, 'context', None) is not context:
+    # Read eagerly, so that graphs traced for replicas don't get a constant
+    # op on every call.
+    with tf.init_scope():
+      static_id = tf.get_static_value(context.replica_id_in_sync_group)
+    _replica_ids.context = context
+    _replica_ids.replica_id = None if static_id is None else int(static_id)
+  return _replica_ids.replica_id
+
+
+def _replica_context() -> Optional[tf.distribute.ReplicaContext]:
+  """Returns the context of the replica that calls this, or None."""
+  if not backend.is_tensorflow_loaded() or not tf.distribute.has_strategy():
+    return None
+  if tf.distribute.in_cross_replica_context():
+    return None
+  context = tf.distribute.get_replica_context()
+  if context.num_replicas_in_sync <= 1:
+    return None
+  return context
+
+
+class ReplicatedCalls:
+  """State that replicas share for calls of a single decorated function.
+
+  Attributes:
+    should_check: Whether the first replica decided to check the current call.
+    signatures: Signatures of arguments (by 'precondition' or 'postcondition')
+      that the first replica last checked.
+  """
+  def __init__(self) -> None:
+    self.should_check = True
+    self.signatures: Dict[str, Optional[Hashable]] = {}
+
+
+def reduce_satisfied(satisfied: tf.Tensor) -> Optional[tf.Tensor]:
+  """Reduces outcomes of value checks of all replicas, in graphs.
+
+  Args:
+    satisfied: Boolean vector, one entry per predicate checked by the current
+      replica. Replicas must check the same number of predicates.
+
+  Returns:
+    In a graph traced for a replica of a multi-replica strategy, None on
+    replicas other than the first one, and on the first one, the vector
+    reduced over all replicas (an entry is true if it is true on every
+    replica). Otherwise, `satisfied` as is.
+  """
+  if tf.executing_eagerly() or replica_id() is None:
+    return satisfied
+  context = tf.distribute.get_replica_context()
+  if context is None or context.num_replicas_in_sync <= 1:
+    return satisfied
+  # Counts replicas on which each predicate failed.
+  num_failed = context.all_reduce(tf.distribute.ReduceOp.SUM,
+                                  tf.cast(tf.logical_not(satisfied), tf.int32))
+  if replica_id() != 0:
+    return None
+  return tf.equal(num_failed, 0)
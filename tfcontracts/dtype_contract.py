@@ -1,100 +1,301 @@
-import typing
-import tensorflow as tf
+from __future__ import annotations
 
-from typing import Any, Callable, Dict, Sequence, Mapping, Union
+from typing import (Any, Callable, Dict, FrozenSet, Iterable, Mapping,
+                    NamedTuple, Optional, Sequence, Tuple, Union)
 
+from .backend import tf
+from . import backend
 from . import common
 from . import contract
 from . import errors
+from . import violations
 
+DTypeSpec = Union['tf.DType', Sequence['tf.DType']]
 
-class SimpleDTypeContract(contract.FunctionContract):
-  """Contract that ensures that all arguments match the given dtype.
 
-  Raises an exception if an argument or the return value is a tf.Tensor and
-  doesn't match the specified type.
-  
+class CompiledDTypes(NamedTuple):
+  """A dtype specification compiled for O(1) membership tests.
+
+  Dtypes are represented by their names (e.g. 'float32'), which are the same
+  for tf.DType and numpy.dtype, so that tensors and NumPy arrays can be
+  checked against the same specification.
+
+  Attributes:
+    spec: The original specification, used in error messages.
+    names: Names of the allowed dtypes.
+  """
+  spec: Any
+  names: FrozenSet[str]
+
+
+def compile_dtype_spec(spec: Any) -> CompiledDTypes:
+  """Compiles a dtype, or a sequence of dtypes meaning "any of them".
+
+  Anything that names a dtype (e.g. 'float32' or np.float32) can be used in
+  place of a tf.DType; see backend.dtype_name().
+
+  Raises:
+    InvalidArgumentError if the specification isn't a valid dtype.
+  """
+  if isinstance(spec, CompiledDTypes):
+    return spec
+  if (isinstance(spec, (str, bytes)) or not hasattr(spec, '__iter__')
+      or hasattr(spec, 'as_datatype_enum')):
+    # The last condition matches tf.DType without importing TensorFlow.
+    entries = [spec]
+  else:
+    entries = list(spec)
+  names = set()
+  for entry in entries:
+    try:
+      names.add(backend.dtype_name(entry))
+    except TypeError:
+      raise errors.InvalidArgumentError(
+          f'Invalid dtype "{entry}" in dtype specification "{spec}".')
+  return CompiledDTypes(spec=spec, names=frozenset(names))
+
+
+class DTypeContract(contract.FunctionContract):
+  """Contract that ensures that arguments match the given dtypes.
+
+  Raises an exception if a tf.Tensor or a NumPy array in an argument or in the
+  return value doesn't match the dtype specified for it. Dtypes can be
+  specified for all arguments at once (`value`), or for individual arguments
+  by name (the special 'return' name refers to the return value); arguments
+  that have no specification are skipped. Additionally, groups of arguments
+  may be required to share a dtype, whichever it is (`same_dtype`).
+
+  Specifications are compiled to sets of dtypes when the contract is created,
+  so checking a tensor is a set membership test.
+
   Example:
-    >>> @SimpleDTypeContract(value=[tf.float32, tf.float64])
+    >>> @DTypeContract(value=[tf.float32, tf.float64])
     >>> def my_func(x:tf.Tensor, y:tf.Tensor) -> tf.Tensor:
     >>>   # do stuff...
 
-  TODO: Support something like: SameDTypeContract() (specific dtype is
-  unimportant, but all arguments must match it).
-  TODO: Support something like: SimpleDTypeContract(x=tf.float32, y=tf.float32),
-  i.e. specify which arguments the contract applies to.
+    >>> @DTypeContract(x=tf.float32,
+    >>>                y=[tf.float16, tf.bfloat16],
+    >>>                same_dtype=['y', 'z'])
+    >>> def my_func(x:tf.Tensor, y:tf.Tensor, z:tf.Tensor) -> tf.Tensor:
+    >>>   # do stuff...
   """
+  is_cacheable = True
+
   def __init__(self,
-               value: Union[tf.DType, Sequence[tf.DType]],
+               value: Optional[DTypeSpec] = None,
                check_inputs=True,
-               check_outputs=True) -> None:
+               check_outputs=True,
+               *,
+               same_dtype: Optional[Sequence[Any]] = None,
+               values: Optional[Mapping[str, DTypeSpec]] = None,
+               **dtypes_by_name: DTypeSpec) -> None:
     """
     Args:
-      value: Desired dtype(s). A set of dtypes represents an "any-of" condition.
+      value: Desired dtype(s) of arguments that aren't named in `values` or
+        `dtypes_by_name`. A set of dtypes represents an "any-of" condition.
+        If None, such arguments aren't checked.
       check_inputs: if true, will check function input values.
       check_outputs: If true, will check function output values.
+      same_dtype: Names of arguments whose tensors must all have the same
+        dtype, or a sequence of several such groups.
+      values: Desired dtype(s) by argument name. Useful for arguments whose
+        names clash with arguments of this constructor.
+      **dtypes_by_name: Desired dtype(s) by argument name.
+
+    Raises:
+      InvalidArgumentError if a specification is invalid.
     """
     self._value = value
+    self._default_dtypes = (None
+                            if value is None else compile_dtype_spec(value))
+    self._dtypes_by_name = {
+        name: compile_dtype_spec(spec)
+        for name, spec in dict(values or {}, **dtypes_by_name).items()
+    }
+    self._same_dtype_groups = _make_same_dtype_groups(same_dtype)
     self._check_inputs = check_inputs
     self._check_outputs = check_outputs
 
+  def contract_arg_names(self) -> Optional[Sequence[str]]:
+    names = list(self._dtypes_by_name)
+    for group in self._same_dtype_groups:
+      names += [name for name in group if name not in names]
+    return names
+
+  def make_check_plan(self, func: Callable[..., Any]) -> common.CheckPlan:
+    # Named arguments are validated either way, but all arguments have to be
+    # bound if there is a default specification.
+    plan = super().make_check_plan(func)
+    if self._default_dtypes is not None:
+      return plan.select(None)
+    return plan
+
   def check_precondition(self, func: Callable[..., Any], *args,
                          **kwargs) -> None:
-    if not self._check_inputs:
-      return
-    func_args_as_dict = common.get_function_args_as_dict(func, *args, **kwargs)
-    check_argument_dtypes(func_args_as_dict, self._value, func.__name__)
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
 
   def check_postcondition(self, func_results: Any,
                           func: Callable[..., Any]) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    if not self._check_inputs:
+      return
+    for name in arguments.values:
+      compiled_dtypes = self._dtypes_by_name.get(name, self._default_dtypes)
+      if compiled_dtypes is not None and name != 'return':
+        _check_bound_argument_dtype(arguments, name, compiled_dtypes,
+                                    plan.function_name)
+    for group in self._same_dtype_groups:
+      check_same_dtype(arguments, group, plan.function_name)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
     if not self._check_outputs:
       return
-    check_argument_dtypes({'return': func_results}, self._value, func.__name__)
+    compiled_dtypes = self._dtypes_by_name.get('return', self._default_dtypes)
+    if compiled_dtypes is not None:
+      _check_bound_argument_dtype(results, 'return', compiled_dtypes,
+                                  plan.function_name)
+
+
+class SimpleDTypeContract(DTypeContract):
+  """Contract that ensures that all arguments match the given dtype.
+
+  Same as DTypeContract(value=...).
+
+  Example:
+    >>> @SimpleDTypeContract(value=[tf.float32, tf.float64])
+    >>> def my_func(x:tf.Tensor, y:tf.Tensor) -> tf.Tensor:
+    >>>   # do stuff...
+  """
+  def __init__(self,
+               value: DTypeSpec,
+               check_inputs=True,
+               check_outputs=True) -> None:
+    super().__init__(value=value,
+                     check_inputs=check_inputs,
+                     check_outputs=check_outputs)
+
+
+def _make_same_dtype_groups(
+    same_dtype: Optional[Sequence[Any]]) -> Tuple[Tuple[str, ...], ...]:
+  """Returns groups of argument names that must share a dtype."""
+  if not same_dtype:
+    return ()
+  if all(isinstance(name, str) for name in same_dtype):
+    groups = [same_dtype]
+  else:
+    groups = same_dtype
+  for group in groups:
+    is_group_of_names = (not isinstance(group, str)
+                         and all(isinstance(name, str) for name in group))
+    if not is_group_of_names:
+      raise errors.InvalidArgumentError(
+          f'same_dtype should be a sequence of argument names, or a sequence '
+          f'of such sequences, but was "{same_dtype}".')
+    if 'return' in group:
+      raise errors.InvalidArgumentError(
+          f'same_dtype can only refer to function arguments, but '
+          f'"{same_dtype}" refers to the return value.')
+  return tuple(tuple(group) for group in groups)
+
+
+def check_same_dtype(arguments: common.BoundArguments, names: Sequence[str],
+                     func_name: str) -> None:
+  """Checks that all tensors of the named arguments have the same dtype.
+
+  Arguments that weren't passed are ignored.
+  """
+  first_name = None
+  first_dtype = None
+  values = arguments.values
+  for name in names:
+    if name not in values:
+      continue
+    for tensor in arguments.iter_tensors(name):
+      if first_dtype is None:
+        first_name, first_dtype = name, tensor.dtype.name
+      elif tensor.dtype.name != first_dtype:
+        violations.report(
+            violations.Violation(
+                kind=violations.SAME_DTYPE,
+                function_name=func_name,
+                arg_name=name,
+                path=common.find_path(values[name], tensor),
+                expected=first_dtype,
+                actual=tensor.dtype.name,
+                detail=(f'Arguments {list(names)} should have the same '
+                        f'dtype, and "{first_name}" had dtype '
+                        f'"{first_dtype}".')))
+        return
 
 
 def check_argument_dtypes(func_args: Dict[str, Any],
                           desired_dtype: Union[tf.DType, Sequence[tf.DType]],
                           func_name: str) -> None:
+  compiled_dtypes = compile_dtype_spec(desired_dtype)
   for name, value in func_args.items():
-    if not check_argument_dtype_recursive(value, desired_dtype):
-      raise errors.InvalidArgumentError(
-          f'You called "{func_name}()" with an argument type that did not '
-          f'match the requested data type for "{name}". '
-          f'Actual dtype of "{value}" is not consisted '
-          f'with the expected dtype "{desired_dtype}".')
+    _check_argument_dtype(name, value, common.iter_tensors(value),
+                          compiled_dtypes, func_name)
+
+
+def check_bound_argument_dtypes(arguments: common.BoundArguments,
+                                desired_dtype: Union[DTypeSpec,
+                                                     CompiledDTypes],
+                                func_name: str) -> None:
+  """Same as check_argument_dtypes(), but reuses flattened tensors."""
+  compiled_dtypes = compile_dtype_spec(desired_dtype)
+  for name in arguments.values:
+    _check_bound_argument_dtype(arguments, name, compiled_dtypes, func_name)
+
+
+def _check_bound_argument_dtype(arguments: common.BoundArguments, name: str,
+                                compiled_dtypes: CompiledDTypes,
+                                func_name: str) -> None:
+  _check_argument_dtype(name, arguments.values[name],
+                        arguments.iter_tensors(name), compiled_dtypes,
+                        func_name)
+
+
+def _check_argument_dtype(name: str, value: Any, tensors: Iterable[Any],
+                          compiled_dtypes: CompiledDTypes,
+                          func_name: str) -> None:
+  """Reports the first tensor of the argument that has a wrong dtype."""
+  names = compiled_dtypes.names
+  for tensor in tensors:
+    if tensor.dtype.name not in names:
+      violations.report(
+          violations.Violation(kind=violations.DTYPE,
+                               function_name=func_name,
+                               arg_name=name,
+                               path=common.find_path(value, tensor),
+                               expected=compiled_dtypes.spec,
+                               actual=tensor.dtype.name))
+      return
 
 
 def check_argument_dtype_recursive(
     value: Any, desired_dtype: Union[tf.DType, Sequence[tf.DType]]) -> bool:
   """Returns true if argument dtype matches the desired.
 
-  Applies is_matching_dtype() to the input if it is a tf.Tensor. If the input
-  is a "sequence" or a "dict" type, recursively applies itself.
+  Applies is_matching_dtype() to every tf.Tensor in arbitrarily nested input
+  (see common.iter_tensors()), stopping at the first mismatch.
   Returns true for any other inputs (e.g. strings, numbers, etc).
   """
-  if isinstance(value, tf.Tensor):
-    return is_matching_dtype(value.dtype, desired_dtype)
-  elif isinstance(value, Sequence) and not isinstance(value, str):
-    return all(
-        [check_argument_dtype_recursive(x, desired_dtype) for x in value])
-  elif isinstance(value, Mapping):
-    return all([
-        check_argument_dtype_recursive(x, desired_dtype)
-        for x in value.values()
-    ])
-  else:
-    # Object is not a Mapping, Sequence, or a Tensor, so skip checking.
-    return True
+  compiled_dtypes = compile_dtype_spec(desired_dtype)
+  return all(
+      is_matching_dtype(tensor.dtype, compiled_dtypes)
+      for tensor in common.iter_tensors(value))
 
 
 def is_matching_dtype(
     actual_dtype: tf.DType, desired_dtype: Union[tf.DType,
                                                  Sequence[tf.DType]]) -> bool:
   """Returns true if actual type matches the desired type."""
-  if isinstance(desired_dtype, Sequence):
-    return any([is_matching_dtype(actual_dtype, x) for x in desired_dtype])
-  else:
-    return actual_dtype == desired_dtype
-
-
-DTypeContract = SimpleDTypeContract
+  return actual_dtype.name in compile_dtype_spec(desired_dtype).names
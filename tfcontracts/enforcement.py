@@ -0,0 +1,249 @@
+"""Policies that control how often contracts are enforced.
+
+A policy has one of three modes:
+  'full': Every call is checked (the default).
+  'sample': Only some calls are checked: either every N-th call, or a random
+    fraction of calls, counted separately for every decorated function.
+  'off': No calls are checked. Functions decorated while the policy is 'off'
+    are returned unwrapped, so they carry no overhead at all (and can't be
+    switched back on later).
+
+Elements yielded by generators that checked calls return are checked against
+the return value specification of the contract; a policy may limit that to
+every N-th element (`yield_every_n`).
+
+Policies can be set globally, for a contract class, or for a single decorated
+function; the most specific one applies. The initial global policy is read
+from environment variables:
+  TFCONTRACTS_POLICY: One of 'full', 'sample' or 'off'.
+  TFCONTRACTS_SAMPLE_EVERY: Check every N-th call in 'sample' mode.
+  TFCONTRACTS_SAMPLE_RATE: Check this fraction of calls in 'sample' mode.
+  TFCONTRACTS_YIELD_EVERY: Check every N-th element yielded by generators.
+
+Example:
+  >>> tfcontracts.set_policy('sample', every_n=100)
+  >>> tfcontracts.set_policy('off', target=tfcontracts.ShapeContract)
+  >>> tfcontracts.set_policy('full', target=my_decorated_func)
+"""
+import itertools
+import os
+import random
+import threading
+
+from typing import Any, Dict, NamedTuple, Optional
+
+from . import errors
+
+FULL = 'full'
+SAMPLE = 'sample'
+OFF = 'off'
+_MODES = (FULL, SAMPLE, OFF)
+
+# Name of the attribute that holds FunctionEnforcement on decorated functions.
+_ENFORCEMENT_ATTR = '_tfcontracts_enforcement'
+
+
+class Policy(NamedTuple):
+  """Describes how often a contract is enforced.
+
+  Attributes:
+    mode: One of 'full', 'sample' or 'off'.
+    every_n: In 'sample' mode, every N-th call is checked.
+    rate: In 'sample' mode, calls are checked with this probability. Mutually
+      exclusive with every_n.
+    yield_every_n: Every N-th element yielded by a generator returned from a
+      checked call is checked (starting with the first one). None means every
+      element.
+  """
+  mode: str = FULL
+  every_n: Optional[int] = None
+  rate: Optional[float] = None
+  yield_every_n: Optional[int] = None
+
+
+def make_policy(mode: str,
+                every_n: Optional[int] = None,
+                rate: Optional[float] = None,
+                yield_every_n: Optional[int] = None) -> Policy:
+  """Returns a validated policy.
+
+  Raises:
+    InvalidArgumentError if the arguments don't describe a valid policy.
+  """
+  if mode not in _MODES:
+    raise errors.InvalidArgumentError(
+        f'Enforcement mode should be one of {_MODES}, but was "{mode}".')
+  if yield_every_n is not None:
+    if mode == OFF:
+      raise errors.InvalidArgumentError(
+          f'yield_every_n can\'t be set in "{OFF}" mode.')
+    if yield_every_n < 1:
+      raise errors.InvalidArgumentError(
+          f'yield_every_n should be positive, but was {yield_every_n}.')
+  if mode != SAMPLE:
+    if every_n is not None or rate is not None:
+      raise errors.InvalidArgumentError(
+          f'every_n and rate can only be set in "{SAMPLE}" mode.')
+    return Policy(mode, yield_every_n=yield_every_n)
+  if (every_n is None) == (rate is None):
+    raise errors.InvalidArgumentError(
+        f'Exactly one of every_n and rate should be set in "{SAMPLE}" mode.')
+  if every_n is not None and every_n < 1:
+    raise errors.InvalidArgumentError(
+        f'every_n should be positive, but was {every_n}.')
+  if rate is not None and not 0.0 <= rate <= 1.0:
+    raise errors.InvalidArgumentError(
+        f'rate should be in [0, 1] interval, but was {rate}.')
+  return Policy(mode, every_n, rate, yield_every_n)
+
+
+def policy_from_environment() -> Policy:
+  """Returns the policy described by TFCONTRACTS_* environment variables."""
+  every_n = os.environ.get('TFCONTRACTS_SAMPLE_EVERY')
+  rate = os.environ.get('TFCONTRACTS_SAMPLE_RATE')
+  yield_every_n = os.environ.get('TFCONTRACTS_YIELD_EVERY')
+  return make_policy(
+      os.environ.get('TFCONTRACTS_POLICY', FULL),
+      every_n=int(every_n) if every_n else None,
+      rate=float(rate) if rate else None,
+      yield_every_n=(int(yield_every_n) if yield_every_n else None))
+
+
+_lock = threading.Lock()
+_global_policy = policy_from_environment()
+_class_policies: Dict[type, Policy] = {}
+# Incremented whenever any policy changes, so that decorated functions can
+# cheaply tell whether their resolved policy is stale.
+_generation = 0
+
+
+class FunctionEnforcement:
+  """Decides which calls of a single decorated function should be checked."""
+  def __init__(self, contract_class: type) -> None:
+    self._contract_class = contract_class
+    self._override = None
+    self._generation = -1
+    self._policy = None
+    # next() on itertools.count is atomic, so the counter is thread-safe.
+    self._num_calls = itertools.count()
+
+  @property
+  def policy(self) -> Policy:
+    """Returns the policy that currently applies to the function."""
+    if self._generation != _generation:
+      self._resolve()
+    return self._policy
+
+  def should_check(self) -> bool:
+    """Returns true if the current call should be checked."""
+    policy = self._policy
+    if self._generation != _generation:
+      policy = self.policy
+    if policy.mode == FULL:
+      return True
+    if policy.mode == OFF:
+      return False
+    if policy.every_n is not None:
+      return next(self._num_calls) % policy.every_n == 0
+    return random.random() < policy.rate
+
+  def _resolve(self) -> None:
+    with _lock:
+      generation = _generation
+      policy = self._override
+      if policy is None:
+        for cls in self._contract_class.__mro__:
+          if cls in _class_policies:
+            policy = _class_policies[cls]
+            break
+      self._policy = policy or _global_policy
+      self._generation = generation
+
+
+def get_enforcement(func: Any) -> Optional[FunctionEnforcement]:
+  """Returns enforcement of a decorated function, or None if not decorated."""
+  return getattr(func, _ENFORCEMENT_ATTR, None)
+
+
+def attach_enforcement(func: Any, enforcement: FunctionEnforcement) -> None:
+  setattr(func, _ENFORCEMENT_ATTR, enforcement)
+
+
+def set_policy(mode: str,
+               every_n: Optional[int] = None,
+               rate: Optional[float] = None,
+               target: Any = None,
+               yield_every_n: Optional[int] = None) -> None:
+  """Sets the enforcement policy.
+
+  Args:
+    mode: One of 'full', 'sample' or 'off'.
+    every_n: In 'sample' mode, checks every N-th call.
+    rate: In 'sample' mode, checks calls with this probability.
+    target: None to set the global policy, a contract class to set the policy
+      of functions decorated by that class (or its subclasses), or a decorated
+      function to set the policy of that function only.
+    yield_every_n: Checks every N-th element yielded by generators that
+      checked calls return.
+
+  Raises:
+    InvalidArgumentError if the policy or the target is invalid.
+  """
+  _set_policy(make_policy(mode, every_n, rate, yield_every_n), target)
+
+
+def clear_policy(target: Any) -> None:
+  """Removes the policy of a contract class or a decorated function.
+
+  Afterwards, the target falls back to a less specific policy.
+  """
+  _set_policy(None, target)
+
+
+def get_policy(target: Any = None) -> Policy:
+  """Returns the policy that applies to the target (see set_policy())."""
+  if target is None:
+    return _global_policy
+  if isinstance(target, type):
+    return FunctionEnforcement(target).policy
+  return _get_enforcement_or_raise(target).policy
+
+
+def reset_policies() -> None:
+  """Restores the global policy from the environment, clears all overrides.
+
+  Overrides of individual functions are not tracked globally, so they are
+  kept.
+  """
+  global _global_policy, _generation
+  with _lock:
+    _global_policy = policy_from_environment()
+    _class_policies.clear()
+    _generation += 1
+
+
+def _set_policy(policy: Optional[Policy], target: Any) -> None:
+  global _global_policy, _generation
+  if target is not None and not isinstance(target, type):
+    enforcement = _get_enforcement_or_raise(target)
+  with _lock:
+    if target is None:
+      _global_policy = policy or policy_from_environment()
+    elif isinstance(target, type):
+      if policy is None:
+        _class_policies.pop(target, None)
+      else:
+        _class_policies[target] = policy
+    else:
+      enforcement._override = policy
+    _generation += 1
+
+
+def _get_enforcement_or_raise(func: Any) -> FunctionEnforcement:
+  enforcement = get_enforcement(func)
+  if enforcement is None:
+    raise errors.InvalidArgumentError(
+        f'"{func}" is neither a contract class nor a function decorated by a '
+        f'contract (functions decorated while the policy was "{OFF}" are not '
+        f'wrapped, and have no policy).')
+  return enforcement
@@ -3,3 +3,22 @@
 
 class InvalidArgumentError(Exception):
   pass
+
+
+class ContractViolationError(InvalidArgumentError):
+  """Raised when a call violates a contract.
+
+  Constructed from a violations.Violation, whose message is only rendered
+  when the error is formatted. The constructor is inherited from Exception,
+  so that the error can be re-raised with a plain message (as tf.function
+  does for errors raised while tracing).
+  """
+  @property
+  def violation(self):
+    """Returns the violations.Violation, or None if there is only a message."""
+    violation = self.args[0] if self.args else None
+    return violation if hasattr(violation, 'render') else None
+
+  def __str__(self) -> str:
+    violation = self.violation
+    return violation.render() if violation is not None else super().__str__()
@@ -0,0 +1,64 @@
+"""Streaming checks of elements yielded by generators.
+
+Checking the return value of a function that returns a generator would either
+check nothing useful (the generator object), or require consuming it. Instead,
+the generator is wrapped in a CheckedGenerator, which checks every element
+against the return value specification as it is consumed, so streams are never
+buffered.
+"""
+import collections.abc
+
+from typing import Any, Callable, Generator
+
+
+def is_generator(value: Any) -> bool:
+  """Returns true if value is a generator, including a CheckedGenerator.
+
+  Generators returned by functions decorated by several contracts are
+  CheckedGenerators of inner contracts, rather than native generators.
+  """
+  return isinstance(value, collections.abc.Generator)
+
+
+class CheckedGenerator(collections.abc.Generator):
+  """A generator that checks the elements of another one as they are yielded.
+
+  send(), throw() and close() are forwarded to the wrapped generator, and the
+  value that it returns is preserved (in StopIteration).
+  """
+  def __init__(self,
+               generator: Generator[Any, Any, Any],
+               check: Callable[[Any], None],
+               every_n: int = 1) -> None:
+    """
+    Args:
+      generator: The generator to wrap.
+      check: Called with elements that should be checked.
+      every_n: Every N-th element is checked, starting with the first one.
+    """
+    self._generator = generator
+    self._check = check
+    self._every_n = every_n
+    self._num_elements = 0
+
+  def send(self, value: Any) -> Any:
+    return self._checked(self._generator.send(value))
+
+  def throw(self, *args: Any) -> Any:
+    return self._checked(self._generator.throw(*args))
+
+  def close(self) -> None:
+    self._generator.close()
+
+  def _checked(self, element: Any) -> Any:
+    if self._num_elements % self._every_n == 0:
+      self._check(element)
+    self._num_elements += 1
+    return element
+
+  def __getattr__(self, name: str) -> Any:
+    # Exposes gi_frame, gi_running etc. of the wrapped generator.
+    return getattr(self._generator, name)
+
+  def __repr__(self) -> str:
+    return f'<CheckedGenerator of {self._generator!r}>'
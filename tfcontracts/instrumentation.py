@@ -0,0 +1,270 @@
+"""In-process registry of contract timing and counters.
+
+When enabled, every decorated function records, per contract type: the number
+of checked and skipped calls (see the enforcement module), time spent checking
+preconditions and postconditions, the number of violations (whether raised or
+collected, see violations.collect()), and cache hits and misses (see
+CachedContract). Members of CombinedContract and CachedContract record their
+own checked calls, timings and violations, under the type of the contract
+they are a member of ('member_of'). When disabled (the default), the only
+cost is a single flag check per call.
+
+Example:
+  >>> tfcontracts.instrumentation.enable()
+  >>> ...  # call decorated functions
+  >>> for stats in tfcontracts.instrumentation.query(
+  >>>     contract_type='ShapeContract'):
+  >>>   print(stats['function'], stats['precondition']['p99_s'])
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+
+from typing import Any, Callable, Dict, List, Optional
+
+from . import errors
+from . import violations
+from .backend import tf
+
+_enabled = False
+_lock = threading.Lock()
+_stats: Dict[Any, 'ContractStats'] = {}
+
+PRECONDITION = 'precondition'
+POSTCONDITION = 'postcondition'
+YIELD = 'yield'
+
+# Upper bounds of latency histogram buckets: 1us, 2us, 4us, ..., ~16s.
+_BUCKET_BOUNDS = tuple(1e-6 * 2**i for i in range(25))
+
+
+def enable() -> None:
+  """Starts recording statistics."""
+  global _enabled
+  _enabled = True
+
+
+def disable() -> None:
+  """Stops recording statistics; recorded statistics are kept."""
+  global _enabled
+  _enabled = False
+
+
+def is_enabled() -> bool:
+  return _enabled
+
+
+class LatencyHistogram:
+  """Histogram of durations with exponentially growing buckets.
+
+  Not thread-safe by itself; ContractStats serializes access.
+  """
+  def __init__(self) -> None:
+    self.count = 0
+    self.total = 0.0
+    self.max = 0.0
+    self._bucket_counts = [0] * (len(_BUCKET_BOUNDS) + 1)
+
+  def record(self, seconds: float) -> None:
+    self.count += 1
+    self.total += seconds
+    self.max = max(self.max, seconds)
+    self._bucket_counts[bisect.bisect_left(_BUCKET_BOUNDS, seconds)] += 1
+
+  def percentile(self, q: float) -> float:
+    """Returns an upper bound of the q-th percentile (q is in [0, 100])."""
+    if not self.count:
+      return 0.0
+    rank = q / 100.0 * self.count
+    cumulative_count = 0
+    for bound, bucket_count in zip(_BUCKET_BOUNDS, self._bucket_counts):
+      cumulative_count += bucket_count
+      if cumulative_count >= rank:
+        return min(bound, self.max)
+    return self.max
+
+  def summary(self) -> Dict[str, float]:
+    return {
+        'count': self.count,
+        'total_s': self.total,
+        'mean_s': self.total / self.count if self.count else 0.0,
+        'p50_s': self.percentile(50),
+        'p90_s': self.percentile(90),
+        'p99_s': self.percentile(99),
+        'max_s': self.max,
+    }
+
+
+class ContractStats:
+  """Statistics of a single contract type applied to a single function."""
+  def __init__(self,
+               function_name: str,
+               contract_type: str,
+               member_of: Optional[str] = None) -> None:
+    self.function_name = function_name
+    self.contract_type = contract_type
+    self.member_of = member_of
+    self._lock = threading.Lock()
+    self._checked_calls = 0
+    self._skipped_calls = 0
+    self._violations = 0
+    self._cache_hits = 0
+    self._cache_misses = 0
+    self._precondition_latency = LatencyHistogram()
+    self._postcondition_latency = LatencyHistogram()
+
+  def record_checked_call(self, precondition_seconds: float,
+                          postcondition_seconds: float) -> None:
+    with self._lock:
+      self._checked_calls += 1
+      self._precondition_latency.record(precondition_seconds)
+      self._postcondition_latency.record(postcondition_seconds)
+
+  def record_member_check(self, condition: str, seconds: float) -> None:
+    """Records a check by a member contract; preconditions count calls."""
+    with self._lock:
+      if condition == PRECONDITION:
+        self._checked_calls += 1
+        self._precondition_latency.record(seconds)
+      elif condition == POSTCONDITION:
+        self._postcondition_latency.record(seconds)
+
+  def record_skipped_call(self) -> None:
+    with self._lock:
+      self._skipped_calls += 1
+
+  def record_violation(self) -> None:
+    with self._lock:
+      self._violations += 1
+
+  def record_collected_violations(self, num_collected: Optional[int]) -> None:
+    """Records violations collected since violations.num_collected() returned
+    num_collected."""
+    if num_collected is None:
+      return
+    count = violations.num_collected() - num_collected
+    if count:
+      with self._lock:
+        self._violations += count
+
+  def record_cache_lookup(self, hit: bool) -> None:
+    with self._lock:
+      if hit:
+        self._cache_hits += 1
+      else:
+        self._cache_misses += 1
+
+  def snapshot(self) -> Dict[str, Any]:
+    """Returns a copy of the statistics as a dict."""
+    with self._lock:
+      return {
+          'function': self.function_name,
+          'contract_type': self.contract_type,
+          'member_of': self.member_of,
+          'checked_calls': self._checked_calls,
+          'skipped_calls': self._skipped_calls,
+          'violations': self._violations,
+          'cache_hits': self._cache_hits,
+          'cache_misses': self._cache_misses,
+          'precondition': self._precondition_latency.summary(),
+          'postcondition': self._postcondition_latency.summary(),
+      }
+
+
+def get_stats(func: Callable[..., Any],
+              contract_class: type,
+              member_of: Optional[type] = None) -> ContractStats:
+  """Returns statistics of a contract class applied to func, creating them.
+
+  Statistics of members of a CombinedContract or CachedContract are kept
+  apart, by the class of the contract that they are a member of.
+  """
+  key = (func, contract_class, member_of)
+  stats = _stats.get(key)
+  if stats is None:
+    with _lock:
+      stats = _stats.get(key)
+      if stats is None:
+        function_name = (f'{getattr(func, "__module__", None)}.'
+                         f'{getattr(func, "__qualname__", repr(func))}')
+        stats = ContractStats(
+            function_name, contract_class.__name__,
+            member_of.__name__ if member_of is not None else None)
+        _stats[key] = stats
+  return stats
+
+
+def check_member(parent_class: type, member_class: type, condition: str,
+                 check: Callable[[Any, Any],
+                                 None], plan: Any, arguments: Any) -> None:
+  """Runs a check of a member contract, recording its statistics.
+
+  Args:
+    parent_class: Class of the contract that the member belongs to.
+    member_class: Class of the member contract.
+    condition: PRECONDITION, POSTCONDITION or YIELD. Only violations of
+      yielded elements are recorded, like for other contracts.
+    check: Check of the member, called with plan and arguments.
+    plan: Plan of the member (see common.CheckPlan).
+    arguments: Arguments to check (see common.BoundArguments).
+  """
+  stats = get_stats(plan.func, member_class, parent_class)
+  num_collected = violations.num_collected()
+  try:
+    start = time.perf_counter()
+    check(plan, arguments)
+    seconds = time.perf_counter() - start
+  except errors.InvalidArgumentError:
+    stats.record_violation()
+    raise
+  stats.record_member_check(condition, seconds)
+  stats.record_collected_violations(num_collected)
+
+
+def query(function_name: Optional[str] = None,
+          contract_type: Optional[str] = None) -> List[Dict[str, Any]]:
+  """Returns snapshots of statistics, optionally filtered.
+
+  Args:
+    function_name: If set, only returns statistics of functions whose
+      qualified name (e.g. 'my_module.my_func') ends with this string.
+    contract_type: If set, only returns statistics of contracts with this
+      class name (e.g. 'ShapeContract').
+  """
+  with _lock:
+    all_stats = list(_stats.values())
+  return [
+      stats.snapshot() for stats in all_stats
+      if (function_name is None or stats.function_name.endswith(function_name))
+      and (contract_type is None or stats.contract_type == contract_type)
+  ]
+
+
+def reset() -> None:
+  """Removes all recorded statistics."""
+  with _lock:
+    _stats.clear()
+
+
+def export(callback: Callable[[List[Dict[str, Any]]], None]) -> None:
+  """Passes snapshots of all statistics to the callback."""
+  callback(query())
+
+
+def write_summaries(step: int) -> None:
+  """Writes statistics using the default tf.summary writer."""
+  for stats in query():
+    prefix = f'tfcontracts/{stats["function"]}/{stats["contract_type"]}'
+    if stats['member_of'] is not None:
+      prefix = (f'tfcontracts/{stats["function"]}/{stats["member_of"]}/'
+                f'{stats["contract_type"]}')
+    for name in ('checked_calls', 'skipped_calls', 'violations', 'cache_hits',
+                 'cache_misses'):
+      tf.summary.scalar(f'{prefix}/{name}', stats[name], step=step)
+    for condition in ('precondition', 'postcondition'):
+      for name in ('mean_s', 'p50_s', 'p99_s'):
+        tf.summary.scalar(f'{prefix}/{condition}_{name}',
+                          stats[condition][name],
+                          step=step)
@@ -0,0 +1,73 @@
+"""Registry of functions decorated by contracts.
+
+Every function that a contract wraps is registered when it is decorated
+(functions decorated while the enforcement policy is 'off' aren't wrapped, and
+aren't registered). Registrations are dropped when the decorated function is
+garbage collected.
+
+Example:
+  >>> for registration in tfcontracts.registry.registered_functions(
+  >>>     contract_type='ShapeContract'):
+  >>>   print(registration.function_name)
+"""
+import threading
+import weakref
+
+from typing import Any, Callable, List, NamedTuple, Optional
+
+from . import common
+
+_lock = threading.Lock()
+_registrations: 'weakref.WeakKeyDictionary[Any, Registration]' = (
+    weakref.WeakKeyDictionary())
+
+
+class Registration(NamedTuple):
+  """A function decorated by a contract.
+
+  Attributes:
+    function_name: Qualified name of the function (e.g. 'my_module.my_func').
+    contract: The contract that decorates the function.
+    plan: The check plan that the contract made for the function.
+  """
+  function_name: str
+  contract: Any
+  plan: common.CheckPlan
+
+  @property
+  def contract_type(self) -> str:
+    return type(self.contract).__name__
+
+
+def qualified_name(func: Callable[..., Any]) -> str:
+  return (f'{getattr(func, "__module__", None)}.'
+          f'{getattr(func, "__qualname__", repr(func))}')
+
+
+def register(wrapper: Callable[..., Any], contract: Any,
+             plan: common.CheckPlan) -> None:
+  """Registers a function that the contract wrapped into `wrapper`."""
+  with _lock:
+    _registrations[wrapper] = Registration(qualified_name(plan.func), contract,
+                                           plan)
+
+
+def registered_functions(
+    function_name: Optional[str] = None,
+    contract_type: Optional[str] = None) -> List[Registration]:
+  """Returns registrations of decorated functions, optionally filtered.
+
+  Args:
+    function_name: If set, only returns functions whose qualified name ends
+      with this string.
+    contract_type: If set, only returns functions decorated by contracts with
+      this class name (e.g. 'ShapeContract').
+  """
+  with _lock:
+    registrations = list(_registrations.values())
+  return [
+      registration for registration in registrations
+      if (function_name is None
+          or registration.function_name.endswith(function_name)) and
+      (contract_type is None or registration.contract_type == contract_type)
+  ]
@@ -1,14 +1,25 @@
+from __future__ import annotations
+
 import typing
-import tensorflow as tf
 
-from typing import Any, Callable, Dict, Sequence, Mapping, Tuple, Union
+from typing import (Any, Callable, Dict, Mapping, Optional, Sequence, Tuple,
+                    Union)
 
+from .backend import tf
+from . import backend
 from . import common
 from . import contract
-from . import errors
+from . import dimension_scope
+from . import shape_unification
+from . import violation_flags
+from . import violations
 
 _ShapeSpec = Sequence[Union[str, int]]
 _AnyDict = Dict[str, Any]
+# A tensor and the compiled shape that it should have.
+_TensorAndShape = Tuple[Any, shape_unification.CompiledShape]
+# Flattened tensors of arguments, by argument name.
+_TensorsByName = Mapping[str, Sequence[Any]]
 
 
 class ShapeContract(contract.FunctionContract):
@@ -16,13 +27,20 @@ class ShapeContract(contract.FunctionContract):
 
   The shape can be specified as a list of ints (e.g. [1,2,3,4]), or
   symbolically (e.g. ['batch', 'height', 'width', 'channels']), or mixed.
+  None matches a dimension of any size (so [None, None] only constrains
+  rank), and a leading `...` matches any number of outer dimensions (e.g.
+  [..., 'channels']). See the shape_unification module for details.
 
   If an argument is listed and its shape doesn't match the one specified, an
   exception is raised. Omitting an argument is equivalent to stating that the
   "shape can be anything".
 
-  Note that we only support static shapes here: errors in dynamic shapes are
-  not caught.
+  Shapes are unified in Python, without creating any ops. Assert ops are only
+  added to graphs traced by tf.function for dimensions that are unknown at
+  trace time, so fully static checks carry no overhead in the compiled graph.
+
+  Inside a DimensionScope, symbolic dimensions are also consistent across
+  calls (see the dimension_scope module).
 
   Example:
     >>> @ShapeContract(values=[
@@ -32,48 +50,224 @@ class ShapeContract(contract.FunctionContract):
     >>> def my_func(x:tf.Tensor, y:tf.Tensor) -> tf.Tensor:
     >>>   # do stuff...
   """
+  is_cacheable = True
+
   def __init__(self, values: Sequence[Tuple[str, _ShapeSpec]]) -> None:
     """
     Args:
       values: List of argument name-shape pairs. Return value is identified
         by 'return' keyword. Alternatively, could be specified as a dict from
         argument names to shapes.
+
+    Raises:
+      InvalidArgumentError if a shape specification is malformed.
     """
-    self._requested_shapes_by_name = dict(values)
+    self._requested_shapes_by_name = {
+        name: shape_unification.compile_shape_spec(spec)
+        for name, spec in dict(values).items()
+    }
+
+  def contract_arg_names(self) -> Sequence[str]:
+    return list(self._requested_shapes_by_name.keys())
 
   def check_precondition(self, func: Callable[..., Any], *args,
                          **kwargs) -> None:
-    func_args_as_dict = common.get_function_args_as_dict(func, *args, **kwargs)
-    common.check_contract_args_match_function_args(
-        contract_arg_names=list(self._requested_shapes_by_name.keys()),
-        function_arg_names=list(func_args_as_dict.keys()),
-        function_name=func.__name__)
-    check_argument_shapes(func_args_as_dict, self._requested_shapes_by_name,
-                          func.__name__)
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
 
   def check_postcondition(self, func_results: Any,
                           func: Callable[..., Any]) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    check_bound_argument_shapes(arguments, self._requested_shapes_by_name,
+                                plan.function_name)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
     if 'return' not in self._requested_shapes_by_name:
       return
-    check_argument_shapes({'return': func_results},
-                          self._requested_shapes_by_name, func.__name__)
+    check_bound_argument_shapes(results, self._requested_shapes_by_name,
+                                plan.function_name)
 
 
 def check_argument_shapes(func_args: _AnyDict,
                           requested_shapes_by_name: Dict[str, _ShapeSpec],
                           func_name: str) -> None:
-  tensors_and_shapes = concat_tensor_and_shape_pairs(func_args,
-                                                     requested_shapes_by_name)
+  check_flat_argument_shapes(common.flatten_tensor_func_args(func_args),
+                             requested_shapes_by_name, func_name, func_args)
+
+
+def check_bound_argument_shapes(arguments: common.BoundArguments,
+                                requested_shapes_by_name: Dict[str,
+                                                               _ShapeSpec],
+                                func_name: str) -> None:
+  """Same as check_argument_shapes(), but reuses flattened tensors."""
+  tensors_by_arg_name = {
+      name: arguments.tensors(name)
+      for name in requested_shapes_by_name if name in arguments.values
+  }
+  check_flat_argument_shapes(tensors_by_arg_name, requested_shapes_by_name,
+                             func_name, arguments.values)
+
+
+def check_flat_argument_shapes(
+    tensors_by_arg_name: _TensorsByName,
+    requested_shapes_by_name: Dict[str, _ShapeSpec],
+    func_name: str,
+    values_by_arg_name: Optional[Mapping[str, Any]] = None) -> None:
+  """Checks shapes of flattened arguments.
+
+  Static shapes are unified in Python, and tf.debugging.assert_shapes is only
+  used for tensors with statically unknown dimensions. Inside
+  violation_flags.function(), those are checked by violation flags instead.
+
+  Args:
+    tensors_by_arg_name: Flattened tensors by argument name.
+    requested_shapes_by_name: Shape specifications by argument name.
+    func_name: Name of the function, used in error messages.
+    values_by_arg_name: Arguments that the tensors were flattened from. If
+      given, violations point at the offending tensor within its argument.
+  """
+  tensors_and_shapes = pair_tensors_and_shapes(
+      tensors_by_arg_name, {
+          name: shape_unification.compile_shape_spec(spec)
+          for name, spec in requested_shapes_by_name.items()
+      })
+  scope = dimension_scope.current_scope()
   try:
-    tf.debugging.assert_shapes(tensors_and_shapes)
+    # Bindings are copied, so that a failed check doesn't bind anything.
+    bindings = scope.bindings if scope is not None else {}
+    dynamic_tensors_and_shapes = shape_unification.unify(
+        tensors_and_shapes, bindings)
+    if dynamic_tensors_and_shapes and violation_flags.is_collecting():
+      dynamic_tensors_and_shapes = _flag_dynamic_shapes(
+          dynamic_tensors_and_shapes, bindings, tensors_by_arg_name,
+          values_by_arg_name, func_name)
+    if dynamic_tensors_and_shapes:
+      tf.debugging.assert_shapes([
+          (_assert_shapes_input(tensor),
+           compiled_shape.as_assert_shapes_spec(bindings))
+          for tensor, compiled_shape in dynamic_tensors_and_shapes
+      ])
   except ValueError as e:
-    requested_names_and_shapes = [(k, v)
-                                  for k, v in requested_shapes_by_name.items()]
-    raise errors.InvalidArgumentError(
-        f'You called "{func_name}()" with values whose shapes did not match '
-        f'those requested during contract creation. Requested shapes were '
-        f'{requested_names_and_shapes} and actual shapes were '
-        f'{tensors_and_shapes}. Details: {str(e)}.')
+    violations.report(
+        _make_shape_violation(e, tensors_by_arg_name, values_by_arg_name,
+                              func_name, scope is not None))
+    return
+  if scope is not None:
+    scope.update(bindings)
+
+
+def _flag_dynamic_shapes(dynamic_tensors_and_shapes: Sequence[_TensorAndShape],
+                         bindings: Dict[str, int],
+                         tensors_by_arg_name: _TensorsByName,
+                         values_by_arg_name: Optional[Mapping[str, Any]],
+                         func_name: str) -> Sequence[_TensorAndShape]:
+  """Checks statically unknown dimensions by violation flags.
+
+  Every tensor gets a single flag. Symbols that aren't bound by static
+  dimensions are bound to the size where they first occur.
+
+  Returns:
+    Tensors of unknown rank, with their shapes, which can't be flagged.
+  """
+  satisfied, descriptions, unflagged = [], [], []
+  sizes_by_symbol = dict(bindings)
+  for tensor, compiled_shape in dynamic_tensors_and_shapes:
+    dims = backend.static_dims(tensor)
+    if dims is None:
+      unflagged.append((tensor, compiled_shape))
+      continue
+    shape = backend.dynamic_shape(tensor)
+    offset = len(dims) - len(compiled_shape.dims)
+    conditions = []
+    for i, dim in enumerate(compiled_shape.dims):
+      if dim is None or dims[offset + i] is not None:
+        continue
+      if isinstance(dim, str) and dim not in sizes_by_symbol:
+        sizes_by_symbol[dim] = shape[offset + i]
+        continue
+      conditions.append(
+          tf.equal(shape[offset + i],
+                   sizes_by_symbol[dim] if isinstance(dim, str) else dim))
+    if not conditions:
+      continue
+    satisfied.append(tf.reduce_all(tf.stack(conditions)))
+    name, path = _find_argument(tensor, tensors_by_arg_name,
+                                values_by_arg_name)
+    descriptions.append(f'"{func_name}()": "{name}{"".join(path)}" should '
+                        f'have shape {compiled_shape.spec}')
+  if satisfied:
+    violation_flags.flag(tf.stack(satisfied), descriptions)
+  return unflagged
+
+
+def _assert_shapes_input(tensor: Any) -> Any:
+  """Returns a value with the shape of tensor for tf.debugging.assert_shapes.
+
+  tf.RaggedTensor isn't supported by assert_shapes, so it is represented by an
+  empty tf.SparseTensor with the same dynamic shape (see
+  backend.dynamic_shape()); its values aren't copied. Other arrays are
+  supported as they are.
+  """
+  if not backend.is_ragged_type(type(tensor)):
+    return tensor
+  dense_shape = backend.dynamic_shape(tensor)
+  return tf.SparseTensor(indices=tf.zeros([0, tf.size(dense_shape)], tf.int64),
+                         values=tf.zeros([0], tensor.dtype),
+                         dense_shape=dense_shape)
+
+
+def _make_shape_violation(error: ValueError,
+                          tensors_by_arg_name: _TensorsByName,
+                          values_by_arg_name: Optional[Mapping[str, Any]],
+                          func_name: str,
+                          in_scope: bool) -> violations.Violation:
+  """Describes a failed unification, pointing at the offending tensor."""
+  detail = str(error)
+  if in_scope:
+    detail += (' Symbolic dimensions were bound by the enclosing dimension '
+               'scope.')
+  tensor = getattr(error, 'tensor', None)
+  if tensor is not None:
+    name, path = _find_argument(tensor, tensors_by_arg_name,
+                                values_by_arg_name)
+    if name is not None:
+      return violations.Violation(kind=violations.SHAPE,
+                                  function_name=func_name,
+                                  arg_name=name,
+                                  path=path,
+                                  expected=error.spec,
+                                  actual=error.shape,
+                                  bindings=error.bindings,
+                                  detail=detail)
+  return violations.Violation(kind=violations.SHAPE,
+                              function_name=func_name,
+                              detail=detail)
+
+
+def _find_argument(
+    tensor: tf.Tensor, tensors_by_arg_name: _TensorsByName,
+    values_by_arg_name: Optional[Mapping[str, Any]]
+) -> Tuple[Optional[str], Tuple[str, ...]]:
+  """Returns the name of the argument that holds tensor, and the path to it.
+
+  The name is None if no argument holds the tensor, and the path is empty if
+  the arguments that tensors were flattened from aren't known.
+  """
+  for name, tensors in tensors_by_arg_name.items():
+    if not any(t is tensor for t in tensors):
+      continue
+    path = ()
+    if values_by_arg_name is not None and name in values_by_arg_name:
+      path = common.find_path(values_by_arg_name[name], tensor) or ()
+    return name, path
+  return None, ()
 
 
 def concat_tensor_and_shape_pairs(
@@ -85,8 +279,15 @@ def concat_tensor_and_shape_pairs(
   specifications, returns a list of tensor-shape pairs that can be fed into
   tf.debugging.assert_shapes.
   """
+  return pair_tensors_and_shapes(
+      common.flatten_tensor_func_args(func_args_by_name), shapes_by_name)
+
+
+def pair_tensors_and_shapes(
+    tensors_by_arg_name: _TensorsByName, shapes_by_name: Dict[str, _ShapeSpec]
+) -> Sequence[Tuple[tf.Tensor, _ShapeSpec]]:
+  """Same as concat_tensor_and_shape_pairs(), but for flattened arguments."""
   tensors_and_shapes = []
-  tensors_by_arg_name = common.flatten_tensor_func_args(func_args_by_name)
   for name, tensor_list in tensors_by_arg_name.items():
     if name not in shapes_by_name:
       continue
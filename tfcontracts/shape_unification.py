@@ -0,0 +1,190 @@
+"""Pure-Python unification of symbolic shape specifications.
+
+Shape specifications are compiled once (see compile_shape_spec()) and then
+unified against static tensor shapes without creating any TensorFlow ops.
+Only tensors with dimensions that are unknown statically need to be checked at
+runtime; unify() returns them so that they can be passed to
+tf.debugging.assert_shapes.
+
+The specification syntax follows tf.debugging.assert_shapes:
+  - an int (or a string that parses as an int) is an explicit size,
+  - any other string is a symbolic size, consistent across all tensors,
+  - None or '.' matches any size,
+  - a leading `...` (Ellipsis), '...' or '*' matches any number of outer
+    dimensions, so that the remaining entries constrain inner-most dimensions.
+For example, [None, None] only constrains rank, and [..., 'ch'] constrains the
+inner-most dimension of a tensor of any rank. Ragged dimensions of
+tf.RaggedTensor have no size, so they can only be matched by None. As in
+tf.debugging.assert_shapes, scalars and empty specifications are treated as
+having a single dimension of size one.
+"""
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+from . import backend
+from . import errors
+
+_Dim = Union[int, str, None]
+_ELLIPSIS_STRINGS = ('...', '*')
+
+
+class CompiledShape(NamedTuple):
+  """A compiled shape specification.
+
+  Attributes:
+    spec: The original specification, used in error messages.
+    dims: Sizes of inner-most dimensions: ints, symbol names, or None.
+    has_ellipsis: True if any number of outer dimensions is allowed.
+  """
+  spec: Any
+  dims: Tuple[_Dim, ...]
+  has_ellipsis: bool
+
+  def as_assert_shapes_spec(self, bindings: Dict[str, int]) -> List[Any]:
+    """Returns a spec for tf.debugging.assert_shapes.
+
+    Symbolic dimensions are replaced by bound sizes where possible.
+    """
+    dims = [
+        bindings.get(dim, dim) if isinstance(dim, str) else dim
+        for dim in self.dims
+    ]
+    return [Ellipsis] + dims if self.has_ellipsis else dims
+
+
+class ShapeMismatchError(ValueError):
+  """Raised when a static shape doesn't match a specification.
+
+  Attributes:
+    shape: Static shape of the tensor, as a list.
+    spec: The specification that the shape doesn't match.
+    bindings: Sizes of symbolic dimensions bound so far.
+    tensor: The tensor whose shape doesn't match, or None.
+  """
+  def __init__(self,
+               message: str,
+               shape: List[Optional[int]],
+               spec: Any,
+               bindings: Dict[str, int],
+               tensor: Any = None) -> None:
+    super().__init__(message)
+    self.shape = shape
+    self.spec = spec
+    self.bindings = dict(bindings)
+    self.tensor = tensor
+
+
+def compile_shape_spec(spec: Any) -> CompiledShape:
+  """Compiles a shape specification; compiled ones are returned as is.
+
+  Raises:
+    InvalidArgumentError if the specification is malformed.
+  """
+  if isinstance(spec, CompiledShape):
+    return spec
+  if isinstance(spec, (str, bytes)) or not hasattr(spec, '__iter__'):
+    raise errors.InvalidArgumentError(
+        f'Shape specification should be a sequence, but was "{spec}".')
+  entries = list(spec)
+  has_ellipsis = bool(entries) and _is_ellipsis(entries[0])
+  if has_ellipsis:
+    entries = entries[1:]
+  dims = []
+  for entry in entries:
+    if _is_ellipsis(entry):
+      raise errors.InvalidArgumentError(
+          f'Only the first entry of a shape specification can match any '
+          f'number of dimensions, but "{spec}" had one elsewhere.')
+    dims.append(_compile_dim(entry, spec))
+  if not dims and not has_ellipsis:
+    dims = [1]
+  return CompiledShape(spec=spec, dims=tuple(dims), has_ellipsis=has_ellipsis)
+
+
+def _is_ellipsis(entry: Any) -> bool:
+  return entry is Ellipsis or (isinstance(entry, str)
+                               and entry in _ELLIPSIS_STRINGS)
+
+
+def _compile_dim(entry: Any, spec: Any) -> _Dim:
+  if entry is None or entry == '.':
+    return None
+  if isinstance(entry, bool):
+    raise errors.InvalidArgumentError(
+        f'Invalid dimension "{entry}" in shape specification "{spec}".')
+  if isinstance(entry, int):
+    return entry
+  if isinstance(entry, str):
+    try:
+      return int(entry)
+    except ValueError:
+      return entry
+  raise errors.InvalidArgumentError(
+      f'Invalid dimension "{entry}" in shape specification "{spec}". '
+      f'Dimensions should be ints, strings or None.')
+
+
+_TensorAndShape = Tuple[Any, CompiledShape]
+
+
+def unify(tensors_and_shapes: Sequence[_TensorAndShape],
+          bindings: Optional[Dict[str, int]] = None) -> List[_TensorAndShape]:
+  """Unifies static shapes of tensors with compiled specifications.
+
+  Args:
+    tensors_and_shapes: Pairs of arrays (see the backend module) and compiled
+      specifications.
+    bindings: Sizes of symbolic dimensions. Symbols are bound to sizes of
+      statically known dimensions when first encountered, and the dict is
+      updated in place.
+
+  Returns:
+    Pairs of tensors with statically unknown dimensions and their
+    specifications; these can only be checked at runtime.
+
+  Raises:
+    ShapeMismatchError if static shapes don't match the specifications.
+  """
+  if bindings is None:
+    bindings = {}
+  dynamic_tensors_and_shapes = []
+  for tensor, compiled_shape in tensors_and_shapes:
+    dims = backend.static_dims(tensor)
+    if dims is None:
+      dynamic_tensors_and_shapes.append((tensor, compiled_shape))
+      continue
+    shape = tensor.shape
+    dims = dims or [1]
+    spec_dims = compiled_shape.dims
+    if (len(dims) < len(spec_dims)
+        or (len(dims) > len(spec_dims) and not compiled_shape.has_ellipsis)):
+      raise ShapeMismatchError(
+          f'Expected a tensor of rank '
+          f'{"at least " if compiled_shape.has_ellipsis else ""}'
+          f'{len(spec_dims)} for specification {compiled_shape.spec}, but '
+          f'its shape was {shape}.', dims, compiled_shape.spec, bindings,
+          tensor)
+    is_dynamic = False
+    offset = len(dims) - len(spec_dims)
+    for index, (dim, spec_dim) in enumerate(zip(dims[offset:], spec_dims)):
+      if spec_dim is None:
+        continue
+      if dim is None:
+        if offset + index in backend.ragged_dims(tensor):
+          raise ShapeMismatchError(
+              f'Expected shape {compiled_shape.spec}, but the tensor had '
+              f'shape {shape}: dimension "{spec_dim}" is ragged, so it can '
+              f'only be matched by None.', dims, compiled_shape.spec, bindings,
+              tensor)
+        is_dynamic = True
+        continue
+      expected_dim = spec_dim
+      if spec_dim.__class__ is str:
+        expected_dim = bindings.setdefault(spec_dim, dim)
+      if dim != expected_dim:
+        raise ShapeMismatchError(
+            f'Expected shape {compiled_shape.spec}, but the tensor had shape '
+            f'{shape}: dimension "{spec_dim}" of size {dim} should have been '
+            f'{expected_dim}.', dims, compiled_shape.spec, bindings, tensor)
+    if is_dynamic:
+      dynamic_tensors_and_shapes.append((tensor, compiled_shape))
+  return dynamic_tensors_and_shapes
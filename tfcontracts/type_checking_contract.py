@@ -1,33 +1,198 @@
-import inspect
-
+import collections.abc
+import itertools
+import random
+import types
 import typing
-from typing import Any, Callable, Dict, Sequence, Type
+from typing import (Any, Callable, Dict, Iterable, NamedTuple, Optional,
+                    Sequence)
 from . import errors
 from . import contract
 from . import common
+from . import violations
+
+# Key of the predicate of yielded elements in CheckPlan.compiled_checks. It
+# can't clash with argument names, since it is a keyword.
+_YIELD = 'yield'
+
+# Policies of checking elements of containers.
+ALL = 'all'
+FIRST_K = 'first_k'
+RANDOM_K = 'random_k'
+_CONTAINER_MODES = (ALL, FIRST_K, RANDOM_K)
+
+_Predicate = Callable[[Any], bool]
+
+# Origins of Union annotations: typing.Union, and types.UnionType of X | Y
+# annotations (Python 3.10+).
+_UNION_ORIGINS = (typing.Union, ) + (
+    (types.UnionType, ) if hasattr(types, 'UnionType') else ())
+# typing.Annotated is available in Python 3.9+.
+_ANNOTATED = getattr(typing, 'Annotated', None)
+# Bases of protocol classes whose members aren't members of the protocol.
+_PROTOCOL_BASES = (typing.Protocol, typing.Generic, object)
+
+
+class ContainerPolicy(NamedTuple):
+  """Describes which elements of containers are type-checked.
+
+  Attributes:
+    mode: 'all' checks every element, 'first_k' checks the first k elements,
+      and 'random_k' checks k elements chosen at random on every call.
+      Unordered containers (sets and mappings) can't be sampled without
+      iterating over them, so 'random_k' checks their first k elements.
+    k: Number of checked elements, in 'first_k' and 'random_k' modes.
+  """
+  mode: str = ALL
+  k: Optional[int] = None
+
+
+def make_container_policy(mode: str,
+                          k: Optional[int] = None) -> ContainerPolicy:
+  """Returns a validated container policy.
+
+  Raises:
+    InvalidArgumentError if the arguments don't describe a valid policy.
+  """
+  if mode not in _CONTAINER_MODES:
+    raise errors.InvalidArgumentError(
+        f'Container policy should be one of {_CONTAINER_MODES}, but was '
+        f'"{mode}".')
+  if mode == ALL:
+    if k is not None:
+      raise errors.InvalidArgumentError(
+          f'k can only be set in "{FIRST_K}" and "{RANDOM_K}" modes.')
+    return ContainerPolicy(mode)
+  if k is None or k < 1:
+    raise errors.InvalidArgumentError(
+        f'k should be positive in "{mode}" mode, but was {k}.')
+  return ContainerPolicy(mode, k)
 
 
 class TypeCheckingContract(contract.FunctionContract):
   """A contract that type-checks annotations against values.
 
   Checks that passed values satisfy constraints imposed by type annotations.
+  Besides classes, annotations may use typing generics (e.g. List[tf.Tensor],
+  Dict[str, tf.Tensor], Tuple[int, ...]), Union and Optional, Literal, and
+  Protocol classes, which are checked structurally if they aren't
+  runtime_checkable. Annotations that can't be checked at run time (e.g.
+  unresolved forward references or Callable[[int], int]) are only checked as
+  far as possible. Elements yielded by generators are checked against the
+  element type of an Iterator, Iterable or Generator return annotation as they
+  are consumed.
+
+  Every annotation is compiled into a predicate once, when the contract
+  decorates a function. Elements of large containers can be sampled (see
+  ContainerPolicy), so that checking them doesn't cost O(n) on every call.
+
+  Type checks are done in Python, so the contract never adds ops to graphs
+  traced by tf.function. Some annotations depend on values rather than only
+  on types (e.g. Literal['a'], Type[int], or Protocol classes, which inspect
+  attributes of instances), so outcomes of the contract aren't cacheable.
+
+  Example:
+    >>> @TypeCheckingContract(container_policy='first_k', k=16)
+    >>> def my_func(x: List[tf.Tensor], y: Optional[int] = None) -> tf.Tensor:
+    >>>   # function body
   """
+  def __init__(self,
+               container_policy: str = ALL,
+               k: Optional[int] = None) -> None:
+    """
+    Args:
+      container_policy: One of 'all', 'first_k' or 'random_k' (see
+        ContainerPolicy).
+      k: Number of checked elements of every container, unless
+        container_policy is 'all'.
+
+    Raises:
+      InvalidArgumentError if the container policy is invalid.
+    """
+    super().__init__()
+    self._container_policy = make_container_policy(container_policy, k)
+
+  def make_check_plan(self, func: Callable[..., Any]) -> common.CheckPlan:
+    plan = super().make_check_plan(func)
+    annotations = _resolve_annotations(func, plan.annotations)
+    compiled_checks = {
+        name: compile_type_annotation(annotation, self._container_policy)
+        for name, annotation in annotations.items()
+    }
+    if 'return' in annotations:
+      compiled_checks[_YIELD] = compile_type_annotation(
+          _yield_type(annotations['return']), self._container_policy)
+    # Only annotated arguments can be type-checked, so other arguments are not
+    # bound at all.
+    return plan.select(list(annotations.keys()))._replace(
+        annotations=annotations, compiled_checks=compiled_checks)
+
   def check_precondition(self, func: Callable[..., Any], *args,
                          **kwargs) -> None:
-    argspec = inspect.getfullargspec(func)
-    # Map function arguments to a dict.
-    func_args_as_dict = common.bind_function_args(argspec.args, *args,
-                                                  **kwargs)
-    check_argument_types(func_args_as_dict, argspec.annotations, func.__name__)
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
 
   def check_postcondition(self, func_results: Any,
                           func: Callable[..., Any]) -> None:
-    annotations = inspect.getfullargspec(func).annotations
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    values = arguments.values
+    for name, predicate in plan.compiled_checks.items():
+      if name != 'return' and name in values and not predicate(values[name]):
+        _report_type_mismatch(plan.function_name, name, values[name],
+                              plan.annotations[name])
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
     # 'return' is used as an identifier of the function return value. This works
     # since the keyword is already reserved in python.
-    if 'return' in annotations:
-      check_argument_types({'return': func_results},
-                           {'return': annotations['return']}, func.__name__)
+    predicate = plan.compiled_checks.get('return')
+    if predicate is not None and not predicate(results.values['return']):
+      _report_type_mismatch(plan.function_name, 'return',
+                            results.values['return'],
+                            plan.annotations['return'])
+
+  def check_planned_yield(self, plan: common.CheckPlan,
+                          element: common.BoundArguments) -> None:
+    predicate = plan.compiled_checks.get(_YIELD)
+    if predicate is not None and not predicate(element.values['return']):
+      _report_type_mismatch(plan.function_name, 'return',
+                            element.values['return'],
+                            _yield_type(plan.annotations['return']))
+
+
+def _yield_type(annotation: Any) -> Any:
+  """Returns the element type of Iterator[T], Iterable[T] or Generator[T, ...].
+
+  Returns Any for other annotations.
+  """
+  origin = typing.get_origin(annotation)
+  args = typing.get_args(annotation)
+  if (isinstance(origin, type) and args
+      and origin in (collections.abc.Iterator, collections.abc.Iterable,
+                     collections.abc.Generator)):
+    return args[0]
+  return Any
+
+
+def _resolve_annotations(func: Callable[..., Any],
+                         annotations: Dict[str, Any]) -> Dict[str, Any]:
+  """Resolves string annotations (e.g. forward references), where possible."""
+  if not any(isinstance(a, str) for a in annotations.values()):
+    return annotations
+  try:
+    try:
+      type_hints = typing.get_type_hints(func, include_extras=True)
+    except TypeError:
+      # include_extras (which keeps Annotated) is available in Python 3.9+.
+      type_hints = typing.get_type_hints(func)
+  except Exception:
+    return annotations
+  return {name: type_hints.get(name, a) for name, a in annotations.items()}
 
 
 def check_argument_types(args_values: Dict[str, Any],
@@ -38,16 +203,194 @@ def check_argument_types(args_values: Dict[str, Any],
       continue
     arg_value = args_values[arg_name]
     if not satisfies_type_annotation(arg_value, arg_annotation):
-      # Should be invalid argument error.
-      raise errors.InvalidArgumentError(
-          f'You called "{func_name}()" with an argument type that did not '
-          f'match type annotation for "{arg_name}". '
-          f'Value "{arg_value}" is not consistent with the expected type '
-          f'"{arg_annotation}".')
+      _report_type_mismatch(func_name, arg_name, arg_value, arg_annotation)
+
+
+def _report_type_mismatch(func_name: str, arg_name: str, arg_value: Any,
+                          arg_annotation: Any) -> None:
+  violations.report(
+      violations.Violation(kind=violations.TYPE,
+                           function_name=func_name,
+                           arg_name=arg_name,
+                           expected=arg_annotation,
+                           actual=violations.summarize(arg_value)))
 
 
-def satisfies_type_annotation(value: Any, annotation: Any) -> bool:
+def satisfies_type_annotation(
+    value: Any,
+    annotation: Any,
+    container_policy: ContainerPolicy = ContainerPolicy()
+) -> bool:
   """Returns true if the value satisfies the type annotation."""
-  # TODO(vasiliy): this does not work for many situations; see:
-  # https://stackoverflow.com/questions/55503673
-  return isinstance(value, annotation)
+  return compile_type_annotation(annotation, container_policy)(value)
+
+
+# Compiled predicates by (annotation, container policy).
+_compiled_predicates: Dict[Any, _Predicate] = {}
+
+
+def compile_type_annotation(
+    annotation: Any, container_policy: ContainerPolicy = ContainerPolicy()
+) -> _Predicate:
+  """Returns a predicate that checks values against the annotation.
+
+  Predicates are cached per annotation object and container policy.
+  """
+  try:
+    key = (annotation, container_policy)
+    predicate = _compiled_predicates.get(key)
+  except TypeError:
+    # Annotations with unhashable arguments (e.g. Literal[[1]]) aren't cached.
+    return _compile(annotation, container_policy)
+  if predicate is None:
+    predicate = _compile(annotation, container_policy)
+    _compiled_predicates[key] = predicate
+  return predicate
+
+
+def _always_true(value: Any) -> bool:
+  return True
+
+
+def _compile(annotation: Any, policy: ContainerPolicy) -> _Predicate:
+  if annotation is Any or annotation is object:
+    return _always_true
+  if annotation is None or annotation is type(None):
+    return lambda value: value is None
+  if isinstance(annotation, (str, typing.ForwardRef)):
+    # Unresolved forward references can't be checked.
+    return _always_true
+  if isinstance(annotation, typing.TypeVar):
+    if annotation.__bound__ is not None:
+      return compile_type_annotation(annotation.__bound__, policy)
+    if annotation.__constraints__:
+      return _compile_union(annotation.__constraints__, policy)
+    return _always_true
+  if callable(annotation) and hasattr(annotation, '__supertype__'):
+    # NewType, which is a function rather than a class before Python 3.10.
+    return compile_type_annotation(annotation.__supertype__, policy)
+  origin = typing.get_origin(annotation)
+  args = typing.get_args(annotation)
+  if origin in _UNION_ORIGINS:
+    return _compile_union(args, policy)
+  if origin is typing.Literal:
+    return lambda value: any(value == arg and type(value) is type(arg)
+                             for arg in args)
+  if origin is not None and origin in (_ANNOTATED, typing.ClassVar,
+                                       typing.Final):
+    return compile_type_annotation(args[0], policy)
+  if origin is not None:
+    return _compile_generic(origin, args, policy)
+  if isinstance(annotation, type):
+    is_runtime_protocol = getattr(annotation, '_is_runtime_protocol', False)
+    if _is_protocol(annotation) and not is_runtime_protocol:
+      return _compile_protocol(annotation)
+    return lambda value: isinstance(value, annotation)
+  # Anything else (e.g. typing.Callable without arguments) is checked the
+  # same way as before annotations were compiled.
+  return lambda value: isinstance(value, annotation)
+
+
+def _compile_union(args: Sequence[Any], policy: ContainerPolicy) -> _Predicate:
+  predicates = [compile_type_annotation(arg, policy) for arg in args]
+  return lambda value: any(predicate(value) for predicate in predicates)
+
+
+def _compile_generic(origin: type, args: Sequence[Any],
+                     policy: ContainerPolicy) -> _Predicate:
+  """Compiles a parameterized generic, e.g. List[int]."""
+  if origin is type:
+    if not args or args[0] is Any:
+      return lambda value: isinstance(value, type)
+    if typing.get_origin(args[0]) in _UNION_ORIGINS:
+      classes = typing.get_args(args[0])
+    else:
+      classes = args[0]
+    return lambda value: isinstance(value, type) and issubclass(value, classes)
+  if origin is tuple:
+    return _compile_tuple(args, policy)
+  if not isinstance(origin, type):
+    return _always_true
+  if _is_protocol(origin):
+    return compile_type_annotation(origin, policy)
+  if issubclass(origin, collections.abc.Mapping) and len(args) == 2:
+    return _compile_mapping(origin, args, policy)
+  if (issubclass(origin, (collections.abc.Sequence, collections.abc.Set))
+      and not issubclass(origin, (str, bytes)) and len(args) == 1):
+    return _compile_collection(origin, args[0], policy)
+  # Elements of other generics (e.g. Iterator[int], or Callable[[int], int])
+  # can't be checked without consuming or calling them.
+  return lambda value: isinstance(value, origin)
+
+
+def _compile_tuple(args: Sequence[Any], policy: ContainerPolicy) -> _Predicate:
+  if len(args) == 2 and args[1] is Ellipsis:
+    return _compile_collection(tuple, args[0], policy)
+  if args == ((), ):
+    # Tuple[()] is the type of an empty tuple.
+    return lambda value: value == ()
+  if not args:
+    return lambda value: isinstance(value, tuple)
+  predicates = [compile_type_annotation(arg, policy) for arg in args]
+
+  def satisfies_tuple(value: Any) -> bool:
+    return (isinstance(value, tuple) and len(value) == len(predicates) and all(
+        predicate(element) for predicate, element in zip(predicates, value)))
+
+  return satisfies_tuple
+
+
+def _compile_collection(origin: type, element_annotation: Any,
+                        policy: ContainerPolicy) -> _Predicate:
+  element_predicate = compile_type_annotation(element_annotation, policy)
+  if element_predicate is _always_true:
+    return lambda value: isinstance(value, origin)
+
+  def satisfies_collection(value: Any) -> bool:
+    return isinstance(value, origin) and all(
+        element_predicate(element) for element in _sample(value, policy))
+
+  return satisfies_collection
+
+
+def _compile_mapping(origin: type, args: Sequence[Any],
+                     policy: ContainerPolicy) -> _Predicate:
+  key_predicate = compile_type_annotation(args[0], policy)
+  value_predicate = compile_type_annotation(args[1], policy)
+  if key_predicate is _always_true and value_predicate is _always_true:
+    return lambda value: isinstance(value, origin)
+
+  def satisfies_mapping(mapping: Any) -> bool:
+    return isinstance(mapping, origin) and all(
+        key_predicate(key) and value_predicate(mapping[key])
+        for key in _sample(mapping, policy))
+
+  return satisfies_mapping
+
+
+def _sample(collection: Any, policy: ContainerPolicy) -> Iterable[Any]:
+  """Returns the elements of the collection that should be checked."""
+  if policy.mode == ALL or len(collection) <= policy.k:
+    return collection
+  if policy.mode == RANDOM_K and isinstance(collection,
+                                            collections.abc.Sequence):
+    return (collection[i]
+            for i in random.sample(range(len(collection)), policy.k))
+  return itertools.islice(collection, policy.k)
+
+
+def _is_protocol(cls: type) -> bool:
+  return getattr(cls, '_is_protocol', False) and cls is not typing.Protocol
+
+
+def _compile_protocol(protocol: type) -> _Predicate:
+  """Checks that values have all members of a protocol class."""
+  members = set()
+  for cls in protocol.__mro__:
+    if cls in _PROTOCOL_BASES or not _is_protocol(cls):
+      continue
+    members.update(name for name in list(cls.__dict__) +
+                   list(getattr(cls, '__annotations__', {}))
+                   if not name.startswith('_'))
+  members = tuple(sorted(members))
+  return lambda value: all(hasattr(value, name) for name in members)
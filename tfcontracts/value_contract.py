@@ -0,0 +1,480 @@
+from __future__ import annotations
+
+import functools
+import itertools
+import threading
+import weakref
+
+from typing import (Any, Callable, Dict, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple, Union)
+
+from .backend import tf
+from . import backend
+from . import common
+from . import contract
+from . import deferred_checks
+from . import distribution
+from . import errors
+from . import violation_flags
+from . import violations
+
+Number = Union[int, float]
+
+
+class ValueSpec(NamedTuple):
+  """Constraints on the values of every tensor in an argument.
+
+  Attributes:
+    low: If set, values should be greater than or equal to `low`.
+    high: If set, values should be less than or equal to `high`.
+    finite: If true, floating point values should be neither inf nor NaN.
+  """
+  low: Optional[Number] = None
+  high: Optional[Number] = None
+  finite: bool = False
+
+  def describe(self) -> str:
+    """Returns a human readable description, used in error messages."""
+    descriptions = []
+    if self.low is not None and self.high is not None:
+      descriptions.append(f'in [{self.low}, {self.high}] interval')
+    elif self.low is not None:
+      descriptions.append(f'>= {self.low}')
+    elif self.high is not None:
+      descriptions.append(f'<= {self.high}')
+    if self.finite:
+      descriptions.append('finite')
+    return ' and '.join(descriptions) or 'anything'
+
+
+NON_NEGATIVE = ValueSpec(low=0)
+FINITE = ValueSpec(finite=True)
+_NAMED_SPECS = {'non_negative': NON_NEGATIVE, 'finite': FINITE}
+
+
+def compile_value_spec(spec: Any) -> ValueSpec:
+  """Returns a ValueSpec for a value specification.
+
+  A specification is either a ValueSpec, one of 'non_negative' or 'finite',
+  a (low, high) pair that describes a closed interval (either bound may be
+  None), or a dict of ValueSpec fields.
+
+  Raises:
+    InvalidArgumentError if the specification is malformed.
+  """
+  if isinstance(spec, ValueSpec):
+    compiled_spec = spec
+  elif isinstance(spec, str) and spec in _NAMED_SPECS:
+    compiled_spec = _NAMED_SPECS[spec]
+  elif isinstance(spec, Mapping):
+    try:
+      compiled_spec = ValueSpec(**spec)
+    except TypeError:
+      raise errors.InvalidArgumentError(
+          f'Value specification "{spec}" should only have fields '
+          f'{ValueSpec._fields}.')
+  elif (isinstance(spec, Sequence) and not isinstance(spec, str)
+        and len(spec) == 2):
+    compiled_spec = ValueSpec(low=spec[0], high=spec[1])
+  else:
+    raise errors.InvalidArgumentError(
+        f'Invalid value specification "{spec}". It should be a ValueSpec, one '
+        f'of {list(_NAMED_SPECS)}, a (low, high) pair, or a dict.')
+  if (compiled_spec.low is not None and compiled_spec.high is not None
+      and compiled_spec.low > compiled_spec.high):
+    raise errors.InvalidArgumentError(
+        f'Lower bound of value specification "{spec}" is greater than its '
+        f'upper bound.')
+  return compiled_spec
+
+
+class ValueContract(contract.FunctionContract):
+  """Contract that ensures that argument values satisfy the given constraints.
+
+  Values of every tensor in a listed argument (and in the return value, which
+  is identified by 'return') must lie in an interval and/or be finite (see
+  ValueSpec). Arguments that aren't listed are not checked. Only stored values
+  of tf.SparseTensor are checked, not its implicit zeros.
+
+  Unlike shapes and dtypes, values are only known at run time, so checks of
+  all arguments of a call are fused: every tensor is reduced to a single
+  boolean, and the booleans are reduced together, so that a call costs one
+  host sync in eager mode and one assert op in graphs traced by tf.function.
+  Which argument and which bound failed is only worked out once the fused
+  check has failed.
+
+  With `deferred=True`, eager calls don't wait for the outcome of the check at
+  all: it is resolved in the background, and violations are reported later
+  (see the deferred_checks module).
+
+  Example:
+    >>> @ValueContract(values={
+    >>>     'probabilities': (0.0, 1.0),
+    >>>     'counts': 'non_negative',
+    >>>     'return': 'finite'})
+    >>> def my_func(probabilities:tf.Tensor, counts:tf.Tensor) -> tf.Tensor:
+    >>>   # do stuff...
+  """
+  def __init__(self,
+               values: Union[Mapping[str, Any], Sequence[Tuple[str, Any]]],
+               deferred: bool = False,
+               offload_async_checks: bool = False) -> None:
+    """
+    Args:
+      values: Dict from argument names to value specifications (see
+        compile_value_spec()), or a list of name-specification pairs. Return
+        value is identified by 'return' keyword.
+      deferred: If true, eager checks are submitted to
+        deferred_checks.get_default_queue() instead of blocking the call.
+      offload_async_checks: If true, checks of calls of coroutine functions
+        run in a worker thread, so that waiting for their outcome doesn't
+        block the event loop.
+
+    Raises:
+      InvalidArgumentError if a value specification is malformed.
+    """
+    super().__init__()
+    self._deferred = deferred
+    self.offload_async_checks = offload_async_checks
+    self._specs_by_name = {
+        name: compile_value_spec(spec)
+        for name, spec in dict(values).items()
+    }
+
+  def contract_arg_names(self) -> Sequence[str]:
+    return list(self._specs_by_name.keys())
+
+  def check_precondition(self, func: Callable[..., Any], *args,
+                         **kwargs) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_precondition(plan,
+                                    common.BoundArguments(plan, args, kwargs))
+
+  def check_postcondition(self, func_results: Any,
+                          func: Callable[..., Any]) -> None:
+    plan = self.make_check_plan(func)
+    self.check_planned_postcondition(
+        plan, common.BoundArguments.for_return_value(plan, func_results))
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    check_bound_argument_values(arguments,
+                                self._specs_by_name,
+                                plan.function_name,
+                                deferred=self._deferred)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    if 'return' not in self._specs_by_name:
+      return
+    check_bound_argument_values(results,
+                                self._specs_by_name,
+                                plan.function_name,
+                                deferred=self._deferred)
+
+
+class FiniteContract(ValueContract):
+  """Contract that ensures that floating point values are neither inf nor NaN.
+
+  Every floating point tensor in the arguments and the return value (or only
+  in the listed ones) is checked in a single fused check per call, like
+  ValueContract does: one host sync in eager mode, one assert op in graphs.
+  The error names the first argument, and the path within its nested
+  structure, that has values that aren't finite. Tensors of other dtypes
+  aren't checked, and cost nothing.
+
+  With `every_n`, only every N-th call of each decorated function is checked,
+  which makes the contract cheap enough to leave enabled in long training
+  runs. Eager calls are counted in Python. In graphs traced by tf.function,
+  executions are counted by a variable, and the check runs in a tf.cond, so
+  every N-th step is checked however often the function was traced. Sampling
+  is part of the checks, so it also applies inside CombinedContract, and on
+  top of enforcement policies (see the enforcement module).
+
+  Example:
+    >>> @FiniteContract(every_n=100)
+    >>> def train_step(features, labels):
+    >>>   # do stuff...
+  """
+  def __init__(self,
+               arg_names: Optional[Sequence[str]] = None,
+               every_n: Optional[int] = None,
+               deferred: bool = False,
+               offload_async_checks: bool = False) -> None:
+    """
+    Args:
+      arg_names: Names of the arguments to check ('return' for the return
+        value), or None to check all of them.
+      every_n: If set, only every N-th call of a function is checked,
+        starting with the first one.
+      deferred: See ValueContract.
+      offload_async_checks: See ValueContract.
+
+    Raises:
+      InvalidArgumentError if every_n isn't positive.
+    """
+    specs_by_name = {name: FINITE for name in arg_names or ()}
+    super().__init__(specs_by_name,
+                     deferred=deferred,
+                     offload_async_checks=offload_async_checks)
+    self._check_all = arg_names is None
+    if every_n is not None and (isinstance(every_n, bool) or
+                                not isinstance(every_n, int) or every_n <= 0):
+      raise errors.InvalidArgumentError(
+          f'every_n should be a positive int, but was "{every_n}".')
+    self._every_n = every_n
+    self._samplers = weakref.WeakKeyDictionary()
+    self._samplers_lock = threading.Lock()
+
+  def contract_arg_names(self) -> Optional[Sequence[str]]:
+    if self._check_all:
+      return None
+    return super().contract_arg_names()
+
+  def check_planned_precondition(self, plan: common.CheckPlan,
+                                 arguments: common.BoundArguments) -> None:
+    sampled = True
+    if self._every_n is not None:
+      sampled = self._sampler(plan).count_call()
+    self._check_if_sampled(plan, arguments, sampled)
+
+  def check_planned_postcondition(self, plan: common.CheckPlan,
+                                  results: common.BoundArguments) -> None:
+    sampled = True
+    if self._every_n is not None:
+      sampled = self._sampler(plan).is_last_call_sampled()
+    self._check_if_sampled(plan, results, sampled)
+
+  def _check_if_sampled(self, plan: common.CheckPlan,
+                        arguments: common.BoundArguments,
+                        sampled: Union[bool, tf.Tensor]) -> None:
+    def check() -> Optional[tf.Operation]:
+      return check_bound_argument_values(arguments,
+                                         self._specs_for(arguments),
+                                         plan.function_name,
+                                         deferred=self._deferred)
+
+    if isinstance(sampled, bool):
+      if sampled:
+        check()
+      return
+
+    def checked() -> tf.Tensor:
+      assert_op = check()
+      with tf.control_dependencies([assert_op] if assert_op else []):
+        return tf.constant(True)
+
+    tf.cond(sampled, checked, lambda: tf.constant(False))
+
+  def _sampler(self, plan: common.CheckPlan) -> '_CallSampler':
+    sampler = self._samplers.get(plan.func)
+    if sampler is None:
+      with self._samplers_lock:
+        sampler = self._samplers.setdefault(plan.func,
+                                            _CallSampler(self._every_n))
+    return sampler
+
+  def _specs_for(self,
+                 arguments: common.BoundArguments) -> Dict[str, ValueSpec]:
+    if self._check_all:
+      return {name: FINITE for name in arguments.values}
+    return self._specs_by_name
+
+
+class _CallSampler:
+  """Counts calls of a single function, and samples every N-th one.
+
+  Eager calls are counted in Python. Calls in graphs are counted by a
+  variable (created outside of the graph, on first use), so that they are
+  counted when the graph runs rather than when it is traced.
+  """
+  def __init__(self, every_n: int) -> None:
+    self._every_n = every_n
+    # next() on itertools.count is atomic, so the counter is thread-safe.
+    self._num_eager_calls = itertools.count()
+    self._last_eager_call = 0
+    self._num_graph_calls = None
+    self._lock = threading.Lock()
+
+  def count_call(self) -> Union[bool, tf.Tensor]:
+    """Counts a call, and returns whether it should be checked.
+
+    Returns a boolean tensor in graphs.
+    """
+    if tf.executing_eagerly():
+      self._last_eager_call = next(self._num_eager_calls)
+      return self._last_eager_call % self._every_n == 0
+    num_calls = self._graph_counter().assign_add(1)
+    return tf.equal((num_calls - 1) % self._every_n, 0)
+
+  def is_last_call_sampled(self) -> Union[bool, tf.Tensor]:
+    """Returns whether the last counted call should be checked."""
+    if tf.executing_eagerly():
+      return self._last_eager_call % self._every_n == 0
+    num_calls = self._graph_counter().read_value()
+    return tf.equal((num_calls - 1) % self._every_n, 0)
+
+  def _graph_counter(self) -> tf.Variable:
+    with self._lock:
+      if self._num_graph_calls is None:
+        with tf.init_scope():
+          self._num_graph_calls = tf.Variable(0,
+                                              dtype=tf.int64,
+                                              trainable=False,
+                                              name='num_checked_calls')
+      return self._num_graph_calls
+
+
+def check_bound_argument_values(
+    arguments: common.BoundArguments,
+    specs_by_name: Dict[str, ValueSpec],
+    func_name: str,
+    deferred: bool = False) -> Optional[tf.Operation]:
+  """Checks values of all tensors of the named arguments in a fused check.
+
+  Args:
+    arguments: Arguments of the call.
+    specs_by_name: Value specifications by argument name.
+    func_name: Name of the function, used in error messages.
+    deferred: If true, eager checks are submitted to the default deferred
+      check queue rather than resolved immediately.
+
+  Returns:
+    The assert op when called in graph mode, None otherwise. In graphs traced
+    for replicas of a tf.distribute strategy, checks of all replicas are
+    reduced, and asserted by the first replica (see the distribution module).
+    Inside violation_flags.function(), checks are flagged instead, and None
+    is returned.
+
+  Raises:
+    InvalidArgumentError in eager mode, if a value doesn't satisfy its
+      specification (or if a previously deferred check failed).
+  """
+  checks = []
+  for name, spec in specs_by_name.items():
+    if name not in arguments.values:
+      continue
+    for tensor in arguments.iter_tensors(name):
+      if not (spec.low is not None or spec.high is not None or
+              (spec.finite and _is_floating(tensor.dtype))):
+        continue
+      if backend.is_ndarray_type(type(tensor)):
+        # NumPy arrays are checked right away, without TensorFlow.
+        if not _satisfies_spec_numpy(tensor, spec):
+          _report_value_violations([(name, tensor, spec)], arguments,
+                                   func_name)
+      else:
+        checks.append((name, tensor, spec))
+  if not checks:
+    return None
+  satisfied = tf.stack([
+      tf.reduce_all(_satisfies_spec_elementwise(tensor, spec))
+      for _, tensor, spec in checks
+  ])
+  if tf.executing_eagerly() and deferred:
+    deferred_checks.get_default_queue().submit(
+        deferred_checks.DeferredCheck(function_name=func_name,
+                                      satisfied=satisfied,
+                                      descriptions=_describe_checks(checks)))
+    return None
+  satisfied = distribution.reduce_satisfied(satisfied)
+  if satisfied is None:
+    return None
+  if violation_flags.is_collecting():
+    violation_flags.flag(satisfied, [
+        f'"{func_name}()": {description}'
+        for description in _describe_checks(checks, arguments)
+    ])
+    return None
+  all_satisfied = tf.reduce_all(satisfied)
+  if tf.executing_eagerly():
+    if not bool(all_satisfied):
+      _report_value_violations(checks, arguments, func_name)
+    return None
+  return tf.debugging.Assert(all_satisfied, [
+      f'You called "{func_name}()" with argument values that did not satisfy '
+      f'the contract:',
+      tf.boolean_mask(tf.constant(_describe_checks(checks, arguments)),
+                      tf.logical_not(satisfied))
+  ],
+                             summarize=len(checks))
+
+
+def _describe_checks(
+    checks: List[Tuple[str, tf.Tensor, ValueSpec]],
+    arguments: Optional[common.BoundArguments] = None) -> Tuple[str, ...]:
+  """Describes checks, locating tensors within arguments if they are given."""
+  descriptions = []
+  for name, tensor, spec in checks:
+    path = ()
+    if arguments is not None:
+      path = common.find_path(arguments.values[name], tensor) or ()
+    descriptions.append(f'"{name}{"".join(path)}" should be {spec.describe()}')
+  return tuple(descriptions)
+
+
+def _satisfies_spec_elementwise(tensor: tf.Tensor,
+                                spec: ValueSpec) -> tf.Tensor:
+  """Returns a boolean tensor that fuses all predicates of the spec."""
+  tensor = backend.stored_values(tensor)
+  conditions = []
+  if spec.low is not None:
+    conditions.append(tensor >= spec.low)
+  if spec.high is not None:
+    conditions.append(tensor <= spec.high)
+  if spec.finite and tensor.dtype.is_floating:
+    conditions.append(tf.math.is_finite(tensor))
+  return functools.reduce(tf.logical_and, conditions)
+
+
+def _satisfies_spec_numpy(array: Any, spec: ValueSpec) -> bool:
+  """Same as _satisfies_spec_elementwise(), reduced, for NumPy arrays."""
+  return ((spec.low is None or bool((array >= spec.low).all()))
+          and (spec.high is None or bool((array <= spec.high).all()))
+          and (not spec.finite or not _is_floating(array.dtype)
+               or bool(_numpy().isfinite(array).all())))
+
+
+def _is_floating(dtype: Any) -> bool:
+  """Returns true for floating point tf.DType and numpy.dtype."""
+  is_floating = getattr(dtype, 'is_floating', None)
+  if is_floating is None:
+    return dtype.kind == 'f'
+  return is_floating
+
+
+def _numpy() -> Any:
+  import numpy
+  return numpy
+
+
+def _report_value_violations(checks: List[Tuple[str, tf.Tensor, ValueSpec]],
+                             arguments: common.BoundArguments,
+                             func_name: str) -> None:
+  """Reports checks that failed, one by one.
+
+  This is only called once the fused check has failed, so it may afford
+  copying values to the host and checking predicates one by one.
+  """
+  for name, tensor, spec in checks:
+    array = tensor
+    if not backend.is_ndarray_type(type(tensor)):
+      array = backend.stored_values(tensor).numpy()
+    if spec.low is not None and not (array >= spec.low).all():
+      failure = (f'values below the lower bound {spec.low} (minimum was '
+                 f'{array.min()})')
+    elif spec.high is not None and not (array <= spec.high).all():
+      failure = (f'values above the upper bound {spec.high} (maximum was '
+                 f'{array.max()})')
+    elif spec.finite and not _numpy().isfinite(array).all():
+      failure = 'values that are not finite'
+    else:
+      continue
+    violations.report(
+        violations.Violation(kind=violations.VALUE,
+                             function_name=func_name,
+                             arg_name=name,
+                             path=common.find_path(arguments.values[name],
+                                                   tensor),
+                             expected=spec,
+                             actual=failure))
@@ -0,0 +1,203 @@
+"""Ahead-of-time verification of contracts by tracing a model once.
+
+verify() traces a function (e.g. the entry point of a model) with
+tf.TensorSpec inputs, and checks every contract that decorates a function
+called while tracing, regardless of enforcement policies. Checks that only
+depend on static properties (shapes known from the specs, dtypes, Python
+types) are fully verified at trace time. A check that adds ops to the traced
+graph depends on values or on dimensions that the specs leave unknown, and
+is reported as one that still needs runtime enforcement.
+
+Violations don't stop tracing, so that a single report lists all of them (as
+long as the function itself can still be traced). Nested tf.functions that
+were already traced for the same inputs aren't traced again, so contracts of
+functions called only from within them aren't reached.
+
+Example:
+  >>> report = tfcontracts.verify(
+  >>>     model, tf.TensorSpec([None, 224, 224, 3], tf.float32))
+  >>> print(report.summary())
+  >>> if report.passed and not report.runtime_checks:
+  >>>   # All contracts hold for any input matching the spec.
+  >>>   tfcontracts.set_policy('off')
+"""
+from __future__ import annotations
+
+import contextvars
+import threading
+
+from typing import Any, Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from .backend import tf
+from . import common
+from . import errors
+from . import registry
+
+VERIFIED = 'verified'
+RUNTIME = 'runtime'
+VIOLATED = 'violated'
+
+_lock = threading.Lock()
+_active_sessions = 0
+_current_session: contextvars.ContextVar = contextvars.ContextVar(
+    'tfcontracts_verification_session', default=None)
+
+
+class ContractCheck(NamedTuple):
+  """Outcome of checking a contract of one call while tracing.
+
+  Attributes:
+    function_name: Qualified name of the decorated function.
+    contract_type: Class name of the contract.
+    condition: 'precondition' or 'postcondition'.
+    status: 'verified' if the check passed at trace time, 'runtime' if it
+      passed at trace time but added ops that check it at runtime, or
+      'violated'.
+    message: Error message of a violation, or None.
+  """
+  function_name: str
+  contract_type: str
+  condition: str
+  status: str
+  message: Optional[str] = None
+
+
+class VerificationReport(NamedTuple):
+  """Outcome of verify().
+
+  Attributes:
+    checks: Checks of all contracts, in the order in which they were done.
+    unreached: Names of registered functions (see the registry module) that
+      weren't called while tracing, so their contracts weren't verified.
+    error: Error that stopped tracing, or None.
+  """
+  checks: Tuple[ContractCheck, ...]
+  unreached: Tuple[str, ...]
+  error: Optional[str] = None
+
+  @property
+  def violations(self) -> List[ContractCheck]:
+    return [check for check in self.checks if check.status == VIOLATED]
+
+  @property
+  def runtime_checks(self) -> List[ContractCheck]:
+    return [check for check in self.checks if check.status == RUNTIME]
+
+  @property
+  def passed(self) -> bool:
+    """Returns true if tracing succeeded and no contract was violated."""
+    return self.error is None and not self.violations
+
+  def summary(self) -> str:
+    """Returns a human-readable description of the report."""
+    lines = [
+        f'{len(self.checks)} contract checks: '
+        f'{len(self.checks) - len(self.violations) - len(self.runtime_checks)}'
+        f' verified, {len(self.runtime_checks)} need runtime checks, '
+        f'{len(self.violations)} violated.'
+    ]
+    for check in self.checks:
+      if check.status != VERIFIED:
+        lines.append(f'  {check.status}: {check.contract_type} '
+                     f'{check.condition} of {check.function_name}'
+                     f'{": " + check.message if check.message else ""}')
+    if self.error is not None:
+      lines.append(f'Tracing failed: {self.error}')
+    return '\n'.join(lines)
+
+
+class _Session:
+  """Checks recorded while tracing a single function."""
+  def __init__(self) -> None:
+    self.checks: List[ContractCheck] = []
+    self.reached_plan_ids = set()
+
+  def check(self, contract: Any, plan: common.CheckPlan, condition: str,
+            check: Callable[[], None]) -> None:
+    self.reached_plan_ids.add(id(plan))
+    graph = None
+    if not tf.executing_eagerly():
+      graph = tf.compat.v1.get_default_graph()
+      num_ops_before = len(graph.get_operations())
+    try:
+      check()
+    except errors.InvalidArgumentError as e:
+      status, message = VIOLATED, str(e)
+    else:
+      status, message = VERIFIED, None
+      if graph is not None and len(graph.get_operations()) > num_ops_before:
+        status = RUNTIME
+    self.checks.append(
+        ContractCheck(registry.qualified_name(plan.func),
+                      type(contract).__name__, condition, status, message))
+
+
+def is_active() -> bool:
+  """Returns true if any thread is running verify()."""
+  return _active_sessions > 0
+
+
+def is_verifying() -> bool:
+  """Returns true if verify() is running in the current thread (or task).
+
+  Contracts of calls elsewhere are enforced as usual.
+  """
+  return _active_sessions > 0 and _current_session.get() is not None
+
+
+def verify_call(contract: Any, plan: common.CheckPlan, args: Sequence[Any],
+                kwargs: Any) -> Any:
+  """Calls a decorated function, recording checks of its contract.
+
+  Called by wrappers of decorated functions if is_verifying().
+  """
+  session = _current_session.get()
+  arguments = common.BoundArguments(plan, args, kwargs)
+  session.check(contract, plan, 'precondition',
+                lambda: contract.check_planned_precondition(plan, arguments))
+  results = plan.func(*args, **kwargs)
+  session.check(
+      contract, plan, 'postcondition',
+      lambda: contract.check_planned_postcondition(
+          plan, common.BoundArguments.for_return_value(plan, results)))
+  return results
+
+
+def verify(func: Callable[..., Any], *input_signature: Any,
+           **kwarg_signature: Any) -> VerificationReport:
+  """Traces func with the given specs, and verifies contracts of all calls.
+
+  Args:
+    func: A Python function, a tf.function, or any other callable (e.g. a
+      Keras model).
+    *input_signature: Specs (e.g. tf.TensorSpec) of positional arguments, in
+      any form accepted by tf.function.get_concrete_function().
+    **kwarg_signature: Specs of keyword arguments.
+
+  Returns:
+    A VerificationReport. Errors raised while tracing (e.g. by ops that
+    can't handle arguments that violate a contract) are reported rather than
+    raised.
+  """
+  global _active_sessions
+  # A fresh tf.function, so that graphs traced before aren't reused.
+  traced_func = tf.function(getattr(func, 'python_function', func))
+  session = _Session()
+  token = _current_session.set(session)
+  with _lock:
+    _active_sessions += 1
+  error = None
+  try:
+    traced_func.get_concrete_function(*input_signature, **kwarg_signature)
+  except Exception as e:
+    error = f'{type(e).__name__}: {e}'
+  finally:
+    with _lock:
+      _active_sessions -= 1
+    _current_session.reset(token)
+  unreached = sorted({
+      registration.function_name
+      for registration in registry.registered_functions()
+      if id(registration.plan) not in session.reached_plan_ids
+  })
+  return VerificationReport(tuple(session.checks), tuple(unreached), error)
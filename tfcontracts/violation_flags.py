@@ -0,0 +1,154 @@
+"""Runtime checks of XLA-compiled functions, without assert ops.
+
+Functions compiled by XLA (tf.function(jit_compile=True)) can't check
+contracts with assert ops: XLA ignores tf.debugging.Assert, and can't compile
+the string tensors that contracts use in their error messages. Instead,
+function() traces a function with violation flags: every runtime check that
+would add an assert op (e.g. of values, or of dimensions that are unknown at
+trace time) adds a boolean flag to the outputs of the compiled function
+instead, and the flags are checked once the compiled call returns. Static
+checks are done at trace time as usual.
+
+The flags are checked with a single host sync per call. Since they are only
+checked once the call returns, ops that fail on arguments that violate a
+contract raise their own errors first. If the compiled function is called
+while tracing another function, the flags are checked by a single assert op
+in the outer graph, which isn't compiled by XLA.
+
+Flags are only collected in the graph of the compiled function itself;
+checks in nested tf.function calls and in branches or bodies of control flow
+ops (e.g. from autograph) add assert ops as usual.
+
+Example:
+  >>> @tfcontracts.violation_flags.function
+  >>> def train_step(features, labels):
+  >>>   # call functions decorated by contracts...
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import weakref
+
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+from .backend import tf
+from . import errors
+
+_current_collector: contextvars.ContextVar = contextvars.ContextVar(
+    'tfcontracts_violation_flag_collector', default=None)
+
+
+class _FlagCollector:
+  """Flags of checks added while tracing a single function."""
+  def __init__(self, graph: Any) -> None:
+    self.graph = graph
+    self.flags: List[tf.Tensor] = []
+    self.descriptions: List[str] = []
+
+
+def is_collecting() -> bool:
+  """Returns true if checks in the current graph should add flags."""
+  collector = _current_collector.get()
+  return (collector is not None
+          and collector.graph is tf.compat.v1.get_default_graph())
+
+
+def flag(satisfied: tf.Tensor, descriptions: Sequence[str]) -> None:
+  """Adds flags of checks to the function that is being traced.
+
+  Args:
+    satisfied: Boolean vector, one entry per check (or a scalar for a single
+      check), true if the check passed.
+    descriptions: Descriptions of the checks, one per entry, used in error
+      messages.
+
+  Raises:
+    InvalidArgumentError outside of function() (see is_collecting()).
+  """
+  if not is_collecting():
+    raise errors.InvalidArgumentError(
+        'Violation flags can only be added while tracing a function wrapped '
+        'by violation_flags.function().')
+  collector = _current_collector.get()
+  collector.flags.append(tf.reshape(satisfied, [-1]))
+  collector.descriptions += descriptions
+
+
+class FlaggedFunction:
+  """A tf.function whose runtime checks are reported by violation flags."""
+  def __init__(self, func: Callable[..., Any], **function_kwargs: Any) -> None:
+    self.python_function = func
+    self._function = tf.function(self._call_with_flags, **function_kwargs)
+    self._lock = threading.Lock()
+    # Descriptions of flags, by the graph of the concrete function.
+    self._descriptions_by_graph = weakref.WeakKeyDictionary()
+    functools.update_wrapper(self, func)
+
+  def _call_with_flags(self, *args, **kwargs) -> Tuple[Any, tf.Tensor]:
+    collector = _FlagCollector(tf.compat.v1.get_default_graph())
+    token = _current_collector.set(collector)
+    try:
+      outputs = self.python_function(*args, **kwargs)
+    finally:
+      _current_collector.reset(token)
+    with self._lock:
+      self._descriptions_by_graph[collector.graph] = tuple(
+          collector.descriptions)
+    if not collector.flags:
+      return outputs, tf.ones([0], tf.bool)
+    return outputs, tf.concat(collector.flags, axis=0)
+
+  def get_concrete_function(self, *args, **kwargs) -> Any:
+    return self._function.get_concrete_function(*args, **kwargs)
+
+  def __call__(self, *args, **kwargs) -> Any:
+    """Calls the compiled function, and checks its flags.
+
+    Raises:
+      InvalidArgumentError in eager mode, if a check failed.
+    """
+    concrete_function = self._function.get_concrete_function(*args, **kwargs)
+    with self._lock:
+      descriptions = self._descriptions_by_graph[concrete_function.graph]
+    outputs, satisfied = concrete_function(*args, **kwargs)
+    if not descriptions:
+      return outputs
+    if not tf.executing_eagerly():
+      # Automatic control dependencies of tf.function run the assert.
+      tf.debugging.Assert(tf.reduce_all(satisfied), [
+          'Contracts were violated:',
+          tf.boolean_mask(tf.constant(descriptions), tf.logical_not(satisfied))
+      ],
+                          summarize=len(descriptions))
+      return outputs
+    satisfied = satisfied.numpy()
+    if not satisfied.all():
+      failed = [
+          description for description, ok in zip(descriptions, satisfied)
+          if not ok
+      ]
+      raise errors.InvalidArgumentError('Contracts were violated:\n  ' +
+                                        '\n  '.join(failed))
+    return outputs
+
+
+def function(func: Optional[Callable[..., Any]] = None,
+             **function_kwargs: Any) -> Any:
+  """Wraps func in an XLA-compiled tf.function that checks violation flags.
+
+  May be used as a decorator, with or without arguments.
+
+  Args:
+    func: The function to compile.
+    **function_kwargs: Arguments of tf.function (e.g. input_signature).
+      jit_compile defaults to true.
+
+  Returns:
+    A FlaggedFunction.
+  """
+  function_kwargs.setdefault('jit_compile', True)
+  if func is None:
+    return functools.partial(function, **function_kwargs)
+  return FlaggedFunction(func, **function_kwargs)
@@ -0,0 +1,179 @@
+"""Structured descriptions of contract violations.
+
+When a contract is violated, it describes the violation with a Violation: the
+function, the argument and the path to the offending value within its nested
+structure, and what was expected and found. Violations only hold small
+summaries (shapes, dtype names, type names) rather than argument values, and
+their messages are rendered lazily with bounded size, so that failing calls
+with large tensors stay cheap.
+
+By default, violations are raised as ContractViolationError (a subclass of
+InvalidArgumentError). Inside collect(), they are accumulated instead, and the
+decorated function is called as if the contract was satisfied. Only
+violations found in Python are collected: assert ops in graphs and deferred
+checks (see the deferred_checks module) still fail as usual.
+
+Example:
+  >>> with tfcontracts.violations.collect() as collected:
+  >>>   my_func(x)
+  >>> for violation in collected:
+  >>>   print(violation.location, violation.render())
+"""
+import contextvars
+
+from typing import (Any, Iterator, List, Mapping, NamedTuple, Optional,
+                    Sequence, Tuple)
+
+from . import backend
+from . import errors
+
+SHAPE = 'shape'
+DTYPE = 'dtype'
+SAME_DTYPE = 'same_dtype'
+TYPE = 'type'
+VALUE = 'value'
+
+# Maximum lengths of a single rendered field, and of a whole message.
+_MAX_FIELD_LENGTH = 200
+_MAX_MESSAGE_LENGTH = 2000
+# Types of values that are described by their repr().
+_SCALAR_TYPES = (bool, int, float, complex, str, bytes)
+
+_current_collector: contextvars.ContextVar = contextvars.ContextVar(
+    'tfcontracts_violation_collector', default=None)
+
+
+class Violation(NamedTuple):
+  """A violation of a contract by a single call.
+
+  Attributes:
+    kind: One of 'shape', 'dtype', 'same_dtype', 'type' or 'value'.
+    function_name: Name of the called function.
+    arg_name: Name of the offending argument ('return' for the return
+      value), or None if it isn't known.
+    path: Accessors that lead from the argument to the offending value, e.g.
+      ('[0]', "['image']") or ('.field', ).
+    expected: The specification that wasn't satisfied.
+    actual: Summary of what was found, e.g. a shape, a dtype name, or a
+      summary of a value (see summarize()).
+    bindings: Sizes of symbolic dimensions bound when a shape didn't match.
+    detail: Additional description of the violation, or None.
+  """
+  kind: str
+  function_name: str
+  arg_name: Optional[str] = None
+  path: Tuple[str, ...] = ()
+  expected: Any = None
+  actual: Any = None
+  bindings: Optional[Mapping[str, int]] = None
+  detail: Optional[str] = None
+
+  @property
+  def location(self) -> str:
+    """Returns the offending argument and path, e.g. "x[0]['image']"."""
+    return f'{self.arg_name or ""}{"".join(self.path)}'
+
+  def render(self) -> str:
+    """Returns a human-readable message of bounded length."""
+    location = _truncate(self.location)
+    expected = _truncate(str(self.expected))
+    actual = _truncate(str(self.actual))
+    prefix = f'You called "{self.function_name}()"'
+    if self.kind == SHAPE:
+      message = (f'{prefix} with values whose shapes did not match those '
+                 f'requested during contract creation.')
+      if self.arg_name is not None:
+        message += (f' "{location}" had shape {actual}, but the requested '
+                    f'shape was {expected}.')
+      if self.bindings:
+        message += (f' Sizes of symbolic dimensions were '
+                    f'{_truncate(str(dict(self.bindings)))}.')
+    elif self.kind == DTYPE:
+      message = (f'{prefix} with an argument type that did not match the '
+                 f'requested data type for "{self.arg_name}". Actual dtype '
+                 f'"{actual}" of "{location}" is not consistent with the '
+                 f'expected dtype "{expected}".')
+    elif self.kind == SAME_DTYPE:
+      message = (f'{prefix} with arguments that should have the same dtype, '
+                 f'but "{location}" had dtype "{actual}" while others had '
+                 f'dtype "{expected}".')
+    elif self.kind == TYPE:
+      message = (f'{prefix} with an argument type that did not match type '
+                 f'annotation for "{self.arg_name}". Value {actual} is not '
+                 f'consistent with the expected type "{expected}".')
+    else:
+      describe = getattr(self.expected, 'describe', None)
+      if describe is not None:
+        expected = _truncate(describe())
+      message = (f'{prefix} with an argument "{location}" that has {actual}, '
+                 f'but it should be {expected}.')
+    if self.detail:
+      message += f' Details: {_truncate(self.detail)}'
+    return _truncate(message, _MAX_MESSAGE_LENGTH)
+
+
+class ViolationCollector:
+  """A context manager that collects violations instead of raising them."""
+  def __init__(self) -> None:
+    self.violations: List[Violation] = []
+    self._tokens: List[contextvars.Token] = []
+
+  def __enter__(self) -> 'ViolationCollector':
+    self._tokens.append(_current_collector.set(self))
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    _current_collector.reset(self._tokens.pop())
+
+  def __iter__(self) -> Iterator[Violation]:
+    return iter(self.violations)
+
+  def __len__(self) -> int:
+    return len(self.violations)
+
+
+def collect() -> ViolationCollector:
+  """Returns a context manager that collects violations (see above)."""
+  return ViolationCollector()
+
+
+def report(violation: Violation) -> None:
+  """Raises the violation, or collects it inside collect().
+
+  Raises:
+    ContractViolationError outside of collect().
+  """
+  collector = _current_collector.get()
+  if collector is None:
+    raise errors.ContractViolationError(violation)
+  collector.violations.append(violation)
+
+
+def num_collected() -> Optional[int]:
+  """Returns the number of violations collected so far by the innermost
+  collect(), or None outside of collect()."""
+  collector = _current_collector.get()
+  return None if collector is None else len(collector)
+
+
+def summarize(value: Any) -> str:
+  """Returns a short description of a value, without formatting its contents.
+
+  Arrays are described by their shape and dtype, and containers by their
+  length. Only numbers, strings and similar scalars are shown by value.
+  """
+  cls = type(value)
+  if backend.is_tensor_type(cls) or backend.is_ndarray_type(cls):
+    return (f'{cls.__name__}(shape={backend.static_dims(value)}, '
+            f'dtype={value.dtype.name})')
+  if value is None or isinstance(value, _SCALAR_TYPES):
+    return _truncate(repr(value))
+  if isinstance(value, (Sequence, Mapping)):
+    return f'{cls.__name__} of length {len(value)}'
+  return f'{cls.__name__} instance'
+
+
+def _truncate(text: str, max_length: int = _MAX_FIELD_LENGTH) -> str:
+  if len(text) <= max_length:
+    return text
+  return f'{text[:max_length]}... ({len(text) - max_length} more characters)'